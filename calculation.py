@@ -4,17 +4,430 @@ import os
 if __name__ == "__main__":
     os.chdir(pathlib.Path(__file__).parent)
 
-import ast
 import numpy
 import pathlib
+import logging
 import datetime
+import heapq
+import shutil
+import tempfile
+import hashlib
+import pickle
+import sqlite3
+import concurrent.futures
+from multiprocessing import shared_memory
 import bw2calc
 import bw2data
+import stats_arrays
 import numpy as np
 import pandas as pd
+from scipy import sparse
+from scipy.sparse import linalg as sparse_linalg
+from scipy.sparse import csgraph
 from bw2calc.errors import OutsideTechnosphere
 import helper as hp
 
+# Optional dependencies, only needed to write results as Parquet files or as XLSX with constant memory
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+
+#%%
+
+class LCA_Result_Store():
+    
+    def __init__(self,
+                 lookup_tables: dict,
+                 chunk_size: int = 100000,
+                 key_columns: tuple[str] = ()) -> None:
+        
+        """ A columnar store for the raw results of an LCA calculation.
+        Each row consists of the activity, the activity amount, the flow, the flow amount, the value (score or amount) and the method.
+        Activities, flows and methods are stored as integer indices into lookup tables, amounts and values as float64.
+        The arrays are preallocated and grow in chunks, whenever they are full.
+        
+        
+        Parameters
+        ----------
+        lookup_tables : dict
+            A dictionary with the lookup tables 'keys' (list of activity/flow keys), 'key_indices' (dict, key to index),
+            'methods' (list of methods) and 'method_indices' (dict, method to index). Tables are usually shared between all stores of a calculation.
+            
+        chunk_size : int
+            Number of rows by which the arrays grow whenever they are full. The default is 100000.
+        
+        key_columns : tuple[str]
+            Names of additional columns that contain activity/flow keys (as indices into the lookup table), e.g. the root activity of a supply chain graph.
+            The default is an empty tuple (no additional columns).
+            
+        """
+        
+        # Add to object
+        self.lookup_tables: dict = lookup_tables
+        self.chunk_size: int = chunk_size
+        self.key_columns: tuple[str] = key_columns
+        
+        # Number of rows that are currently used
+        self.length: int = 0
+        
+        # Preallocate the columns
+        self.columns: dict[str, np.array] = {"activity": np.zeros(chunk_size, dtype = "int64"),
+                                             "activity_amount": np.zeros(chunk_size, dtype = "float64"),
+                                             "flow": np.zeros(chunk_size, dtype = "int64"),
+                                             "flow_amount": np.zeros(chunk_size, dtype = "float64"),
+                                             "value": np.zeros(chunk_size, dtype = "float64"),
+                                             "method": np.zeros(chunk_size, dtype = "int64"),
+                                             **{m: np.zeros(chunk_size, dtype = "int64") for m in key_columns}}
+    
+    
+    @staticmethod
+    def create_lookup_tables() -> dict:
+        
+        # Initialize new, empty lookup tables
+        return {"keys": [], "key_indices": {}, "methods": [], "method_indices": {}}
+    
+    
+    def __len__(self) -> int:
+        return self.length
+    
+    
+    def __iter__(self):
+        
+        # Yield the rows in the same form as they were added (as tuples of length 6)
+        return iter(self.to_tuples())
+    
+    
+    @staticmethod
+    def get_index(lookup_tables: dict, table: str, element: (tuple | None)) -> int:
+        
+        # None is stored as -1
+        if element is None:
+            return -1
+        
+        # Retrieve the index, if already existing
+        index: (int | None) = lookup_tables[table + "_indices"].get(element)
+        
+        # Otherwise, add the element to the lookup table
+        if index is None:
+            index: int = len(lookup_tables[table + "s"])
+            lookup_tables[table + "s"].append(element)
+            lookup_tables[table + "_indices"][element]: int = index
+        
+        # Return the index
+        return index
+    
+    
+    def get_key_index(self, key: (tuple | None)) -> int:
+        
+        # Retrieve or add the activity/flow key
+        return self.get_index(lookup_tables = self.lookup_tables, table = "key", element = key)
+    
+    
+    def get_method_index(self, method: (tuple | None)) -> int:
+        
+        # Retrieve or add the method
+        return self.get_index(lookup_tables = self.lookup_tables, table = "method", element = method)
+    
+    
+    def _reserve(self, number_of_rows: int) -> int:
+        
+        # Current length, which is the position where new rows will be written to
+        start: int = self.length
+        
+        # Grow all columns in chunks, if the new rows do not fit anymore
+        if start + number_of_rows > len(self.columns["value"]):
+            
+            # New size of the columns
+            size: int = start + max(number_of_rows, self.chunk_size)
+            
+            # Loop through each column and copy it to a larger array
+            for name, column in self.columns.items():
+                new_column: np.array = np.zeros(size, dtype = column.dtype)
+                new_column[:start] = column[:start]
+                self.columns[name]: np.array = new_column
+        
+        # Update the length
+        self.length += number_of_rows
+        
+        # Return the position
+        return start
+    
+    
+    def add_arrays(self,
+                   activity: np.array,
+                   activity_amount: (np.ndarray | float | int),
+                   flow: np.array,
+                   flow_amount: (np.ndarray | float | int),
+                   value: np.array,
+                   method: (np.ndarray | int),
+                   **key_columns) -> None:
+        
+        # Number of rows to add
+        number_of_rows: int = len(value)
+        
+        # Reserve the space
+        start: int = self._reserve(number_of_rows)
+        
+        # Write the rows. Scalars are broadcasted to all rows
+        for name, array in (("activity", activity), ("activity_amount", activity_amount), ("flow", flow),
+                            ("flow_amount", flow_amount), ("value", value), ("method", method)):
+            self.columns[name][start:start + number_of_rows] = array
+        
+        # Write the additional key columns. Keys that are not given are None (-1)
+        for name in self.key_columns:
+            self.columns[name][start:start + number_of_rows] = key_columns.get(name, -1)
+    
+    
+    def add_tuples(self, rows: list[tuple]) -> None:
+        
+        # Return if there is nothing to add
+        if len(rows) == 0:
+            return
+        
+        # Write the rows. Keys and methods are converted to indices, missing amounts (None) to NaN
+        self.add_arrays(activity = np.array([self.get_key_index(m[0]) for m in rows], dtype = "int64"),
+                        activity_amount = np.array([m[1] for m in rows], dtype = "float64"),
+                        flow = np.array([self.get_key_index(m[2]) for m in rows], dtype = "int64"),
+                        flow_amount = np.array([np.nan if m[3] is None else m[3] for m in rows], dtype = "float64"),
+                        value = np.array([m[4] for m in rows], dtype = "float64"),
+                        method = np.array([self.get_method_index(m[5]) for m in rows], dtype = "int64"))
+    
+    
+    def extend(self, other) -> None:
+        
+        # Return if there is nothing to add
+        if len(other) == 0:
+            return
+        
+        # Map the indices of the other lookup tables to the indices of the own lookup tables. The last element maps -1 (None) to -1
+        key_mapping: np.array = np.array([self.get_key_index(m) for m in other.lookup_tables["keys"]] + [-1], dtype = "int64")
+        method_mapping: np.array = np.array([self.get_method_index(m) for m in other.lookup_tables["methods"]] + [-1], dtype = "int64")
+        
+        # Retrieve the columns of the other store
+        columns: dict[str, np.array] = other.get_columns()
+        
+        # Add the rows
+        self.add_arrays(activity = key_mapping[columns["activity"]],
+                        activity_amount = columns["activity_amount"],
+                        flow = key_mapping[columns["flow"]],
+                        flow_amount = columns["flow_amount"],
+                        value = columns["value"],
+                        method = method_mapping[columns["method"]],
+                        **{m: key_mapping[columns[m]] for m in self.key_columns})
+    
+    
+    def get_columns(self) -> dict[str, np.array]:
+        
+        # Return the used part of all columns
+        return {name: column[:self.length] for name, column in self.columns.items()}
+    
+    
+    def select(self, rows: np.ndarray):
+        
+        # Initialize a new store with its own lookup tables, which only contain the keys and methods of the selected rows
+        # The new store therefore does not depend on the lookup tables of this store and can e.g. be saved to a file
+        store: LCA_Result_Store = LCA_Result_Store(lookup_tables = self.create_lookup_tables(), chunk_size = max(len(rows), 1), key_columns = self.key_columns)
+        
+        # Return the empty store if there is nothing to select
+        if len(rows) == 0:
+            return store
+        
+        # Lookup tables, where the last element is used for the index -1 (None)
+        keys: list = self.lookup_tables["keys"] + [None]
+        methods: list = self.lookup_tables["methods"] + [None]
+        
+        # Retrieve the selected rows of all columns
+        columns: dict[str, np.array] = {name: column[rows] for name, column in self.get_columns().items()}
+        
+        # Map the keys and methods of the selected rows to the indices of the new lookup tables
+        key_column_names: tuple[str] = ("activity", "flow") + self.key_columns
+        key_indices, key_inverse = np.unique(np.concatenate([columns[m] for m in key_column_names]), return_inverse = True)
+        key_mapping: np.array = np.array([store.get_key_index(keys[m]) for m in key_indices], dtype = "int64")[key_inverse.reshape(-1)].reshape(len(key_column_names), len(rows))
+        method_indices, method_inverse = np.unique(columns["method"], return_inverse = True)
+        method_mapping: np.array = np.array([store.get_method_index(methods[m]) for m in method_indices], dtype = "int64")[method_inverse.reshape(-1)]
+        
+        # Add the rows
+        store.add_arrays(activity = key_mapping[0],
+                         activity_amount = columns["activity_amount"],
+                         flow = key_mapping[1],
+                         flow_amount = columns["flow_amount"],
+                         value = columns["value"],
+                         method = method_mapping,
+                         **{m: key_mapping[idx + 2] for idx, m in enumerate(self.key_columns)})
+        
+        # Return the new store
+        return store
+    
+    
+    def to_tuples(self, rows: (np.ndarray | None) = None) -> list[tuple]:
+        
+        # Lookup tables, where the last element is used for the index -1 (None)
+        keys: list = self.lookup_tables["keys"] + [None]
+        methods: list = self.lookup_tables["methods"] + [None]
+        
+        # Retrieve the columns
+        columns: dict[str, np.array] = self.get_columns()
+        
+        # Only keep the specified rows, if given
+        if rows is not None:
+            columns: dict[str, np.array] = {name: column[rows] for name, column in columns.items()}
+        
+        # Convert each row back to a tuple of length 6
+        return [(keys[a], float(a_amount), keys[f], None if np.isnan(f_amount) else float(f_amount), float(value), methods[m])
+                for a, a_amount, f, f_amount, value, m in zip(columns["activity"], columns["activity_amount"], columns["flow"],
+                                                              columns["flow_amount"], columns["value"], columns["method"])]
+
+
+
+#%%
+class LCA_Monte_Carlo_Statistics():
+    
+    def __init__(self,
+                 shape: tuple,
+                 sample_size: int = 250,
+                 seed: (np.random.SeedSequence | int | None) = None) -> None:
+        
+        """ Accumulates the statistics of Monte Carlo samples online, without keeping all samples in memory.
+        Mean and standard deviation are updated with each batch of samples (Welford/Chan), percentiles are calculated from a uniform random subset of the samples (reservoir sampling).
+        Memory is bounded by the kept samples, i.e. 'sample_size' x activities x methods x 8 bytes (e.g., 250 x 20000 x 12 x 8 bytes = 480 MB), independent of the number of samples that are added.
+        
+        
+        Parameters
+        ----------
+        shape : tuple
+            Shape of one sample, e.g. (activities, methods).
+        
+        sample_size : int
+            Maximum number of samples that are kept to calculate the percentiles. If not more samples are added, percentiles are exact. The default is 250.
+        
+        seed : (np.random.SeedSequence | int | None)
+            Seed of the random number generator which selects the samples that are kept. The default is None.
+        
+        """
+        
+        # Add to object
+        self.shape: tuple = tuple(shape)
+        self.sample_size: int = sample_size
+        self.random_number_generator: np.random.Generator = np.random.default_rng(seed)
+        
+        # Number of samples that were added
+        self.count: int = 0
+        
+        # Running mean and sum of squared deviations from the mean
+        self.mean: np.array = np.zeros(self.shape, dtype = "float64")
+        self.sum_of_squares: np.array = np.zeros(self.shape, dtype = "float64")
+        
+        # Samples that are kept to calculate the percentiles (samples x shape). Only the first 'number_of_kept_samples' are used
+        # The array grows (doubles) until it reaches the sample size, so that small simulations do not allocate the full sample size
+        self.reservoir: np.array = np.empty((0,) + self.shape, dtype = "float64")
+        self.number_of_kept_samples: int = 0
+    
+    
+    def _reserve(self, number_of_samples: int) -> None:
+        
+        # Return if the samples fit already
+        if number_of_samples <= len(self.reservoir):
+            return
+        
+        # Grow the reservoir by doubling, at most to the sample size
+        reservoir: np.array = np.empty((min(self.sample_size, max(number_of_samples, 2 * len(self.reservoir))),) + self.shape, dtype = "float64")
+        reservoir[:self.number_of_kept_samples] = self.reservoir[:self.number_of_kept_samples]
+        self.reservoir: np.array = reservoir
+    
+    
+    def add(self, samples: np.ndarray) -> None:
+        
+        # Return if there is nothing to add
+        if len(samples) == 0:
+            return
+        
+        # Number of samples, as well as their mean and sum of squared deviations
+        count: int = len(samples)
+        mean: np.array = samples.mean(axis = 0)
+        sum_of_squares: np.array = ((samples - mean) ** 2).sum(axis = 0)
+        
+        # Merge with the statistics of the previous samples
+        self._merge_moments(count = count, mean = mean, sum_of_squares = sum_of_squares)
+        
+        # Position of each sample in the stream of all samples that were added
+        positions: np.array = np.arange(self.count, self.count + count)
+        
+        # Reservoir sampling (algorithm R), for all samples at once: as long as the reservoir is not full, samples are added
+        # Afterwards, the sample at position t replaces a random kept sample with the probability sample size / (t + 1)
+        slots: np.array = np.where(positions < self.sample_size, positions, self.random_number_generator.integers(0, positions + 1))
+        replace: np.array = slots < self.sample_size
+        
+        # If the same slot is selected more than once, the last sample replaces the previous ones
+        slots, indices = slots[replace][::-1], np.flatnonzero(replace)[::-1]
+        slots, first = np.unique(slots, return_index = True)
+        
+        # Write the samples to the reservoir
+        self._reserve(number_of_samples = min(self.sample_size, self.count + count))
+        self.reservoir[slots] = samples[indices[first]]
+        
+        # Update
+        self.count += count
+        self.number_of_kept_samples: int = min(self.sample_size, self.count)
+    
+    
+    def _merge_moments(self, count: int, mean: np.ndarray, sum_of_squares: np.ndarray) -> None:
+        
+        # Total number of samples
+        total: int = self.count + count
+        
+        # Update the sum of squared deviations and the mean with the parallel algorithm of Chan et al.
+        delta: np.array = mean - self.mean
+        self.sum_of_squares += sum_of_squares + delta ** 2 * self.count * count / total
+        self.mean += delta * count / total
+    
+    
+    def merge(self, other) -> None:
+        
+        # Return if there is nothing to add
+        if other.count == 0:
+            return
+        
+        # Merge the mean and the sum of squared deviations
+        self._merge_moments(count = other.count, mean = other.mean, sum_of_squares = other.sum_of_squares)
+        
+        # The kept samples of both statistics are uniform random subsets of their samples. A uniform random subset of all samples contains a hypergeometric number of samples of each of them
+        number_of_kept_samples: int = min(self.sample_size, self.count + other.count)
+        number_of_own_samples: int = int(self.random_number_generator.hypergeometric(self.count, other.count, number_of_kept_samples)) if self.count > 0 else 0
+        
+        # Select the samples of both statistics uniformly at random. The own samples are moved to the beginning of the reservoir
+        own_samples: np.array = np.sort(self.random_number_generator.choice(self.number_of_kept_samples, size = number_of_own_samples, replace = False))
+        other_samples: np.array = np.sort(self.random_number_generator.choice(other.number_of_kept_samples, size = number_of_kept_samples - number_of_own_samples, replace = False))
+        
+        # Write the samples to the reservoir
+        self._reserve(number_of_samples = number_of_kept_samples)
+        self.reservoir[:number_of_own_samples] = self.reservoir[own_samples]
+        self.reservoir[number_of_own_samples:number_of_kept_samples] = other.reservoir[other_samples]
+        
+        # Update
+        self.count += other.count
+        self.number_of_kept_samples: int = number_of_kept_samples
+    
+    
+    def get_standard_deviation(self) -> np.array:
+        
+        # Sample standard deviation. It is not defined for less than 2 samples
+        return np.sqrt(self.sum_of_squares / (self.count - 1)) if self.count > 1 else np.full(self.shape, np.nan)
+    
+    
+    def get_percentiles(self, percentiles: tuple) -> np.array:
+        
+        # Calculate the percentiles from the kept samples (percentiles x shape)
+        return np.percentile(self.reservoir[:self.number_of_kept_samples], percentiles, axis = 0)
+
+
 
 #%%
 
@@ -25,7 +438,21 @@ class LCA_Calculation():
                  methods: list,
                  functional_amount: (float | int) = 1,
                  cut_off_percentage: (float | int | None) = None,
+                 top_k_contributions: (int | None) = None,
                  exchange_level: int = 1,
+                 solve_in_batches: bool = False,
+                 batch_size: int = 250,
+                 solver: str = "direct",
+                 solver_tolerance: (float | int) = 1e-10,
+                 number_of_workers: int = 1,
+                 chunk_size: int = 100,
+                 share_matrices_between_workers: bool = True,
+                 use_unified_system: bool = False,
+                 cache_matrices_on_disk: bool = False,
+                 score_exchanges_with_unit_scores: bool = False,
+                 graph_traversal_cut_off: (float | int) = 0.005,
+                 graph_traversal_max_nodes: int = 1000,
+                 result_cache_path: (pathlib.Path | str | None) = None,
                  print_progress_bar: bool = True) -> None:
         
         """ A class that provides functions to do fast and efficient LCA calculations in Brightway2
@@ -52,6 +479,13 @@ class LCA_Calculation():
             The higher the percentage, the higher the cut off for scores and therefore the shorter the list.
             Impacts that are cut will be summarised into a 'Rest' value.
             The default is None (no cut off applied).
+        
+        top_k_contributions : (int | None)
+            Will only be applied in case LCIA emission contribution and LCIA process contribution are calculated. Needs to be >= 1.
+            When a number is indicated (not None), only the k largest (absolute) contributing emissions or processes are kept for each activity and method.
+            If a cut off percentage is indicated as well, only contributions above the cut off are kept, of which at most k.
+            Impacts that are cut will be summarised into a 'Rest' value.
+            The default is None (all contributions are kept).
             
         exchange_level : int
             Needs to be >= 1 in order to work. Specifies at which level/tier the exchanges of an activity should be extracted from.
@@ -59,6 +493,71 @@ class LCA_Calculation():
             Important: for emissions, there are no subsequent levels. It would be wrong to just avoid them. That's why for emissions the level might be smaller than what is specified here.
             The default is 1.
         
+        solve_in_batches : bool
+            Specifies whether the technosphere matrix of each database should be factorized once and the activities of that database be solved in blocks (multiple demand vectors at once).
+            Instead of solving the whole linear system again for every activity, the factorization is reused for all activities of the same database.
+            Results are the same as when solving activity by activity. The default is False.
+        
+        batch_size : int
+            Only used if 'solve_in_batches' is True. Specifies how many activities (= demand vectors) are solved together in one block.
+            The higher the value, the more memory is needed (number of products x batch size). The default is 250.
+        
+        solver : str
+            Specifies how the linear systems are solved. Can be one of the following:
+            'direct' uses a sparse LU decomposition (as Brightway does), which is exact but might need a lot of memory for very large databases because of fill-in.
+            'decomposition' splits the technosphere into its strongly connected components once. Only the cyclic components are decomposed (LU), all other activities are calculated by back-substitution in topological order.
+            This is exact as well and needs less memory and time if large parts of the databases are acyclic (e.g., foreground inventories on top of a background database).
+            'bicgstab' or 'gmres' use the respective iterative solver with an incomplete LU decomposition as preconditioner, which is built once per database.
+            Results of the iterative solvers are accurate up to 'solver_tolerance' and therefore differ slightly from the ones of the direct solver. The default is 'direct'.
+        
+        solver_tolerance : (float | int)
+            Only used if 'solver' is 'bicgstab' or 'gmres'. Relative tolerance of the residual at which the iterative solver stops. The value needs to be greater than 0.
+            The smaller the value, the closer the results are to the ones of the direct solver, but the more iterations are needed. The default is 1e-10.
+        
+        number_of_workers : int
+            Specifies on how many processes (CPU cores) the calculation should run. With a value of 1, everything is calculated in the current process.
+            With more than 1 worker, activities are split by database into chunks which are calculated in a process pool. Each worker keeps its own LCA objects (and factorizations).
+            Important: on Windows, the script that starts the calculation needs to be guarded with 'if __name__ == "__main__":', since worker processes import it again.
+            The default is 1.
+        
+        chunk_size : int
+            Only used if 'number_of_workers' is greater than 1. Specifies how many activities (of the same database) are sent to a worker at once.
+            Results do not depend on the number of workers, since chunks are always put together in the same order. The default is 100.
+        
+        share_matrices_between_workers : bool
+            Only used if 'number_of_workers' is greater than 1. Specifies whether the matrices of each database (technosphere, biosphere and characterization) are built once
+            and put into shared memory, from where all workers read them without copying. Otherwise, each worker builds its own matrices. The default is True.
+        
+        use_unified_system : bool
+            Specifies whether all activities should be calculated in one combined system, which contains the databases of all activities and all databases they depend on (e.g., a common background database).
+            The combined system is built and factorized only once, instead of building and factorizing a separate system for each database that contains the same background again.
+            Results are the same as when each database is calculated separately. The default is False.
+        
+        cache_matrices_on_disk : bool
+            Specifies whether the matrices of each database (technosphere, biosphere, characterization and exchanges) and the dictionaries of the rows and columns should be saved to files in the project directory.
+            In later sessions, the files are memory-mapped instead of building the matrices again with Brightway. Files are identified by the processed data of the databases and methods,
+            which means that they are built again whenever a database or method is modified (processed) in Brightway. The default is False.
+        
+        score_exchanges_with_unit_scores : bool
+            Only used if LCIA scores of exchanges are calculated. Specifies whether the scores of one unit of every activity of a database should be calculated once (with the transposed system, see 'calculate_LCIA_scores_of_all_activities').
+            The score of an exchange is then the flow amount multiplied with the unit score, instead of solving the linear system once for every exchange that was not yet calculated.
+            This is faster if many different exchanges are scored. The default is False.
+        
+        graph_traversal_cut_off : (float | int)
+            Only used if the supply chain graph is calculated. The value needs to be between 0 and 1.
+            Suppliers whose cumulative score is smaller than this share of the total score of the activity are not added to the graph (and not expanded further).
+            The default is 0.005.
+        
+        graph_traversal_max_nodes : int
+            Only used if the supply chain graph is calculated. Specifies how many nodes (activities) are expanded at most per activity and method.
+            The graph is expanded as a tree, i.e. an activity that supplies several consumers is expanded once per path, with the amount of that path. Nodes are expanded in the order of their cumulative score, the ones with the highest (absolute) score first. The default is 1000.
+        
+        result_cache_path : (pathlib.Path | str | None)
+            Path to a SQLite file, where the results of each activity are cached. The file is created if not yet existing.
+            Results are stored per database, methods, settings (incl. the solver and, for the iterative solvers, its tolerance), activity, functional amount and result type. Databases and methods are identified by a fingerprint of their matrices,
+            so that only activities of databases or methods that were modified since the last calculation are calculated again. All other results are loaded from the file.
+            The default is None (no cache is used).
+        
         print_progress_bar : bool
             Specifies whether to print a progress bar to the console indicating the progress of the calculation
             
@@ -93,6 +592,38 @@ class LCA_Calculation():
         if cut_off_percentage is not None and (cut_off_percentage < 0 or cut_off_percentage > 1):
             raise ValueError("Input variable 'cut_off_percentage' needs to be between 0 and 1 but is currently '" + str(cut_off_percentage) + "'.")
         
+        # Raise error if the cut off of the graph traversal is not between 0 and 1
+        if graph_traversal_cut_off < 0 or graph_traversal_cut_off > 1:
+            raise ValueError("Input variable 'graph_traversal_cut_off' needs to be between 0 and 1 but is currently '" + str(graph_traversal_cut_off) + "'.")
+        
+        # Raise error if the number of nodes to expand is smaller than 1
+        if graph_traversal_max_nodes < 1:
+            raise ValueError("Input variable 'graph_traversal_max_nodes' needs to be greater than 0 but is currently '" + str(graph_traversal_max_nodes) + "'.")
+        
+        # Raise error if the number of contributions to keep is smaller than 1
+        if top_k_contributions is not None and top_k_contributions < 1:
+            raise ValueError("Input variable 'top_k_contributions' needs to be greater than 0 but is currently '" + str(top_k_contributions) + "'.")
+        
+        # Raise error if the batch size is smaller than 1
+        if batch_size < 1:
+            raise ValueError("Input variable 'batch_size' needs to be greater than 0 but is currently '" + str(batch_size) + "'.")
+        
+        # Raise error if the solver is not available
+        if solver not in ("direct", "decomposition", "bicgstab", "gmres"):
+            raise ValueError("Input variable 'solver' needs to be one of 'direct', 'decomposition', 'bicgstab' or 'gmres' but is currently '" + str(solver) + "'.")
+        
+        # Raise error if the tolerance of the iterative solver is not greater than 0
+        if solver_tolerance <= 0:
+            raise ValueError("Input variable 'solver_tolerance' needs to be greater than 0 but is currently '" + str(solver_tolerance) + "'.")
+        
+        # Raise error if the number of workers is smaller than 1
+        if number_of_workers < 1:
+            raise ValueError("Input variable 'number_of_workers' needs to be greater than 0 but is currently '" + str(number_of_workers) + "'.")
+        
+        # Raise error if the chunk size is smaller than 1
+        if chunk_size < 1:
+            raise ValueError("Input variable 'chunk_size' needs to be greater than 0 but is currently '" + str(chunk_size) + "'.")
+        
         # Loop through each activity and construct the key tuple if not yet existing
         for activity in activities:
             
@@ -113,17 +644,50 @@ class LCA_Calculation():
         # The functional unit is defined as 1
         self.functional_amount: (int | float) = functional_amount
         
+        # Functional amounts to which the results are scaled when they are retrieved, if specified in 'calculate'
+        self.functional_amounts: (tuple | None) = None
+        
         # Add to object
         self.activities: list[bw2data.backends.peewee.proxies.Activity] = activities
         self.methods: list[tuple] = methods
         self.cut_off_percentage: (int | float) = cut_off_percentage
+        self.top_k_contributions: (int | None) = top_k_contributions
         self.exchange_level: int = exchange_level
+        self.solve_in_batches: bool = solve_in_batches
+        self.batch_size: int = batch_size
+        self.solver: str = solver
+        self.solver_tolerance: (float | int) = solver_tolerance
+        self.number_of_workers: int = number_of_workers
+        self.chunk_size: int = chunk_size
+        self.share_matrices_between_workers: bool = share_matrices_between_workers
+        self.use_unified_system: bool = use_unified_system
+        self.cache_matrices_on_disk: bool = cache_matrices_on_disk
+        self.score_exchanges_with_unit_scores: bool = score_exchanges_with_unit_scores
+        self.graph_traversal_cut_off: (float | int) = graph_traversal_cut_off
+        self.graph_traversal_max_nodes: int = graph_traversal_max_nodes
+        self.result_cache_path: (pathlib.Path | str | None) = result_cache_path
         self.progress_bar: bool = print_progress_bar
         
         # Defaults
         self.rest_key: tuple = (None, None)
         self.rest_name: str = "Rest"
         
+        # Settings of the incomplete LU decomposition, which is used as preconditioner for the iterative solvers
+        self.preconditioner_drop_tolerance: float = 1e-5
+        self.preconditioner_fill_factor: (float | int) = 10
+        
+        # Maximum number of codes that are queried at once when the meta data of activities is prefetched
+        # SQLite limits the number of variables in a query, therefore we stay well below that limit
+        self.metadata_batch_size: int = 500
+        
+        # Name of the combined system of all databases and the databases it is built from, if specified
+        # The databases are sorted, so that the same system is built independent of the order of the activities
+        self.name_unified_system: str = "Unified_system"
+        self.unified_system_databases: list[str] = sorted({m.key[0] for m in activities})
+        
+        # Directory of the project where the matrices are cached, if specified
+        self.matrix_cache_directory: pathlib.Path = pathlib.Path(bw2data.projects.dir) / "calculation_matrices"
+        
         # Definition of names to be used for the different results
         self.name_LCIA_scores: str = "LCIA_scores"
         self.name_LCIA_immediate_scores: str = "LCIA_scores_of_exchanges"
@@ -132,23 +696,40 @@ class LCA_Calculation():
         self.name_LCI_process_contributions: str = "LCI_process_contribution"
         self.name_LCIA_emission_contributions: str = "LCIA_emission_contribution"
         self.name_LCIA_process_contributions: str = "LCIA_process_contribution"
+        self.name_LCIA_supply_chain_graph: str = "LCIA_supply_chain_graph"
+        self.name_LCIA_scores_Monte_Carlo: str = "LCIA_scores_MC"
+        self.name_LCIA_scores_what_if: str = "LCIA_scores_what_if"
         self.name_characterization_factors: str = "Characterization_factors"
         
+        # Lookup tables for activity/flow keys and methods, which are used by the structured arrays and the result stores
+        self.lookup_tables: dict = LCA_Result_Store.create_lookup_tables()
+        
         self.activities_as_dict: dict = {}
         self.database_objects: dict = {}
         self.method_objects: dict = {}
         self.method_units: dict = {}
         self.characterization_factors: dict = {}
         self.lca_objects: dict = {} # almost everywhere
-        self.characterization_matrices: dict = {} # LCIA score, LCIA emission contr., LCIA process contr.
+        self.shared_LCA_objects: dict = {} # parallel calculation
+        self.stacked_characterization_matrices: dict = {} # LCIA score, LCIA emission contr., LCIA process contr.
+        self.method_indices_of_stacked_characterization_matrices: dict = {} # LCIA score, LCIA emission contr., LCIA process contr.
+        self.characterized_biosphere_matrices: dict = {} # LCIA process contr.
+        self.factorized_technospheres: dict = {} # batched solving
+        self.preconditioners: dict = {} # iterative solving
+        self.technosphere_decompositions: dict = {} # solving by decomposition
+        self.activity_keys_by_database: dict = {} # batched solving
+        self._temporary_supply_arrays: dict = {} # batched solving
+        self.product_indices_of_activities: dict = {} # LCIA scores of all activities
+        self.unit_scores: dict = {} # LCIA scores of all activities
         self.biosphere_dicts_as_arrays: dict = {} # LCI emission contr., LCIA emission contr.
         self.activity_dicts_as_arrays: dict = {} # LCI process contr., LCIA process contr.
-        self.element_arrays: dict = {} # all contributions, LCI & LCIA, emission & process
-        self.structured_arrays_for_emission_contribution: dict = {} # LCI emission contr, LCIA emission contr.
-        self.structured_arrays_for_process_contribution: dict = {} # LCI process contr, LCIA process contr.
-        self.method_arrays_for_LCIA_emission_contribution: dict = {} # LCIA emission contr.
-        self.method_arrays_for_LCIA_process_contribution: dict = {} # LCIA process contr.
-        self._temporary_key_to_exchanges_mapping: dict = {}
+        self.exchange_matrices: dict = {} # LCI exchanges, LCIA scores of exchanges
+        self.exchange_parameters: dict = {} # LCI exchanges, LCIA scores of exchanges
+        self.technosphere_matrices_as_csc: dict = {} # LCIA supply chain graph
+        self.uncertainty_parameters: dict = {} # Monte Carlo
+        self.database_fingerprints: dict = {} # result cache
+        self.methods_fingerprints: dict = {} # result cache
+        self.result_cache_connection: (sqlite3.Connection | None) = None # result cache
         self._temporary_score_results: dict = {}
         
         # Keys to extract from the activity dicts
@@ -275,685 +856,2572 @@ class LCA_Calculation():
         return act_as_dict
     
     
+    def _prefetch_acts_as_dicts(self, act_keys: list[tuple[str, str]], keys_to_extract: (tuple[str] | None) = None) -> None:
+        
+        # Collect the codes of all keys that have not been loaded yet, per database
+        # None and the rest key do not have meta data
+        codes_by_database: dict[str, set] = {}
+        for act_key in act_keys:
+            if act_key is not None and act_key != self.rest_key and self.activities_as_dict.get(act_key) is None:
+                codes_by_database.setdefault(act_key[0], set()).add(act_key[1])
+        
+        # Loop through each database individually
+        for database, codes in codes_by_database.items():
+            
+            # Sort the codes, to query them in batches
+            codes: list[str] = sorted(codes)
+            
+            # Load the data of a batch of activities with one query
+            for start in range(0, len(codes), self.metadata_batch_size):
+                
+                # Query all activities of the current batch at once
+                query = (bw2data.backends.peewee.ActivityDataset
+                         .select(bw2data.backends.peewee.ActivityDataset.data, bw2data.backends.peewee.ActivityDataset.code)
+                         .where(bw2data.backends.peewee.ActivityDataset.database == database,
+                                bw2data.backends.peewee.ActivityDataset.code.in_(codes[start:start + self.metadata_batch_size])))
+                
+                # Loop through each activity that was found
+                for row in query:
+                    
+                    # Extract the relevant keys, or if None is specified, the whole dictionary
+                    act_as_dict: dict = {i: row.data.get(i) for i in keys_to_extract} if keys_to_extract is not None else {**row.data, "database": database, "code": row.code}
+                    
+                    # Save the dict temporarily
+                    self.activities_as_dict[(database, row.code)]: dict = act_as_dict
+        
+        # Keys which have not been found are not added here
+        # They are loaded individually by '_get_act_as_dict' later on, which raises the error of Brightway if they do not exist
+    
+    
+    def _get_system_of_database(self, database: str) -> str:
+        
+        # All databases are calculated in the same system, if specified
+        if self.use_unified_system:
+            return self.name_unified_system
+        
+        # Otherwise, each database is its own system
+        return database
+    
+    
+    def _get_databases_of_system(self, system: str) -> list[str]:
+        
+        # The combined system consists of the databases of all activities
+        if system == self.name_unified_system:
+            return self.unified_system_databases
+        
+        # Otherwise, the system consists of the database itself
+        return [system]
+    
+    
     def _get_LCA_object(self, database: str) -> bw2calc.lca.LCA:
         
         # Simply return, if already existing
         if self.lca_objects.get(database) is not None:
             return self.lca_objects[database]
         
-        # Extract first inventory and method to then initialise lca object
-        _act: bw2data.backends.peewee.proxies.Activity = self._get_database_object(database = database).random()
+        # If the matrices have been put into shared memory by another process, we attach to them instead of building them again
+        if self.shared_LCA_objects.get(database) is not None:
+            return self._attach_LCA_object_from_shared_memory(database = database)
+        
+        # If the matrices have been cached on disk in a previous session, we load (memory-map) them instead of building them again
+        if self.cache_matrices_on_disk and self._get_matrix_cache_directory_of_database(database = database).exists():
+            return self._load_LCA_object_from_disk(database = database)
+        
+        # Extract first inventory of each database of the system and first method to then initialise lca object
+        _acts: list[bw2data.backends.peewee.proxies.Activity] = [self._get_database_object(database = m).random() for m in self._get_databases_of_system(system = database)]
         _met: tuple = self.methods[0]
         
         # LCA object generation will fail for biosphere databases
         # However, we do not need an LCA object for biosphere databases but only the characterization factors
         
-        # Create the Brightway2 LCA object from the first activity and method.
+        # Create the Brightway2 LCA object from the first activities and method.
         # This takes a little bit long, and therefore this step is only done once. The object will be reused in the calculation            
-        lca_object: bw2calc.lca.LCA = bw2calc.LCA({_act.key: self.functional_amount}, method = _met)
+        lca_object: bw2calc.lca.LCA = bw2calc.LCA({m.key: self.functional_amount for m in _acts}, method = _met)
         
-        # Calculate inventory once to load all database data
-        lca_object.lci()
+        # Load the matrices and dictionaries of all database data
+        # We do not calculate the inventory here, since the linear system is solved later on for each activity anyway
+        lca_object.load_lci_data()
         
-        # Load method data 
-        lca_object.lcia()
+        # Load method data, which builds the characterization matrix without characterizing an inventory
+        lca_object.load_lcia_data()
         
-        # Append to dictionary and initialize a dictionary to store the characterized matrices to
+        # Append to dictionary
         self.lca_objects[database]: bw2calc.lca.LCA = lca_object
-        self.characterization_matrices[database]: dict = {}
         
-        # Loop through each method to build the characterization matrices
+        # Initialize a dictionary to map the characterization factors of a method to a row of the stacked characterization matrix
+        # Methods with identical characterization factors (e.g., the same method imported from SimaPro and XML) are only stored once
+        unique_rows: dict[bytes, int] = {}
+        characterization_factors: list[np.array] = []
+        method_indices: list[int] = []
+        
+        # Loop through each method to build the characterization factors
         for met in self.methods:
             
             # Switch to new method
             lca_object.switch_method(met)
             
-            # Extract the characterization matrix and write to dictionary
-            self.characterization_matrices[database][met] = lca_object.characterization_matrix.copy()
+            # Extract the characterization factors from the diagonal of the characterization matrix
+            cfs: np.array = lca_object.characterization_matrix.diagonal()
+            
+            # Use the raw data as identifier, to detect identical characterization factors
+            identifier: bytes = cfs.tobytes()
+            
+            # Add the characterization factors if not yet existing
+            if unique_rows.get(identifier) is None:
+                unique_rows[identifier]: int = len(characterization_factors)
+                characterization_factors += [cfs]
+            
+            # Add the row of the method
+            method_indices += [unique_rows[identifier]]
         
-        # Return the lca object
-        return self.lca_objects[database]
-    
-    
-    def _get_characterization_matrix(self, database: str, method: str):
+        # Stack all unique characterization factors into one matrix (unique methods x biosphere flows) and write to dictionary
+        self.stacked_characterization_matrices[database]: sparse.csr_matrix = sparse.csr_matrix(np.vstack(characterization_factors))
+        self.method_indices_of_stacked_characterization_matrices[database]: np.array = np.array(method_indices, dtype = "int64")
         
-        # Simply return if already existing
-        if self.characterization_matrices.get(database) is not None:
-            return self.characterization_matrices[database][method]
-
-        # Otherwise, create BW object and matrices
-        self._get_LCA_object(database = database)
+        # Save the matrices to disk, so that they do not need to be built again in later sessions
+        if self.cache_matrices_on_disk:
+            self._save_LCA_object_to_disk(database = database)
         
-        # Return the matrix
-        return self.characterization_matrices[database][method]
-    
+        # Return the lca object
+        return self.lca_objects[database]
     
     
-    def _get_biosphere_dict_as_array(self, database: str) -> np.array:
-        
-        # Simply return if already existing
-        if self.biosphere_dicts_as_arrays.get(database) is not None:
-            return self.biosphere_dicts_as_arrays[database]
+    def _get_matrices_of_LCA_object(self, database: str) -> tuple[dict[str, sparse.csr_matrix], dict]:
         
-        # Retrieve the lca object
+        # Retrieve the lca object, the stacked characterization matrix and the row of each method
         lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
         
-        # Write the biosphere dict as array
-        biosphere_array: np.array = np.array([str(m) for m in lca_object.biosphere_dict.keys()], dtype = "U")
+        # Matrices that are needed to calculate a database without the data of Brightway
+        matrices: dict[str, sparse.csr_matrix] = {"technosphere_matrix": lca_object.technosphere_matrix.tocsr(),
+                                                  "biosphere_matrix": lca_object.biosphere_matrix.tocsr(),
+                                                  "stacked_characterization_matrix": self._get_stacked_characterization_matrix(database = database),
+                                                  "technosphere_exchange_matrix": self._get_exchange_matrices(database = database)["technosphere_exchange_matrix"],
+                                                  "biosphere_exchange_matrix": self._get_exchange_matrices(database = database)["biosphere_exchange_matrix"]}
         
-        # Temporarily store
-        self.biosphere_dicts_as_arrays[database]: np.array = biosphere_array
+        # Sort the indices, so that the buffers of the matrices never need to be changed later on (e.g., when they are shared or read-only)
+        for matrix in matrices.values():
+            matrix.sort_indices()
         
-        # Return the array
-        return biosphere_array
-    
+        # The dictionaries and method indices that belong to the matrices
+        dictionaries: dict = {"activity_dict": lca_object.activity_dict,
+                              "product_dict": lca_object.product_dict,
+                              "biosphere_dict": lca_object.biosphere_dict,
+                              "method_indices": self._get_method_indices_of_stacked_characterization_matrix(database = database)}
+        
+        # Return
+        return matrices, dictionaries
     
     
-    def _get_activity_dict_as_array(self, database: str) -> np.array:
-        
-        # Simply return if already existing
-        if self.activity_dicts_as_arrays.get(database) is not None:
-            return self.activity_dicts_as_arrays[database]
-        
-        # Retrieve the lca object
-        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
-        
-        # Write the activity dict as array
-        activity_array: np.array = np.array([str(m) for m in lca_object.activity_dict.keys()], dtype = "U")
-        
-        # Temporarily store
-        self.activity_dicts_as_arrays[database]: np.array = activity_array
+    def _set_LCA_object_from_matrices(self, database: str, matrices: dict[str, sparse.csr_matrix], dictionaries: dict) -> bw2calc.lca.LCA:
+        
+        # Create an empty Brightway2 LCA object, without loading any database data
+        # Only the matrices and dictionaries that are needed to solve the linear system are set
+        lca_object: bw2calc.lca.LCA = bw2calc.LCA.__new__(bw2calc.LCA)
+        lca_object.logger: logging.Logger = logging.getLogger("bw2calc")
+        lca_object.technosphere_matrix: sparse.csr_matrix = matrices["technosphere_matrix"]
+        lca_object.biosphere_matrix: sparse.csr_matrix = matrices["biosphere_matrix"]
+        lca_object.activity_dict: dict = dictionaries["activity_dict"]
+        lca_object.product_dict: dict = dictionaries["product_dict"]
+        lca_object.biosphere_dict: dict = dictionaries["biosphere_dict"]
+        
+        # Write to dictionaries
+        self.lca_objects[database]: bw2calc.lca.LCA = lca_object
+        self.stacked_characterization_matrices[database]: sparse.csr_matrix = matrices["stacked_characterization_matrix"]
+        self.method_indices_of_stacked_characterization_matrices[database]: np.array = dictionaries["method_indices"]
+        self._set_exchange_matrices(database = database,
+                                    technosphere_exchange_matrix = matrices["technosphere_exchange_matrix"],
+                                    biosphere_exchange_matrix = matrices["biosphere_exchange_matrix"])
         
-        # Return the array
-        return activity_array
+        # Return the lca object
+        return lca_object
     
     
-    def _get_element_array(self, element: (str | None | tuple), length: int, dtype: (str | None)) -> np.array:
+    def _get_matrix_cache_directory_of_database(self, database: str) -> pathlib.Path:
         
-        # Simply return if already existing
-        if self.element_arrays.get((element, length, dtype)) is not None:
-            return self.element_arrays[(element, length, dtype)]
+        # The matrices contain the data of the database(s) of the system and of all databases they depend on, as well as the data of all methods
+        databases: list[str] = sorted(set().union(*[self._get_database_object(database = m).find_graph_dependents() for m in self._get_databases_of_system(system = database)]))
         
-        # Construct an array with only elements and length indicated
-        element_array: np.array = np.array([element] * length, dtype = dtype)
+        # Initialize the fingerprint with the names of the databases and methods
+        fingerprint = hashlib.blake2b(repr((database, databases, self.methods)).encode(), digest_size = 16)
         
-        # Add the matrix to the temporary dict
-        self.element_arrays[(element, length, dtype)]: np.array = element_array
+        # Brightway writes the processed data of a database or method to a new file, whenever it is modified
+        # The path, modification time and size of those files therefore identify the revision of the databases and methods
+        for filepath in [self._get_database_object(database = m).filepath_processed() for m in databases] + [self._get_method_object(method = m).filepath_processed() for m in self.methods]:
+            stat: os.stat_result = os.stat(filepath)
+            fingerprint.update(repr((str(filepath), stat.st_mtime_ns, stat.st_size)).encode())
         
-        # Return the matrix
-        return element_array
+        # Return the directory of the revision
+        return self.matrix_cache_directory / fingerprint.hexdigest()
     
     
-    def _apply_cut_off_to_structured_array(self, structured_array: np.array, cut_off: (float | None)) -> np.array:
-        
-        # Exclude all values that are 0
-        array: np.array = structured_array[structured_array["value"] != 0]
-        
-        # If no cutoff is specified, simply return the array. We don't need to go on
-        if cut_off is None:
-            return array
-        
-        # If the array is empty, return
-        if len(array) == 0:
-            return array
+    def _save_LCA_object_to_disk(self, database: str) -> None:
         
-        # Temporarily save the last row
-        last: tuple = tuple(array[-1:])
+        # Retrieve the matrices, dictionaries and method indices of the database
+        matrices, dictionaries = self._get_matrices_of_LCA_object(database = database)
         
-        # Select (= mask) all values that are above and below 0
-        mask_under_0: np.array = array["value"] < 0
-        mask_over_0: np.array = array["value"] > 0
+        # Directory where the files are saved to
+        directory: pathlib.Path = self._get_matrix_cache_directory_of_database(database = database)
         
-        # Retrieve the arrays with values above and below 0, separately
-        under_0: np.array = array[mask_under_0]
-        over_0: np.array = array[mask_over_0]
+        # Write all files to a temporary directory first, so that other processes never read incomplete files
+        self.matrix_cache_directory.mkdir(parents = True, exist_ok = True)
+        temporary_directory: pathlib.Path = pathlib.Path(tempfile.mkdtemp(dir = self.matrix_cache_directory))
         
-        # Identify the limit/treshold from where on values will be excluded
-        # We do the sum and then multiply it with the cut off indicated
-        min_treshold = sum(under_0["value"]) * cut_off
-        max_treshold = sum(over_0["value"]) * cut_off
+        # Write the CSR buffers (data, indices, indptr) of each matrix to a separate file, which can be memory-mapped
+        for name, matrix in matrices.items():
+            for buffer_name, array in (("data", matrix.data), ("indices", matrix.indices), ("indptr", matrix.indptr)):
+                np.save(temporary_directory / (name + "_" + buffer_name + ".npy"), array)
         
-        # Select arrays again, only containing the values that are not excluded by the cut off
-        mask_min_treshold = under_0["value"] < min_treshold
-        mask_max_treshold = over_0["value"] > max_treshold
+        # Write the dictionaries and the shapes of the matrices
+        with open(temporary_directory / "dictionaries.pickle", "wb") as file:
+            pickle.dump({**dictionaries, "shapes": {name: matrix.shape for name, matrix in matrices.items()}}, file)
         
-        # Retrieve the rest amount as a sum of everything that was excluded
-        rest_amount = sum(under_0["value"][~mask_min_treshold]) + sum(over_0["value"][~mask_max_treshold])
+        # Move the files to the final directory
+        try:
+            os.rename(temporary_directory, directory)
         
-        # Construct a tuple for the rest
-        updated_last: tuple = (last[0][0],
-                               last[0][1],
-                               str(self.rest_key),
-                               None,
-                               rest_amount,
-                               last[0][5]
-                               )
-        # Write the rest as array
-        rest: np.array = np.array([updated_last], dtype = structured_array.dtype)
-        
-        # Add all together
-        constructed = np.concatenate((over_0[mask_max_treshold], under_0[mask_min_treshold], rest), axis = 0)
-        
-        # Return
-        return constructed
-    
+        except OSError:
+            # Another process has already saved the same matrices in the meantime. We keep those
+            shutil.rmtree(temporary_directory, ignore_errors = True)
     
     
-    def _get_structured_array_for_LCI_emission_contribution(self, database: str) -> np.array:
-        
-        # If already existing, simply return
-        if self.structured_arrays_for_emission_contribution.get(database) is not None:
-            return self.structured_arrays_for_emission_contribution[database][None]
-        
-        # Get the biosphere dictionary as an array
-        biosphere_array: np.array = self._get_biosphere_dict_as_array(database = database)
-        
-        # Extract the length of the array, since everything needs to be at this length
-        length_biosphere_array: int = biosphere_array.shape[0]
-        
-        # Construct an array with only the None's and the length of the biosphere array
-        none_array: np.array = self._get_element_array(element = None, length = length_biosphere_array, dtype = object)
+    def _load_LCA_object_from_disk(self, database: str) -> bw2calc.lca.LCA:
         
-        # Construct an array with the functional amount and the length of the biosphere array
-        functional_amount_array: np.array = self._get_element_array(element = self.functional_amount, length = length_biosphere_array, dtype = "float64")
-        functional_amount_array_dtype = functional_amount_array.dtype
+        # Directory where the files have been saved to
+        directory: pathlib.Path = self._get_matrix_cache_directory_of_database(database = database)
         
-        # Construct a placeholder array with a random activity key and the length of the biosphere array
-        # Note that storing a tuple in an array would be doable, but we then run into issues converting it back
-        # That's why we cast the tuple to a string first
-        activity_key_array: np.array = self._get_element_array(element = str(self.activities[0].key), length = length_biosphere_array, dtype = "U")
+        # Load the dictionaries and the shapes of the matrices
+        with open(directory / "dictionaries.pickle", "rb") as file:
+            dictionaries: dict = pickle.load(file)
         
-        # Extract the array type from the inventory
-        inventory_dtype = self._get_LCA_object(database = database).inventory.dtype
+        # Initialize a dictionary to store the matrices to
+        matrices: dict[str, sparse.csr_matrix] = {}
         
-        # Construct a 0 array for the values (this one will be overwritten later)
-        value_array: np.array = np.zeros(length_biosphere_array, dtype = inventory_dtype)
-        
-        # Construct dtypes for the structured array
-        dtype: list[tuple] = [("activity_key", activity_key_array.dtype),
-                              ("functional_amount", functional_amount_array_dtype),
-                              ("flow_key", biosphere_array.dtype),
-                              ("flow_amount", none_array.dtype),
-                              ("value", inventory_dtype),
-                              ("method", none_array.dtype)
-                              ]
-                
-        # Build structured array and add to dictionary
-        self.structured_arrays_for_emission_contribution[database]: dict[(tuple | None), np.array] = {None: np.core.records.fromarrays([activity_key_array,
-                                                                                                                                        functional_amount_array,
-                                                                                                                                        biosphere_array,
-                                                                                                                                        none_array,
-                                                                                                                                        value_array,
-                                                                                                                                        none_array
-                                                                                                                                        ], dtype = dtype)}
+        # Loop through each matrix and build it from the memory-mapped buffers. Data is only read from disk once it is used
+        for name, shape in dictionaries["shapes"].items():
+            
+            # Memory-map the buffers
+            data, indices, indptr = [np.load(directory / (name + "_" + m + ".npy"), mmap_mode = "r") for m in ("data", "indices", "indptr")]
+            
+            # Build the matrix
+            matrices[name]: sparse.csr_matrix = sparse.csr_matrix((data, indices, indptr), shape = shape, copy = False)
         
-        # Return
-        return self.structured_arrays_for_emission_contribution[database][None]
+        # Set the lca object and the matrices of the database
+        return self._set_LCA_object_from_matrices(database = database, matrices = matrices, dictionaries = dictionaries)
     
     
-    def _get_structured_array_for_LCI_process_contribution(self, database: str) -> np.array:
-        
-        # If already existing, simply return
-        if self.structured_arrays_for_process_contribution.get(database) is not None:
-            return self.structured_arrays_for_process_contribution[database][None]
-        
-        # Get the activity dictionary as an array
-        activity_array: np.array = self._get_activity_dict_as_array(database = database)
-        
-        # Extract the length of the array, since everything needs to be at this length
-        length_activity_array: int = activity_array.shape[0]
+    def _export_LCA_object_to_shared_memory(self, database: str) -> tuple[dict, list[shared_memory.SharedMemory]]:
         
-        # Construct an array with only the None's and the length of the activity array
-        none_array: np.array = self._get_element_array(element = None, length = length_activity_array, dtype = object)
+        # Retrieve the matrices, dictionaries and method indices of the database
+        matrices, dictionaries = self._get_matrices_of_LCA_object(database = database)
         
-        # Construct an array with the functional amount and the length of the activity array
-        functional_amount_array: np.array = self._get_element_array(element = self.functional_amount, length = length_activity_array, dtype = "float64")
-        functional_amount_array_dtype = functional_amount_array.dtype
+        # Initialize a descriptor, which contains everything a worker needs to attach to the shared matrices
+        # The dictionaries and method indices are small and are simply passed (= copied) to the workers
+        descriptor: dict = dict(dictionaries)
         
-        # Construct a placeholder array with a random activity key and the length of the activity array
-        # Note that storing a tuple in an array would be doable, but we then run into issues converting it back
-        # That's why we cast the tuple to a string first
-        activity_key_array: np.array = self._get_element_array(element = str(self.activities[0].key), length = length_activity_array, dtype = "U")
+        # Initialize a list to store all shared memory blocks to. They need to be kept (and later on released) by the process that created them
+        blocks: list[shared_memory.SharedMemory] = []
         
-        # Extract the array type from the inventory
-        inventory_dtype = self._get_LCA_object(database = database).inventory.dtype
-        
-        # Construct a 0 array for the values (this one will be overwritten later)
-        value_array: np.array = np.zeros(length_activity_array, dtype = inventory_dtype)
-        
-        # Construct dtypes for the structured array
-        dtype: list[tuple] = [("activity_key", activity_key_array.dtype),
-                              ("functional_amount", functional_amount_array_dtype),
-                              ("flow_key", activity_array.dtype),
-                              ("flow_amount", none_array.dtype),
-                              ("value", inventory_dtype),
-                              ("method", none_array.dtype)
-                              ]
+        # Loop through each matrix and write its CSR buffers (data, indices, indptr) to shared memory
+        for name, matrix in matrices.items():
+            
+            # Initialize the descriptor of the matrix
+            descriptor[name]: dict = {"shape": matrix.shape}
+            
+            # Loop through each buffer
+            for buffer_name, array in (("data", matrix.data), ("indices", matrix.indices), ("indptr", matrix.indptr)):
                 
-        # Build structured array and add to dictionary
-        self.structured_arrays_for_process_contribution[database]: dict[(tuple | None), np.array] = {None: np.core.records.fromarrays([activity_key_array,
-                                                                                                                                       functional_amount_array,
-                                                                                                                                       activity_array,
-                                                                                                                                       none_array,
-                                                                                                                                       value_array,
-                                                                                                                                       none_array
-                                                                                                                                       ], dtype = dtype)}
-        
-        # Return
-        return self.structured_arrays_for_process_contribution[database][None]
+                # Create a new shared memory block of the size of the buffer (at least one byte)
+                block: shared_memory.SharedMemory = shared_memory.SharedMemory(create = True, size = max(array.nbytes, 1))
+                
+                # Copy the buffer into the shared memory block
+                np.ndarray(array.shape, dtype = array.dtype, buffer = block.buf)[:] = array
+                
+                # Add the block and its description
+                blocks += [block]
+                descriptor[name][buffer_name]: tuple = (block.name, array.shape, array.dtype.str)
         
+        # Return the descriptor and the shared memory blocks
+        return descriptor, blocks
+    
+    
+    def _attach_LCA_object_from_shared_memory(self, database: str) -> bw2calc.lca.LCA:
         
+        # Retrieve the descriptor of the shared matrices
+        descriptor: dict = self.shared_LCA_objects[database]
         
-    def _get_structured_array_for_LCIA_emission_contribution(self, database: str, method: tuple) -> np.array:
+        # Initialize a dictionary to store the matrices to
+        matrices: dict[str, sparse.csr_matrix] = {}
         
-        # If already existing, simply return
-        if self.structured_arrays_for_emission_contribution.get(database, {}).get(method) is not None:
-            return self.structured_arrays_for_emission_contribution[database][method]
+        # Loop through each matrix and build it from the shared buffers, without copying the data
+        for name in ("technosphere_matrix", "biosphere_matrix", "stacked_characterization_matrix", "technosphere_exchange_matrix", "biosphere_exchange_matrix"):
+            
+            # Attach to the buffers
+            data, indices, indptr = [_attach_array_from_shared_memory(*descriptor[name][m]) for m in ("data", "indices", "indptr")]
+            
+            # Build the matrix
+            matrices[name]: sparse.csr_matrix = sparse.csr_matrix((data, indices, indptr), shape = descriptor[name]["shape"], copy = False)
         
-        # Retrieve or build the initial structured emission array
-        structured_LCI_emission_array: np.array = self._get_structured_array_for_LCI_emission_contribution(database = database).copy() # !!! We need this copy right now, but it slows calculation down. Alternative?
+        # Set the lca object and the matrices of the database
+        return self._set_LCA_object_from_matrices(database = database, matrices = matrices, dictionaries = descriptor)
     
-        # Overwrite the method array (None's) with the method
-        structured_LCI_emission_array["method"]: np.array = self._get_element_array(element = str(method), length = len(structured_LCI_emission_array["value"]), dtype = "U")
-    
-        # Add temporarily
-        self.structured_arrays_for_emission_contribution[database][method]: np.array = structured_LCI_emission_array.copy() 
-        
-        # Return
-        return structured_LCI_emission_array
     
+    def _get_stacked_characterization_matrix(self, database: str) -> sparse.csr_matrix:
+
+        # Simply return if already existing
+        if self.stacked_characterization_matrices.get(database) is not None:
+            return self.stacked_characterization_matrices[database]
+
+        # Otherwise, create BW object and matrices
+        self._get_LCA_object(database = database)
+
+        # Return the matrix
+        return self.stacked_characterization_matrices[database]
+
+
+    def _get_method_indices_of_stacked_characterization_matrix(self, database: str) -> np.array:
+
+        # Simply return if already existing
+        if self.method_indices_of_stacked_characterization_matrices.get(database) is not None:
+            return self.method_indices_of_stacked_characterization_matrices[database]
+
+        # Otherwise, create BW object and matrices
+        self._get_LCA_object(database = database)
+
+        # Return the array, which gives for each method the row of the stacked characterization matrix
+        return self.method_indices_of_stacked_characterization_matrices[database]
+
+
+    def _get_characterized_biosphere_matrix(self, database: str) -> sparse.csr_matrix:
+
+        # Simply return if already existing
+        if self.characterized_biosphere_matrices.get(database) is not None:
+            return self.characterized_biosphere_matrices[database]
+
+        # Multiply the stacked characterization matrix with the biosphere matrix (unique methods x activities)
+        # One row contains the direct impact of each activity for one method
+        characterized_biosphere_matrix: sparse.csr_matrix = (self._get_stacked_characterization_matrix(database = database) * self._get_LCA_object(database = database).biosphere_matrix).tocsr()
+
+        # Temporarily store
+        self.characterized_biosphere_matrices[database]: sparse.csr_matrix = characterized_biosphere_matrix
+
+        # Return the matrix
+        return characterized_biosphere_matrix
+
+
+    def _get_factorized_technosphere(self, database: str) -> sparse_linalg.SuperLU:
+
+        # Simply return, if already existing
+        if self.factorized_technospheres.get(database) is not None:
+            return self.factorized_technospheres[database]
+
+        # Retrieve the lca object
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+
+        # Factorize the technosphere matrix once (LU decomposition)
+        # The factorization can then be reused to solve any demand vector (or block of demand vectors) of the database
+        factorized_technosphere: sparse_linalg.SuperLU = sparse_linalg.splu(lca_object.technosphere_matrix.tocsc())
+
+        # Temporarily store
+        self.factorized_technospheres[database]: sparse_linalg.SuperLU = factorized_technosphere
+
+        # Return the factorized technosphere
+        return factorized_technosphere
+
+
+    def _get_preconditioner(self, database: str) -> sparse_linalg.SuperLU:
+        
+        # Simply return, if already existing
+        if self.preconditioners.get(database) is not None:
+            return self.preconditioners[database]
+        
+        # Retrieve the lca object
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        
+        # Build an incomplete LU decomposition of the technosphere matrix once
+        # Small entries are dropped during the decomposition, which keeps the memory needed much lower than for the complete decomposition
+        preconditioner: sparse_linalg.SuperLU = sparse_linalg.spilu(lca_object.technosphere_matrix.tocsc(),
+                                                                    drop_tol = self.preconditioner_drop_tolerance,
+                                                                    fill_factor = self.preconditioner_fill_factor)
+        
+        # Temporarily store
+        self.preconditioners[database]: sparse_linalg.SuperLU = preconditioner
+        
+        # Return the preconditioner
+        return preconditioner
+    
+    
+    def _solve_iteratively(self, database: str, right_hand_side: np.ndarray, transposed: bool = False, technosphere_matrix: (sparse.spmatrix | None) = None) -> np.array:
+        
+        # Retrieve the technosphere matrix (if no other matrix, e.g. of a Monte Carlo sample, is given), or its transpose, and the preconditioner of the database
+        # The preconditioner of the database is also used for other matrices of the same database. It is only built from the static matrix, but approximates the other matrices well enough
+        technosphere_matrix: sparse.spmatrix = self._get_LCA_object(database = database).technosphere_matrix if technosphere_matrix is None else technosphere_matrix
+        technosphere_matrix: sparse.spmatrix = technosphere_matrix.transpose() if transposed else technosphere_matrix
+        preconditioner: sparse_linalg.SuperLU = self._get_preconditioner(database = database)
+        
+        # The preconditioner approximately solves the same system as the solver
+        preconditioner_operator: sparse_linalg.LinearOperator = sparse_linalg.LinearOperator(technosphere_matrix.shape,
+                                                                                            matvec = lambda m: preconditioner.solve(m, trans = "T" if transposed else "N"))
+        
+        # Select the iterative solver
+        solve = sparse_linalg.bicgstab if self.solver == "bicgstab" else sparse_linalg.gmres
+        
+        # Each column of the right hand side (e.g., each demand vector of a batch) is solved separately
+        columns: np.array = np.asarray(right_hand_side, dtype = "float64").reshape(technosphere_matrix.shape[0], -1)
+        solutions: np.array = np.zeros(columns.shape, dtype = "float64")
+        
+        # Loop through each column
+        for column in range(columns.shape[1]):
+            
+            # The solution of an empty right hand side is 0
+            if not np.any(columns[:, column]):
+                continue
+            
+            # Solve, starting from 0. The solution of another right hand side (e.g., the previous activity) is not used as starting point, so that results do not depend on the order of the activities
+            solution, info = solve(technosphere_matrix,
+                                   columns[:, column],
+                                   rtol = self.solver_tolerance,
+                                   atol = 0.,
+                                   M = preconditioner_operator)
+            
+            # Raise error if the solver did not converge
+            if info != 0:
+                raise ValueError("Iterative solver '" + self.solver + "' did not converge for database '" + str(database) + "' (info '" + str(info) + "'). Increase 'solver_tolerance' or use the solver 'direct'.")
+            
+            # Add the solution
+            solutions[:, column] = solution
+        
+        # Return the solutions in the same shape as the right hand side
+        return solutions.reshape(np.shape(right_hand_side))
+    
+    
+    def _get_technosphere_decomposition(self, database: str) -> dict:
+        
+        # Simply return, if already existing
+        if self.technosphere_decompositions.get(database) is not None:
+            return self.technosphere_decompositions[database]
+        
+        # Decompose the technosphere matrix of the database
+        self.technosphere_decompositions[database]: dict = self._decompose_technosphere(database = database, technosphere_matrix = self._get_LCA_object(database = database).technosphere_matrix)
+        
+        # Return the decomposition
+        return self.technosphere_decompositions[database]
+    
+    
+    def _decompose_technosphere(self, database: str, technosphere_matrix: sparse.spmatrix) -> dict:
+        
+        # Retrieve the reference product of each activity
+        product_indices: np.array = self._get_product_indices_of_activities(database = database)
+        
+        # The decomposition needs exactly one reference product for each activity. Otherwise, the technosphere is solved as a whole with the factorization
+        if technosphere_matrix.shape[0] != technosphere_matrix.shape[1] or not np.array_equal(np.sort(product_indices), np.arange(technosphere_matrix.shape[0])):
+            return {"levels": None}
+        
+        # Reorder the columns, so that the production of each product is on the diagonal (column i is the activity of product i)
+        activity_indices_of_products: np.array = np.zeros(len(product_indices), dtype = "int64")
+        activity_indices_of_products[product_indices] = np.arange(len(product_indices))
+        matrix: sparse.csc_matrix = sparse.csc_matrix(technosphere_matrix)[:, activity_indices_of_products]
+        
+        # Identify the strongly connected components. Products in the same component supply each other (directly or indirectly)
+        number_of_components, components = csgraph.connected_components(matrix, directed = True, connection = "strong")
+        
+        # Build the graph of the components (condensation), which is acyclic. Entries are from the consuming to the supplying component
+        coo_matrix: sparse.coo_matrix = matrix.tocoo()
+        is_edge: np.array = components[coo_matrix.row] != components[coo_matrix.col]
+        suppliers_of_consumers: sparse.csr_matrix = sparse.csr_matrix((np.ones(is_edge.sum()), (components[coo_matrix.col[is_edge]], components[coo_matrix.row[is_edge]])), shape = (number_of_components, number_of_components))
+        suppliers_of_consumers.data[:] = 1
+        
+        # Assign a level to each component (topological order). A component can be calculated, once all components that consume from it have been calculated
+        # Components of the same level do not depend on each other and are calculated at once
+        number_of_consumers: np.array = np.asarray(suppliers_of_consumers.sum(axis = 0)).reshape(-1)
+        levels_of_components: np.array = np.full(number_of_components, -1, dtype = "int64")
+        current_components: np.array = np.flatnonzero(number_of_consumers == 0)
+        level: int = 0
+        
+        # Loop until all components have a level
+        while len(current_components) > 0:
+            
+            # Set the level of the current components
+            levels_of_components[current_components] = level
+            
+            # Remove the current components as consumers. Suppliers without remaining consumers are on the next level
+            number_of_consumers -= np.asarray(suppliers_of_consumers[current_components].sum(axis = 0)).reshape(-1)
+            current_components: np.array = np.flatnonzero((number_of_consumers == 0) & (levels_of_components == -1))
+            level += 1
+        
+        # Sort the products by level and identify where each level starts and ends
+        levels_of_products: np.array = levels_of_components[components]
+        order: np.array = np.argsort(levels_of_products, kind = "stable")
+        starts: np.array = np.searchsorted(levels_of_products[order], np.arange(level + 1))
+        
+        # Size of each component, to separate single products from cyclic components
+        component_sizes: np.array = np.bincount(components, minlength = number_of_components)
+        matrix_as_csr: sparse.csr_matrix = matrix.tocsr()
+        diagonal: np.array = matrix.diagonal()
+        
+        # Initialize a list to store the data of each level to
+        levels: list[dict] = []
+        
+        # Loop through each level
+        for start, end in zip(starts[:-1], starts[1:]):
+            
+            # Products of the current level
+            products: np.array = order[start:end]
+            
+            # Products that form a component on their own are calculated by simply dividing by their production amount
+            single_products: np.array = products[component_sizes[components[products]] == 1]
+            
+            # Products of cyclic components are grouped by component. The matrix of each cyclic component is decomposed (LU)
+            cyclic_products: np.array = products[component_sizes[components[products]] > 1]
+            cyclic_products: np.array = cyclic_products[np.argsort(components[cyclic_products], kind = "stable")]
+            blocks: list[np.array] = np.split(cyclic_products, np.flatnonzero(np.diff(components[cyclic_products])) + 1) if len(cyclic_products) > 0 else []
+            
+            # Add the level. The columns (and rows, for the transposed system) of the level are used to pass the solution on to the next levels
+            levels += [{"products": products,
+                        "single_products": single_products,
+                        "diagonal": diagonal[single_products],
+                        "blocks": [(m, sparse_linalg.splu(sparse.csc_matrix(matrix_as_csr[m][:, m]))) for m in blocks],
+                        "columns": sparse.csr_matrix(matrix[:, products]),
+                        "rows": sparse.csr_matrix(matrix_as_csr[products, :].transpose())}]
+        
+        # Return the decomposition
+        return {"levels": levels, "activity_indices_of_products": activity_indices_of_products}
+    
+    
+    def _solve_with_decomposition(self, database: str, right_hand_side: np.ndarray, transposed: bool = False, technosphere_matrix: (sparse.spmatrix | None) = None) -> np.array:
+        
+        # Retrieve the decomposition of the technosphere. Other matrices (e.g., of a Monte Carlo sample) are decomposed each time
+        decomposition: dict = self._get_technosphere_decomposition(database = database) if technosphere_matrix is None else self._decompose_technosphere(database = database, technosphere_matrix = technosphere_matrix)
+        
+        # Solve the technosphere as a whole, if it could not be decomposed
+        if decomposition["levels"] is None:
+            factorized_technosphere: sparse_linalg.SuperLU = self._get_factorized_technosphere(database = database) if technosphere_matrix is None else sparse_linalg.splu(sparse.csc_matrix(technosphere_matrix))
+            return factorized_technosphere.solve(right_hand_side, trans = "T" if transposed else "N")
+        
+        # The right hand side of the transposed system refers to the activities, which are reordered to the products
+        activity_indices_of_products: np.array = decomposition["activity_indices_of_products"]
+        residual: np.array = np.array(right_hand_side, dtype = "float64")[activity_indices_of_products] if transposed else np.array(right_hand_side, dtype = "float64")
+        solution: np.array = np.zeros(residual.shape, dtype = "float64")
+        
+        # Loop through each level. Consumers come before their suppliers, for the transposed system it is the other way round
+        for level in (reversed(decomposition["levels"]) if transposed else decomposition["levels"]):
+            
+            # Calculate the single products by dividing by their production amount
+            solution[level["single_products"]] = residual[level["single_products"]] / (level["diagonal"][:, None] if residual.ndim == 2 else level["diagonal"])
+            
+            # Solve each cyclic component with its decomposition
+            for products, factorized_block in level["blocks"]:
+                solution[products] = factorized_block.solve(residual[products], trans = "T" if transposed else "N")
+            
+            # Pass the solution of the level on to the products of the next levels (back-substitution)
+            residual -= (level["rows"] if transposed else level["columns"]) @ solution[level["products"]]
+        
+        # The transposed system is solved for the products. Otherwise, the solution refers to the reordered columns and is ordered back to the activities
+        if transposed:
+            return solution
+        
+        # Order the solution back to the activities
+        supply: np.array = np.zeros(solution.shape, dtype = "float64")
+        supply[activity_indices_of_products] = solution
+        
+        # Return
+        return supply
+    
+    
+    def _solve_technosphere(self, database: str, right_hand_side: np.ndarray, transposed: bool = False, technosphere_matrix: (sparse.spmatrix | None) = None) -> np.array:
+        
+        # The technosphere matrix of the database is solved, if no other matrix (e.g., of a Monte Carlo sample) with the same rows and columns is given
+        # Factorizations and decompositions are only cached for the matrix of the database
+        
+        # Solve with the factorization of the whole technosphere
+        if self.solver == "direct":
+            factorized_technosphere: sparse_linalg.SuperLU = self._get_factorized_technosphere(database = database) if technosphere_matrix is None else sparse_linalg.splu(sparse.csc_matrix(technosphere_matrix))
+            return factorized_technosphere.solve(right_hand_side, trans = "T" if transposed else "N")
+        
+        # Solve with the decomposition into strongly connected components
+        if self.solver == "decomposition":
+            return self._solve_with_decomposition(database = database, right_hand_side = right_hand_side, transposed = transposed, technosphere_matrix = technosphere_matrix)
+        
+        # Otherwise, solve with the iterative solver
+        return self._solve_iteratively(database = database, right_hand_side = right_hand_side, transposed = transposed, technosphere_matrix = technosphere_matrix)
+    
+    
+    def _solve_demand_array(self, database: str) -> np.array:
+        
+        # Retrieve the lca object, where the demand array has already been built
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        
+        # Solve the linear system directly with Brightway
+        if self.solver == "direct":
+            return lca_object.solve_linear_system()
+        
+        # Otherwise, solve it with the specified solver
+        return self._solve_technosphere(database = database, right_hand_side = lca_object.demand_array)
+    
+    
+    def _get_activity_keys_of_database(self, database: str) -> dict[tuple[str, str], int]:
+
+        # Simply return, if already existing
+        if self.activity_keys_by_database.get(database) is not None:
+            return self.activity_keys_by_database[database]
+
+        # Initialize a new dictionary, mapping each activity key of the database to its position
+        # The order is the same as the order in which activities are calculated
+        activity_keys: dict[tuple[str, str], int] = {}
+
+        # Loop through each activity and add the key if it belongs to the current database
+        for act in self.activities:
+            if self._get_system_of_database(database = act.key[0]) == database and act.key not in activity_keys:
+                activity_keys[act.key]: int = len(activity_keys)
+
+        # Temporarily store
+        self.activity_keys_by_database[database]: dict[tuple[str, str], int] = activity_keys
+
+        # Return the dictionary
+        return activity_keys
+
+
+    def _solve_batch_of_activities(self, database: str, activity_key: tuple[str, str]) -> None:
+
+        # Retrieve the lca object
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+
+        # Get all activity keys of the current database, in order of calculation
+        activity_keys: dict[tuple[str, str], int] = self._get_activity_keys_of_database(database = database)
+
+        # The batch starts with the current activity and contains the next activities of the same database
+        # Activities that are not part of the technosphere are excluded here. They will raise an error when they are calculated themselves
+        start: int = activity_keys.get(activity_key, 0)
+        batch: list[tuple[str, str]] = [activity_key] + [m for m in list(activity_keys)[start + 1:start + self.batch_size] if m in lca_object.product_dict]
+
+        # Construct the block of demand vectors (products x activities of the batch)
+        demand_matrix: np.array = np.zeros((len(lca_object.product_dict), len(batch)), dtype = "float64")
+
+        # Loop through each activity of the batch and set the functional amount in its column
+        for column, key in enumerate(batch):
+
+            # Retrieve the row of the product
+            row: (int | None) = lca_object.product_dict.get(key)
+
+            # Raise error if the activity can not be found in the technosphere. The same error is raised by Brightway
+            if row is None:
+                raise OutsideTechnosphere("Can't find key {} in product dictionary".format(key))
+
+            # Set the demand
+            demand_matrix[row, column]: float = self.functional_amount
+
+        # Solve all demand vectors at once, reusing the factorization (or decomposition, or preconditioner)
+        supply_matrix: np.array = self._solve_technosphere(database = database, right_hand_side = demand_matrix)
+
+        # Temporarily store the supply arrays of the batch. Supply arrays of previous batches of this database are not needed anymore
+        self._temporary_supply_arrays[database]: dict = {key: supply_matrix[:, column] for column, key in enumerate(batch)}
+
+
+    def _get_product_indices_of_activities(self, database: str) -> np.array:
+
+        # Simply return, if already existing
+        if self.product_indices_of_activities.get(database) is not None:
+            return self.product_indices_of_activities[database]
+
+        # Retrieve the lca object
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+
+        # Construct an array that gives, for each activity (column of the technosphere), the index of its reference product (row of the technosphere)
+        product_indices: np.array = np.zeros(len(lca_object.activity_dict), dtype = "int64")
+
+        # Loop through each activity key and write the respective product index
+        for key, column in lca_object.activity_dict.items():
+            product_indices[column]: int = lca_object.product_dict[key]
+
+        # Temporarily store
+        self.product_indices_of_activities[database]: np.array = product_indices
+
+        # Return the array
+        return product_indices
+
+
+    def _get_unit_scores(self, database: str) -> np.array:
+
+        # Simply return, if already existing
+        if self.unit_scores.get(database) is not None:
+            return self.unit_scores[database]
+
+        # Construct the right hand side of the transposed (adjoint) system, one column per (unique) method
+        # The column of a method is the characterized biosphere summed up per activity: (C * B)^T
+        right_hand_side: np.array = self._get_characterized_biosphere_matrix(database = database).transpose().toarray()
+
+        # Solve the transposed system A^T * lambda = (C * B)^T once for all methods
+        # The solution contains the score of one unit of each product, for each method
+        product_scores: np.array = self._solve_technosphere(database = database, right_hand_side = right_hand_side, transposed = True)
+
+        # Reorder from products (rows) to activities (columns), so that the scores can be indexed with the activity dictionary
+        # Unique methods are expanded again to all methods
+        activity_scores: np.array = product_scores[self._get_product_indices_of_activities(database = database), :][:, self._get_method_indices_of_stacked_characterization_matrix(database = database)]
+
+        # Temporarily store
+        self.unit_scores[database]: np.array = activity_scores
+
+        # Return the array
+        return activity_scores
+
+
+    def _get_unit_scores_of_flow(self, database: str, flow_key: tuple[str, str]) -> np.array:
+        
+        # Retrieve the characterization factors of the flow
+        cfs: list[(float | None)] = [self.characterization_factors[met].get(flow_key) for met in self.methods]
+        
+        # If the flow is characterized in any method, it is a biosphere flow and the characterization factors are the scores of one unit
+        # The flow does not contribute to methods that do not characterize it
+        if any([m is not None for m in cfs]):
+            return np.array([m if m is not None else 0 for m in cfs], dtype = "float64")
+        
+        # Otherwise, retrieve the column of the flow in the technosphere of the database the activity belongs to
+        column: (int | None) = self._get_LCA_object(database = database).activity_dict.get(flow_key)
+        
+        # If the flow is not part of the technosphere, it is a biosphere flow that is not characterized in any method
+        if column is None:
+            return np.zeros(len(self.methods), dtype = "float64")
+        
+        # Return the scores of one unit of the activity, for all methods
+        return self._get_unit_scores(database = database)[column]
+    
+    
+    def _calculate_LCIA_scores_of_exchanges_from_unit_scores(self, skipped_activity_key_indices: np.ndarray) -> None:
+        
+        # To calculate the LCIA scores for exchanges, we need to preload the characterization factors
+        for met in self.methods:
+            self._load_characterization_factors(method = met)
+        
+        # Retrieve the extracted exchanges
+        columns: dict[str, np.array] = self.results_raw[self.name_LCI_exchanges].get_columns()
+        
+        # Remove the exchanges of the activities that should be skipped (e.g., because their scores were loaded from the result cache)
+        columns: dict[str, np.array] = {name: column[~np.isin(columns["activity"], skipped_activity_key_indices)] for name, column in columns.items()}
+        
+        # Lookup table of the keys and the database (system) of each key
+        keys: list = self.lookup_tables["keys"]
+        databases: list = sorted({self._get_system_of_database(database = m[0]) for m in keys if m[0] is not None})
+        database_of_keys: np.array = np.array([databases.index(self._get_system_of_database(database = m[0])) if m[0] is not None else -1 for m in keys], dtype = "int64")
+        
+        # The score of an exchange depends on the flow and the database of the activity (the technosphere the flow is solved in)
+        # Identify all distinct combinations, to retrieve the unit scores only once per combination
+        combinations, inverse = np.unique(np.stack([database_of_keys[columns["activity"]], columns["flow"]], axis = 1), axis = 0, return_inverse = True)
+        
+        # Build the table with the unit scores (combinations x methods)
+        unit_scores: np.array = np.array([self._get_unit_scores_of_flow(database = databases[m], flow_key = keys[n]) for m, n in combinations], dtype = "float64").reshape(len(combinations), len(self.methods))
+        
+        # The score of each exchange is the flow amount multiplied with the unit score (exchanges x methods)
+        scores: np.array = columns["flow_amount"][:, None] * unit_scores[inverse.reshape(-1)]
+        
+        # Number of methods
+        number_of_methods: int = len(self.methods)
+        
+        # Add the scores of the exchanges to the result dictionary, with one row per exchange and method
+        self.results_raw[self.name_LCIA_immediate_scores].add_arrays(activity = np.repeat(columns["activity"], number_of_methods),
+                                                                    activity_amount = np.repeat(columns["activity_amount"], number_of_methods),
+                                                                    flow = np.repeat(columns["flow"], number_of_methods),
+                                                                    flow_amount = np.repeat(columns["flow_amount"], number_of_methods),
+                                                                    value = scores.reshape(-1),
+                                                                    method = np.tile(np.array([self._get_method_index(method = m) for m in self.methods], dtype = "int64"), len(scores)))
+    
+    
+    def _solve_supply_array(self, database: str, activity_key: tuple[str, str]) -> np.array:
+
+        # Retrieve the lca object
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+
+        # If activities are not solved in batches, we simply solve the linear system with Brightway (which takes quite some time)
+        if not self.solve_in_batches:
+            lca_object.build_demand_array({activity_key: self.functional_amount})
+            lca_object.supply_array: np.array = self._solve_demand_array(database = database)
+            return lca_object.supply_array
+
+        # Solve the next batch of activities if the supply array of the current activity is not yet available
+        if activity_key not in self._temporary_supply_arrays.get(database, {}):
+            self._solve_batch_of_activities(database = database, activity_key = activity_key)
+
+        # Retrieve the supply array of the current activity and overwrite the one of the lca object
+        lca_object.supply_array: np.array = self._temporary_supply_arrays[database][activity_key]
+
+        # Return the supply array
+        return lca_object.supply_array
+
+
+    def _redo_lci(self, database: str, activity_key: tuple[str, str]) -> bw2calc.lca.LCA:
+
+        # Retrieve the lca object
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+
+        # Solve the linear system, either directly or from a batch of solved activities
+        supply_array: np.array = self._solve_supply_array(database = database, activity_key = activity_key)
+
+        # Overwrite the inventory matrix of the lca object, the same way as Brightway does it
+        count: int = len(lca_object.activity_dict)
+        lca_object.inventory = lca_object.biosphere_matrix * sparse.spdiags([supply_array], [0], count, count)
+
+        # Return the lca object
+        return lca_object
+
+
+
+    def _get_key_index(self, key: (tuple | None)) -> int:
+        
+        # Retrieve or add the key from/to the lookup table. None is stored as -1
+        return LCA_Result_Store.get_index(lookup_tables = self.lookup_tables, table = "key", element = key)
+    
+    
+    def _get_method_index(self, method: (tuple | None)) -> int:
+        
+        # Retrieve or add the method from/to the lookup table. None is stored as -1
+        return LCA_Result_Store.get_index(lookup_tables = self.lookup_tables, table = "method", element = method)
+    
+    
+    def _get_biosphere_dict_as_array(self, database: str) -> np.array:
+        
+        # Simply return if already existing
+        if self.biosphere_dicts_as_arrays.get(database) is not None:
+            return self.biosphere_dicts_as_arrays[database]
+        
+        # Retrieve the lca object
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        
+        # Write the biosphere dict as array of indices into the key lookup table
+        biosphere_array: np.array = np.array([self._get_key_index(key = m) for m in lca_object.biosphere_dict.keys()], dtype = "int64")
+        
+        # Temporarily store
+        self.biosphere_dicts_as_arrays[database]: np.array = biosphere_array
+        
+        # Return the array
+        return biosphere_array
+    
+    
+    
+    def _get_activity_dict_as_array(self, database: str) -> np.array:
+        
+        # Simply return if already existing
+        if self.activity_dicts_as_arrays.get(database) is not None:
+            return self.activity_dicts_as_arrays[database]
+        
+        # Retrieve the lca object
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        
+        # Write the activity dict as array of indices into the key lookup table
+        activity_array: np.array = np.array([self._get_key_index(key = m) for m in lca_object.activity_dict.keys()], dtype = "int64")
+        
+        # Temporarily store
+        self.activity_dicts_as_arrays[database]: np.array = activity_array
+        
+        # Return the array
+        return activity_array
+    
+    
+    def _get_contributions(self,
+                           values: np.ndarray,
+                           cut_off: (float | None),
+                           top_k: (int | None)) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        
+        # The values are a 2-D array (e.g., methods x biosphere flows), each row is treated separately
+        number_of_rows, number_of_columns = values.shape
+        
+        # Exclude all values that are 0
+        keep: np.array = values != 0
+        
+        # Apply a cut off, if specified
+        if cut_off is not None:
+            
+            # Identify the limit/treshold from where on values will be excluded, separately for values above and below 0
+            # We do the sum and then multiply it with the cut off indicated
+            max_treshold: np.array = np.where(values > 0, values, 0).sum(axis = 1) * cut_off
+            min_treshold: np.array = np.where(values < 0, values, 0).sum(axis = 1) * cut_off
+            
+            # Only keep the values that are not excluded by the cut off
+            keep &= (values > max_treshold[:, None]) | (values < min_treshold[:, None])
+        
+        # Only keep the k largest (absolute) values of each row, if specified
+        if top_k is not None and top_k < number_of_columns:
+            
+            # Find the positions of the k largest values without sorting the whole row
+            largest: np.array = np.argpartition(-np.abs(values), top_k - 1, axis = 1)[:, :top_k]
+            
+            # Mark these positions
+            top_k_mask: np.array = np.zeros(values.shape, dtype = bool)
+            np.put_along_axis(top_k_mask, largest, True, axis = 1)
+            
+            # Only keep the values that are among the largest
+            keep &= top_k_mask
+        
+        # Extract the rows, columns and values that are kept. Rows are sorted ascending
+        rows, columns = np.nonzero(keep)
+        contributions: np.array = values[rows, columns]
+        
+        # If nothing is excluded, we don't need to calculate a rest and can simply return
+        if cut_off is None and top_k is None:
+            return rows, columns, contributions
+        
+        # Retrieve the rest amount as a sum of everything that was excluded, for each row that contains any value
+        rest_rows: np.array = np.flatnonzero((values != 0).any(axis = 1))
+        rest: np.array = np.where(keep, 0, values).sum(axis = 1)[rest_rows]
+        
+        # Add the rest to the contributions. The rest has the column -1
+        # Within a row, values above 0 come first, then values below 0 and the rest at the end
+        groups: np.array = np.concatenate([np.where(contributions > 0, 0, 1), np.full(len(rest_rows), 2)])
+        rows: np.array = np.concatenate([rows, rest_rows])
+        columns: np.array = np.concatenate([columns, np.full(len(rest_rows), -1)])
+        contributions: np.array = np.concatenate([contributions, rest])
+        
+        # Sort by row and group. The sort is stable, which keeps the order of the columns within a group
+        order: np.array = np.lexsort((groups, rows))
+        
+        # Return
+        return rows[order], columns[order], contributions[order]
+    
+    
+    def _add_contributions_to_results(self,
+                                      result_type: str,
+                                      activity_key: tuple[str, str],
+                                      values: np.ndarray,
+                                      flow_key_indices: np.ndarray,
+                                      method_indices: (np.ndarray | None),
+                                      cut_off: (float | None),
+                                      top_k: (int | None)) -> None:
+        
+        # Calculate the contributions of all rows at once
+        rows, columns, contributions = self._get_contributions(values = values, cut_off = cut_off, top_k = top_k)
+        
+        # Map the columns to the keys of the flows. The rest (column -1) is mapped to the rest key
+        flows: np.array = np.append(flow_key_indices, self._get_key_index(key = self.rest_key))[columns]
+        
+        # LCI contributions have only one row and no method
+        if method_indices is None:
+            self.results_raw[result_type].add_arrays(activity = np.full(len(contributions), self._get_key_index(key = activity_key)),
+                                                     activity_amount = self.functional_amount,
+                                                     flow = flows,
+                                                     flow_amount = np.nan,
+                                                     value = contributions,
+                                                     method = -1)
+            return
+        
+        # Identify where the contributions of each row start and end
+        starts: np.array = np.searchsorted(rows, np.arange(values.shape[0] + 1))
+        
+        # Each method refers to one row, several methods can refer to the same row. Retrieve the positions of the contributions of each method
+        positions: np.array = np.concatenate([np.arange(starts[m], starts[m + 1]) for m in method_indices])
+        methods: np.array = np.concatenate([np.full(starts[m + 1] - starts[m], self._get_method_index(method = met)) for met, m in zip(self.methods, method_indices)])
+        
+        # Add to the result dictionary
+        self.results_raw[result_type].add_arrays(activity = np.full(len(positions), self._get_key_index(key = activity_key)),
+                                                 activity_amount = self.functional_amount,
+                                                 flow = flows[positions],
+                                                 flow_amount = np.nan,
+                                                 value = contributions[positions],
+                                                 method = methods)
+    
+    
+    
+    def _get_exchange_parameters(self, database: str) -> tuple[np.ndarray, np.ndarray]:
+        
+        # Simply return, if already existing
+        if self.exchange_parameters.get(database) is not None:
+            return self.exchange_parameters[database]
+        
+        # Retrieve the lca object
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        
+        # The parameters of Brightway only contain the amounts as float32. The exact amounts (as stored in the database) are therefore read from the database
+        # Initialize lists to store the row, column, amount and type (0 = production, 1 = other technosphere exchange) of each exchange to
+        technosphere_exchanges: list[tuple] = []
+        biosphere_exchanges: list[tuple] = []
+        
+        # Loop through each database that has activities in the system (incl. the databases it depends on)
+        for db in sorted(set([m[0] for m in lca_object.activity_dict])):
+            
+            # Query all exchanges of the activities of the database at once
+            query = (bw2data.backends.peewee.ExchangeDataset
+                     .select(bw2data.backends.peewee.ExchangeDataset.data,
+                             bw2data.backends.peewee.ExchangeDataset.type,
+                             bw2data.backends.peewee.ExchangeDataset.input_database,
+                             bw2data.backends.peewee.ExchangeDataset.input_code,
+                             bw2data.backends.peewee.ExchangeDataset.output_code)
+                     .where(bw2data.backends.peewee.ExchangeDataset.output_database == db)
+                     .tuples())
+            
+            # Loop through each exchange
+            for data, exchange_type, input_database, input_code, output_code in query.iterator():
+                
+                # Retrieve the column of the activity. Exchanges of activities that are not part of the system are skipped
+                column: (int | None) = lca_object.activity_dict.get((db, output_code))
+                if column is None:
+                    continue
+                
+                # Biosphere exchanges are added with the row of the flow, all other exchanges with the row of the product. Flows that are not part of the system are skipped
+                if exchange_type == "biosphere":
+                    row: (int | None) = lca_object.biosphere_dict.get((input_database, input_code))
+                    if row is not None:
+                        biosphere_exchanges += [(row, column, data["amount"], 2)]
+                
+                else:
+                    row: (int | None) = lca_object.product_dict.get((input_database, input_code))
+                    if row is not None:
+                        technosphere_exchanges += [(row, column, data["amount"], 0 if exchange_type == "production" else 1)]
+        
+        # Convert to arrays in the same form as the parameters of Brightway, but with the amounts as float64
+        dtype: list[tuple[str, str]] = [("row", "int64"), ("col", "int64"), ("amount", "float64"), ("type", "uint8")]
+        self.exchange_parameters[database]: tuple[np.array, np.array] = (np.array(technosphere_exchanges, dtype = dtype), np.array(biosphere_exchanges, dtype = dtype))
+        
+        # Return
+        return self.exchange_parameters[database]
+    
+    
+    def _get_exchange_matrices(self, database: str) -> dict:
+        
+        # Simply return, if already existing
+        if self.exchange_matrices.get(database) is not None:
+            return self.exchange_matrices[database]
+        
+        # Retrieve the lca object. If it was attached from shared memory, the exchange matrices were attached as well
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        if self.exchange_matrices.get(database) is not None:
+            return self.exchange_matrices[database]
+        
+        # Retrieve the technosphere and biosphere exchanges (row, column, amount and type) as stored in the database
+        tech_params, bio_params = self._get_exchange_parameters(database = database)
+        
+        # Separate the production exchanges (type 0) from all other technosphere exchanges
+        production: np.array = tech_params["type"] == 0
+        
+        # Count the production exchanges and the exchanges of each activity
+        number_of_production_exchanges: np.array = np.bincount(tech_params["col"][production], minlength = len(lca_object.activity_dict))
+        number_of_exchanges: np.array = np.bincount(tech_params["col"], minlength = len(lca_object.activity_dict)) + np.bincount(bio_params["col"], minlength = len(lca_object.activity_dict))
+        
+        # Raise error if no or more than one production exchange was found. Activities without any exchanges are skipped, they simply have no exchanges to extract
+        invalid: np.array = np.flatnonzero((number_of_production_exchanges != 1) & (number_of_exchanges > 0))
+        if len(invalid) > 0:
+            activity_key: tuple[str, str] = {column: key for key, column in lca_object.activity_dict.items()}[invalid[0]]
+            raise ValueError("The list of exchanges for activity '{}' contains {} production exchange(s).".format(activity_key, number_of_production_exchanges[invalid[0]]))
+        
+        # Retrieve the production amount of each activity. Activities without any exchanges keep a production amount of 1
+        production_amounts: np.array = np.ones(len(lca_object.activity_dict))
+        production_amounts[tech_params["col"][production]]: np.array = tech_params["amount"][production]
+        
+        # Calibrate exchange values to 1 activity amount (exchanges of activities with a production amount of 0 are set to 0)
+        scale: np.array = np.divide(1, production_amounts, out = np.zeros(len(production_amounts)), where = production_amounts != 0)
+        
+        # Build the normalised exchange matrices with the amounts as stored in the database (inputs are positive, other than in the technosphere matrix)
+        # Explicit zeros are kept, since exchanges with an amount of 0 are also extracted
+        technosphere_exchange_matrix: sparse.csr_matrix = sparse.coo_matrix((tech_params["amount"][~production] * scale[tech_params["col"][~production]],
+                                                                            (tech_params["row"][~production], tech_params["col"][~production])),
+                                                                           shape = (len(lca_object.product_dict), len(lca_object.activity_dict))).tocsr()
+        biosphere_exchange_matrix: sparse.csr_matrix = sparse.coo_matrix((bio_params["amount"] * scale[bio_params["col"]],
+                                                                         (bio_params["row"], bio_params["col"])),
+                                                                        shape = (len(lca_object.biosphere_dict), len(lca_object.activity_dict))).tocsr()
+        
+        # Add and return
+        return self._set_exchange_matrices(database = database,
+                                           technosphere_exchange_matrix = technosphere_exchange_matrix,
+                                           biosphere_exchange_matrix = biosphere_exchange_matrix)
+    
+    
+    def _set_exchange_matrices(self,
+                               database: str,
+                               technosphere_exchange_matrix: sparse.csr_matrix,
+                               biosphere_exchange_matrix: sparse.csr_matrix) -> dict:
+        
+        # Retrieve the lca object
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        
+        # The patterns have a 1 wherever an exchange exists (also exchanges with an amount of 0). They are used to track which flows are reached
+        technosphere_exchange_pattern: sparse.csr_matrix = sparse.csr_matrix((np.ones(len(technosphere_exchange_matrix.data)), technosphere_exchange_matrix.indices, technosphere_exchange_matrix.indptr), shape = technosphere_exchange_matrix.shape)
+        biosphere_exchange_pattern: sparse.csr_matrix = sparse.csr_matrix((np.ones(len(biosphere_exchange_matrix.data)), biosphere_exchange_matrix.indices, biosphere_exchange_matrix.indptr), shape = biosphere_exchange_matrix.shape)
+        
+        # Activities that do not have any exchange (other than the production) are not expanded further
+        has_exchanges: np.array = (np.bincount(technosphere_exchange_matrix.indices, minlength = technosphere_exchange_matrix.shape[1]) +
+                                   np.bincount(biosphere_exchange_matrix.indices, minlength = biosphere_exchange_matrix.shape[1])) > 0
+        
+        # Keys of the products and biosphere flows, in the order of the rows
+        product_keys: list[tuple] = sorted(lca_object.product_dict, key = lca_object.product_dict.get)
+        biosphere_keys: list[tuple] = sorted(lca_object.biosphere_dict, key = lca_object.biosphere_dict.get)
+        
+        # Map each product to the activity (column) with the same key. Products without activity have -1
+        product_to_activity: np.array = np.array([lca_object.activity_dict.get(m, -1) for m in product_keys], dtype = "int64")
+        
+        # Products can only be expanded if they belong to an activity that has exchanges
+        expandable: np.array = (product_to_activity >= 0) & has_exchanges[product_to_activity]
+        
+        # Add temporarily
+        self.exchange_matrices[database]: dict = {"technosphere_exchange_matrix": technosphere_exchange_matrix,
+                                                  "biosphere_exchange_matrix": biosphere_exchange_matrix,
+                                                  "technosphere_exchange_pattern": technosphere_exchange_pattern,
+                                                  "biosphere_exchange_pattern": biosphere_exchange_pattern,
+                                                  "product_to_activity": product_to_activity,
+                                                  "expandable": expandable,
+                                                  "product_keys": product_keys,
+                                                  "biosphere_keys": biosphere_keys}
+        
+        # Return
+        return self.exchange_matrices[database]
+    
+    
+    
+    # Support function to extract exchanges of an activity based on a specific level
+    def _extract_LCI_exchanges_of_activity_at_certain_level(self,
+                                                            activity_key: tuple[str, str],
+                                                            level: int) -> list[tuple]:
+        
+        # Retrieve the normalised exchange matrices of the database the activity belongs to
+        # The supply chain is expanded with one sparse matrix-vector product per level, without loading any exchanges from the database
+        exchange_matrices: dict = self._get_exchange_matrices(database = self._get_system_of_database(database = activity_key[0]))
+        product_to_activity: np.array = exchange_matrices["product_to_activity"]
+        expandable: np.array = exchange_matrices["expandable"]
+        
+        # Initialize the amounts of the products at the current level, starting with the activity itself (level 0)
+        # Next to the amounts, we track which products have been reached, since amounts can also be 0
+        start: int = self._get_LCA_object(database = self._get_system_of_database(database = activity_key[0])).product_dict[activity_key]
+        current_amounts: np.array = np.zeros(len(product_to_activity))
+        current_amounts[start] = self.functional_amount
+        current_reached: np.array = np.zeros(len(product_to_activity), dtype = bool)
+        current_reached[start] = True
+        
+        # Initialize the products that are not expanded further (activities without exchanges) and the biosphere flows
+        final_amounts: np.array = np.zeros(len(product_to_activity))
+        final_reached: np.array = np.zeros(len(product_to_activity), dtype = bool)
+        biosphere_amounts: np.array = np.zeros(len(exchange_matrices["biosphere_keys"]))
+        biosphere_reached: np.array = np.zeros(len(exchange_matrices["biosphere_keys"]), dtype = bool)
+        
+        # Extract exchanges as many times as there are levels
+        for _ in range(level):
+            
+            # Products that can not be expanded are simply moved to the end result
+            final_amounts += np.where(expandable, 0, current_amounts)
+            final_reached |= current_reached & ~expandable
+            
+            # Write the amounts of the products that are expanded to the respective activities
+            activity_amounts: np.array = np.zeros(exchange_matrices["technosphere_exchange_matrix"].shape[1])
+            activity_reached: np.array = np.zeros(exchange_matrices["technosphere_exchange_matrix"].shape[1])
+            activity_amounts[product_to_activity[expandable]] = current_amounts[expandable]
+            activity_reached[product_to_activity[expandable]] = current_reached[expandable]
+            
+            # Biosphere flows do not have exchanges, they are directly added to the end result
+            biosphere_amounts += exchange_matrices["biosphere_exchange_matrix"] * activity_amounts
+            biosphere_reached |= (exchange_matrices["biosphere_exchange_pattern"] * activity_reached) > 0
+            
+            # The technosphere exchanges are the products of the next level
+            current_amounts: np.array = exchange_matrices["technosphere_exchange_matrix"] * activity_amounts
+            current_reached: np.array = (exchange_matrices["technosphere_exchange_pattern"] * activity_reached) > 0
+        
+        # The products of the last level are added to the end result as well
+        final_amounts += current_amounts
+        final_reached |= current_reached
+        
+        # Return the aggregated exchanges of the activity
+        return ([(activity_key, self.functional_amount, exchange_matrices["product_keys"][m], float(final_amounts[m]), None, None) for m in np.flatnonzero(final_reached)] +
+                [(activity_key, self.functional_amount, exchange_matrices["biosphere_keys"][m], float(biosphere_amounts[m]), None, None) for m in np.flatnonzero(biosphere_reached)])
+    
+    
+        
+    def _get_technosphere_matrix_as_csc(self, database: str) -> sparse.csc_matrix:
+        
+        # Simply return, if already existing
+        if self.technosphere_matrices_as_csc.get(database) is not None:
+            return self.technosphere_matrices_as_csc[database]
+        
+        # Convert the technosphere matrix, so that the inputs of an activity (= column) can be accessed quickly
+        technosphere_matrix: sparse.csc_matrix = self._get_LCA_object(database = database).technosphere_matrix.tocsc()
+        technosphere_matrix.sort_indices()
+        
+        # Temporarily store
+        self.technosphere_matrices_as_csc[database]: sparse.csc_matrix = technosphere_matrix
+        
+        # Return
+        return technosphere_matrix
+    
+    
+    def _traverse_supply_chain_graph_for_unit_scores(self,
+                                                     database: str,
+                                                     activity_key: tuple[str, str],
+                                                     unit_scores: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        
+        # Retrieve the lca object, the technosphere matrix (by column) and the mapping from products to activities
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        technosphere_matrix: sparse.csc_matrix = self._get_technosphere_matrix_as_csc(database = database)
+        product_indices: np.array = self._get_product_indices_of_activities(database = database)
+        product_to_activity: np.array = self._get_exchange_matrices(database = database)["product_to_activity"]
+        
+        # The production amount of each activity (diagonal of the technosphere matrix), to convert amounts of a product to the activity level
+        production_amounts: np.array = np.asarray(technosphere_matrix[product_indices, np.arange(len(product_indices))]).reshape(-1)
+        
+        # The root node is the activity itself, with the functional amount of its product
+        root: int = lca_object.activity_dict[activity_key]
+        total_score: float = self.functional_amount * unit_scores[root]
+        
+        # Suppliers below this (absolute) score are neither added to the graph nor expanded
+        threshold: float = abs(total_score) * self.graph_traversal_cut_off
+        
+        # Initialize the heap with the root node. Nodes with the highest absolute cumulative score are expanded first
+        # The graph is expanded as a tree: a supplier of several consumers is expanded once per path, each time with the amount flowing along that path
+        # Otherwise, the subtree of a shared supplier would only contain the amount of the first consumer. The number of expanded nodes is bounded by 'graph_traversal_max_nodes'
+        # The counter makes the order unique if two nodes have the same score
+        heap: list[tuple] = [(-abs(total_score), 0, root, float(self.functional_amount))]
+        counter: int = 1
+        
+        # Initialize lists to store the edges to (consumer, amount of consumer, supplier, amount of supplier, cumulative score of supplier)
+        consumers: list[int] = []
+        consumer_amounts: list[float] = []
+        suppliers: list[int] = []
+        supplier_amounts: list[float] = []
+        scores: list[float] = []
+        
+        # Expand as many nodes as specified
+        for _ in range(self.graph_traversal_max_nodes):
+            
+            # Stop, if no nodes are left
+            if len(heap) == 0:
+                break
+            
+            # Retrieve the node with the highest absolute cumulative score
+            _, _, node, node_amount = heapq.heappop(heap)
+            
+            # Activity level of the node, i.e. how often the activity needs to run to produce the amount of its product
+            activity_level: float = node_amount / production_amounts[node] if production_amounts[node] != 0 else 0
+            
+            # Retrieve the inputs of the activity (all entries of its column, except its own product)
+            start, end = technosphere_matrix.indptr[node], technosphere_matrix.indptr[node + 1]
+            products: np.array = technosphere_matrix.indices[start:end]
+            amounts: np.array = -technosphere_matrix.data[start:end] * activity_level
+            inputs: np.array = (products != product_indices[node]) & (product_to_activity[products] >= 0)
+            
+            # Loop through each input (= supplier) and its amount
+            for supplier, amount in zip(product_to_activity[products[inputs]], amounts[inputs]):
+                
+                # Cumulative score of the amount of the supplier
+                score: float = amount * unit_scores[supplier]
+                
+                # Skip suppliers below the cut off
+                if abs(score) < threshold:
+                    continue
+                
+                # Add the edge
+                consumers += [node]
+                consumer_amounts += [node_amount]
+                suppliers += [supplier]
+                supplier_amounts += [amount]
+                scores += [score]
+                
+                # Add the supplier to the heap, with the amount of the current path
+                heapq.heappush(heap, (-abs(score), counter, supplier, float(amount)))
+                counter += 1
+        
+        # Return the edges as arrays
+        return (np.array(consumers, dtype = "int64"), np.array(consumer_amounts, dtype = "float64"), np.array(suppliers, dtype = "int64"),
+                np.array(supplier_amounts, dtype = "float64"), np.array(scores, dtype = "float64"))
+    
+    
+    def _traverse_supply_chain_graph(self, activity_key: tuple[str, str]) -> None:
+        
+        # First get the database (system) the activity belongs to
+        database: str = self._get_system_of_database(database = activity_key[0])
+        
+        # Retrieve the scores of one unit of each activity for all methods (activities x methods), as well as the key of each activity (as index into the key lookup table)
+        unit_scores: np.array = self._get_unit_scores(database = database)
+        activity_key_indices: np.array = self._get_activity_dict_as_array(database = database)
+        
+        # Methods with identical characterization factors have the same graph. We only traverse it once for each row of the stacked characterization matrix
+        method_indices: np.array = self._get_method_indices_of_stacked_characterization_matrix(database = database)
+        edges_of_rows: dict[int, tuple] = {}
+        
+        # Loop through each method
+        for met_index, (met, row) in enumerate(zip(self.methods, method_indices)):
+            
+            # Traverse the graph, if not yet done for the row of the method
+            if edges_of_rows.get(row) is None:
+                edges_of_rows[row]: tuple = self._traverse_supply_chain_graph_for_unit_scores(database = database,
+                                                                                              activity_key = activity_key,
+                                                                                              unit_scores = unit_scores[:, met_index])
+            
+            # Retrieve the edges
+            consumers, consumer_amounts, suppliers, supplier_amounts, scores = edges_of_rows[row]
+            
+            # Add the edges to the result dictionary. The consumer is stored as activity, the supplier as flow
+            self.results_raw[self.name_LCIA_supply_chain_graph].add_arrays(activity = activity_key_indices[consumers],
+                                                                          activity_amount = consumer_amounts,
+                                                                          flow = activity_key_indices[suppliers],
+                                                                          flow_amount = supplier_amounts,
+                                                                          value = scores,
+                                                                          method = self._get_method_index(method = met),
+                                                                          root = self._get_key_index(key = activity_key))
+    
+    
+    def _add_matrix_to_fingerprint(self, fingerprint, matrix: sparse.spmatrix) -> None:
+        
+        # Bring the matrix into a canonical form, so that the same matrix always results in the same fingerprint
+        matrix: sparse.csr_matrix = sparse.csr_matrix(matrix).sorted_indices()
+        
+        # Add the shape and all buffers of the matrix
+        for array in (np.array(matrix.shape, dtype = "int64"), matrix.data.astype("float64"), matrix.indices.astype("int64"), matrix.indptr.astype("int64")):
+            fingerprint.update(np.ascontiguousarray(array).tobytes())
+    
+    
+    def _get_database_fingerprint(self, database: str) -> str:
+        
+        # Simply return, if already existing
+        if self.database_fingerprints.get(database) is not None:
+            return self.database_fingerprints[database]
+        
+        # Get the Brightway2 LCA object, which contains the processed matrices of the database (and of the databases it depends on)
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        
+        # Initialize the fingerprint with the name of the database
+        fingerprint = hashlib.blake2b(database.encode(), digest_size = 16)
+        
+        # Add the technosphere and biosphere matrix
+        for matrix in (lca_object.technosphere_matrix, lca_object.biosphere_matrix):
+            self._add_matrix_to_fingerprint(fingerprint = fingerprint, matrix = matrix)
+        
+        # Add the keys of the rows and columns of the matrices
+        for mapping in (lca_object.activity_dict, lca_object.product_dict, lca_object.biosphere_dict):
+            fingerprint.update(repr(sorted(mapping.items(), key = lambda m: m[1])).encode())
+        
+        # Add to dictionary
+        self.database_fingerprints[database]: str = fingerprint.hexdigest()
+        
+        # Return
+        return self.database_fingerprints[database]
+    
+    
+    def _get_methods_fingerprint(self, database: str) -> str:
+        
+        # Simply return, if already existing
+        if self.methods_fingerprints.get(database) is not None:
+            return self.methods_fingerprints[database]
+        
+        # Initialize the fingerprint with the methods
+        fingerprint = hashlib.blake2b(repr(self.methods).encode(), digest_size = 16)
+        
+        # Add the characterization factors of all methods, as they are mapped to the biosphere flows of the database
+        self._add_matrix_to_fingerprint(fingerprint = fingerprint, matrix = self._get_stacked_characterization_matrix(database = database))
+        fingerprint.update(np.asarray(self._get_method_indices_of_stacked_characterization_matrix(database = database), dtype = "int64").tobytes())
+        
+        # Add to dictionary
+        self.methods_fingerprints[database]: str = fingerprint.hexdigest()
+        
+        # Return
+        return self.methods_fingerprints[database]
+    
+    
+    def _get_settings_fingerprint(self) -> str:
+        
+        # All settings that change the results of an activity
+        # The tolerance only changes the results of the iterative solvers. The direct solvers therefore share a fixed value, so that their results are cached independent of the tolerance
+        settings: tuple = (self.cut_off_percentage,
+                           self.top_k_contributions,
+                           self.exchange_level,
+                           self.graph_traversal_cut_off,
+                           self.graph_traversal_max_nodes,
+                           self.solver,
+                           self.solver_tolerance if self.solver in ("bicgstab", "gmres") else None)
+        
+        # Return the fingerprint of the settings
+        return hashlib.blake2b(repr(settings).encode(), digest_size = 16).hexdigest()
+    
+    
+    def _get_result_cache_connection(self) -> sqlite3.Connection:
+        
+        # Simply return, if already existing
+        if self.result_cache_connection is not None:
+            return self.result_cache_connection
+        
+        # Open the file. Workers might write to the same file at the same time, therefore we wait if it is locked
+        self.result_cache_connection: sqlite3.Connection = sqlite3.connect(str(self.result_cache_path), timeout = 60)
+        
+        # Create the table, if not yet existing. The rows of each result are stored as pickled result store
+        self.result_cache_connection.execute("CREATE TABLE IF NOT EXISTS results (database_fingerprint TEXT, methods_fingerprint TEXT, settings_fingerprint TEXT, activity TEXT, functional_amount REAL, result_type TEXT, rows BLOB, "
+                                             "PRIMARY KEY (database_fingerprint, methods_fingerprint, settings_fingerprint, activity, functional_amount, result_type))")
+        self.result_cache_connection.commit()
+        
+        # Return
+        return self.result_cache_connection
+    
+    
+    def _get_result_cache_identifier(self, activity_key: tuple[str, str]) -> tuple:
+        
+        # The results of an activity are identified by the fingerprints of its database, the methods and the settings, as well as by the activity and the functional amount
+        return (self._get_database_fingerprint(database = self._get_system_of_database(database = activity_key[0])),
+                self._get_methods_fingerprint(database = self._get_system_of_database(database = activity_key[0])),
+                self._get_settings_fingerprint(),
+                repr(activity_key),
+                float(self.functional_amount))
+    
+    
+    def _load_results_from_cache(self, activity_key: tuple[str, str], result_types: list[str]) -> bool:
+        
+        # Retrieve all results of the activity that are cached
+        cached_results: dict[str, bytes] = dict(self._get_result_cache_connection().execute("SELECT result_type, rows FROM results WHERE database_fingerprint = ? AND methods_fingerprint = ? AND settings_fingerprint = ? AND activity = ? AND functional_amount = ?",
+                                                                                           self._get_result_cache_identifier(activity_key = activity_key)).fetchall())
+        
+        # The activity needs to be calculated, if any of the results is missing
+        if any([cached_results.get(m) is None for m in result_types]):
+            return False
+        
+        # Add the cached results to the result dictionary
+        for result_type in result_types:
+            self.results_raw[result_type].extend(pickle.loads(cached_results[result_type]))
+        
+        # Return
+        return True
+    
+    
+    def _save_results_to_cache(self, activity_keys: list[tuple[str, str]], result_types: list[str]) -> None:
+        
+        # Activities that occur more than once are not saved, since their results can not be separated from each other
+        key_indices, counts = np.unique(np.array([self._get_key_index(key = m) for m in activity_keys], dtype = "int64"), return_counts = True)
+        key_indices: np.array = key_indices[counts == 1]
+        
+        # Initialize a list to store the rows of the cache to
+        entries: list[tuple] = []
+        
+        # Loop through each result type
+        for result_type in result_types:
+            
+            # The edges of the supply chain graph belong to the root activity, all other results to the activity itself
+            column: np.array = self.results_raw[result_type].get_columns()["root" if result_type == self.name_LCIA_supply_chain_graph else "activity"]
+            
+            # Sort the rows by activity, keeping the order of the rows within each activity
+            order: np.array = np.argsort(column, kind = "stable")
+            starts: np.array = np.searchsorted(column[order], key_indices, side = "left")
+            ends: np.array = np.searchsorted(column[order], key_indices, side = "right")
+            
+            # Add the rows of each activity
+            entries += [self._get_result_cache_identifier(activity_key = self.lookup_tables["keys"][m]) + (result_type, pickle.dumps(self.results_raw[result_type].select(rows = order[start:end])))
+                        for m, start, end in zip(key_indices, starts, ends)]
+        
+        # Write to the file
+        connection: sqlite3.Connection = self._get_result_cache_connection()
+        connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)", entries)
+        connection.commit()
+    
+    
+    def _get_result_types_of_calculation(self,
+                                         calculate_LCIA_scores: bool,
+                                         extract_LCI_exchanges: bool,
+                                         extract_LCI_emission_contribution: bool,
+                                         extract_LCI_process_contribution: bool,
+                                         calculate_LCIA_scores_of_exchanges: bool,
+                                         calculate_LCIA_emission_contribution: bool,
+                                         calculate_LCIA_process_contribution: bool,
+                                         calculate_LCIA_supply_chain_graph: bool) -> list[str]:
+        
+        # Return the names of the results that are calculated
+        return [name for name, flag in ((self.name_LCIA_scores, calculate_LCIA_scores),
+                                        (self.name_LCI_exchanges, extract_LCI_exchanges),
+                                        (self.name_LCI_emission_contributions, extract_LCI_emission_contribution),
+                                        (self.name_LCI_process_contributions, extract_LCI_process_contribution),
+                                        (self.name_LCIA_immediate_scores, calculate_LCIA_scores_of_exchanges),
+                                        (self.name_LCIA_emission_contributions, calculate_LCIA_emission_contribution),
+                                        (self.name_LCIA_process_contributions, calculate_LCIA_process_contribution),
+                                        (self.name_LCIA_supply_chain_graph, calculate_LCIA_supply_chain_graph)) if flag]
+    
+    
+    def _initialize_results_raw(self) -> dict[str, LCA_Result_Store]:
+        
+        # Initialize one columnar store per result type
+        # All result types share the lookup tables of the calculation, so that the structured arrays can directly store indices
+        results_raw: dict[str, LCA_Result_Store] = {k: LCA_Result_Store(lookup_tables = self.lookup_tables) for k in (self.name_LCIA_scores,
+                                                                                                                 self.name_LCI_exchanges,
+                                                                                                                 self.name_LCI_emission_contributions,
+                                                                                                                 self.name_LCI_process_contributions,
+                                                                                                                 self.name_LCIA_immediate_scores,
+                                                                                                                 self.name_LCIA_emission_contributions,
+                                                                                                                 self.name_LCIA_process_contributions)}
+        
+        # The edges of the supply chain graph additionally store the root activity from where the graph was traversed
+        results_raw[self.name_LCIA_supply_chain_graph]: LCA_Result_Store = LCA_Result_Store(lookup_tables = self.lookup_tables, key_columns = ("root",))
+        
+        # Return
+        return results_raw
+    
+    
+    def _get_chunks_of_activity_keys(self) -> list[tuple[tuple[str, str]]]:
+        
+        # Initialize a dictionary to group the activity keys by database (system)
+        # The order of the databases and of the activities within a database is the same as in the activity list
+        activity_keys_by_database: dict[str, list[tuple[str, str]]] = {}
+        
+        # Loop through each activity and add its key to the respective database
+        for act in self.activities:
+            
+            # Retrieve the system the activity is calculated in
+            database: str = self._get_system_of_database(database = act.key[0])
+            
+            # Initialize a new list if not yet existing
+            if activity_keys_by_database.get(database) is None:
+                activity_keys_by_database[database]: list[tuple[str, str]] = []
+            
+            # Add the key
+            activity_keys_by_database[database] += [act.key]
+        
+        # Split the activity keys of each database into chunks of the specified size
+        # A chunk therefore never contains activities of more than one database
+        return [tuple(keys[idx:idx + self.chunk_size]) for keys in activity_keys_by_database.values() for idx in range(0, len(keys), self.chunk_size)]
+    
+    
+    def _get_project_settings(self) -> dict:
+        
+        # The Brightway project (and directory) needs to be set in each worker
+        return {"base_data_dir": bw2data.projects._base_data_dir,
+                "base_logs_dir": bw2data.projects._base_logs_dir,
+                "project": bw2data.projects.current}
+    
+    
+    def _get_calculation_settings(self) -> dict:
+        
+        # Settings to initialize the calculation class in each worker. Workers themselves always calculate on one process
+        return {"methods": self.methods,
+                "functional_amount": self.functional_amount,
+                "cut_off_percentage": self.cut_off_percentage,
+                "top_k_contributions": self.top_k_contributions,
+                "exchange_level": self.exchange_level,
+                "solve_in_batches": self.solve_in_batches,
+                "batch_size": self.batch_size,
+                "solver": self.solver,
+                "solver_tolerance": self.solver_tolerance,
+                "use_unified_system": self.use_unified_system,
+                "cache_matrices_on_disk": self.cache_matrices_on_disk,
+                "score_exchanges_with_unit_scores": self.score_exchanges_with_unit_scores,
+                "graph_traversal_cut_off": self.graph_traversal_cut_off,
+                "graph_traversal_max_nodes": self.graph_traversal_max_nodes,
+                "result_cache_path": self.result_cache_path}
+    
+    
+    def _calculate_in_parallel(self, **calculation_flags) -> None:
+        
+        # Save time when calculation starts
+        if self.progress_bar:
+            start_round_1: datetime.datetime = datetime.datetime.now()
+        
+        # Split the activities into chunks, one chunk is calculated by one worker at once
+        chunks: list[tuple[tuple[str, str]]] = self._get_chunks_of_activity_keys()
+        
+        # Build the matrices of each database once and put them into shared memory, if specified
+        shared_LCA_objects: dict[str, dict] = {}
+        shared_memory_blocks: list[shared_memory.SharedMemory] = []
+        
+        # Check if matrices should be shared
+        if self.share_matrices_between_workers:
+            
+            # Loop through each database that is calculated
+            for database in dict.fromkeys([self._get_system_of_database(database = m[0][0]) for m in chunks]):
+                
+                # Export the matrices of the database
+                descriptor, blocks = self._export_LCA_object_to_shared_memory(database = database)
+                
+                # Add
+                shared_LCA_objects[database]: dict = descriptor
+                shared_memory_blocks += blocks
+        
+        # Initialize the results dictionary, the same way as for the calculation on one process
+        self.results_raw: dict[str, LCA_Result_Store] = self._initialize_results_raw()
+        
+        # Start the process pool
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers = self.number_of_workers,
+                                                        initializer = _initialize_worker,
+                                                        initargs = (self._get_project_settings(), self._get_calculation_settings(), shared_LCA_objects, self.unified_system_databases)) as executor:
+                
+                # Submit all chunks to the pool
+                futures: list[concurrent.futures.Future] = [executor.submit(_calculate_chunk_in_worker, chunk, calculation_flags) for chunk in chunks]
+                
+                # Check if progress bar should be printed to console
+                if self.progress_bar:
+                    
+                    # Wrap progress bar around iterator
+                    futures: list = hp.progressbar(futures, prefix = "\nCalculate ({} workers) ...".format(self.number_of_workers))
+                
+                # Loop through the futures in the order of submission, so that results are always put together in the same order
+                for future in futures:
+                    
+                    # Add the results of the chunk to the result dictionary
+                    for result_type, results in future.result().items():
+                        self.results_raw[result_type].extend(results)
+        
+        finally:
+            # Release the shared memory, once all workers are done
+            for block in shared_memory_blocks:
+                block.close()
+                block.unlink()
+        
+        # Print summary statement(s)
+        if self.progress_bar:
+            
+            # Save current time
+            end_round_1: datetime.datetime = datetime.datetime.now()
+            
+            # Print statement
+            print("  - Calculation time: {}".format(self.convert_timedelta(end_round_1 - start_round_1)))
+            
+            if calculation_flags["calculate_LCIA_scores"]:
+                print("      - {} LCIA score(s) from {} activity/ies & {} methods were calculated".format(len(self.activities)*len(self.methods), len(self.activities), len(self.methods)))
+        
+    
+        
+    def calculate(self,
+                  calculate_LCIA_scores: bool = True,
+                  extract_LCI_exchanges: bool = False,
+                  extract_LCI_emission_contribution: bool = False,
+                  extract_LCI_process_contribution: bool = False,
+                  calculate_LCIA_scores_of_exchanges: bool = False,
+                  calculate_LCIA_emission_contribution: bool = False,
+                  calculate_LCIA_process_contribution: bool = False,
+                  calculate_LCIA_supply_chain_graph: bool = False,
+                  functional_amounts: (list | None) = None):
+        
+        # If several functional amounts are specified, everything is calculated once for a demand of 1
+        # Since LCA is linear in demand, the results are scaled to each functional amount only when they are retrieved or written (see 'get_results' and 'write_results')
+        if functional_amounts is not None:
+            
+            # Raise error if the functional amounts are not all numbers
+            if len(functional_amounts) == 0 or not all([isinstance(m, (int, float, np.integer, np.floating)) and not isinstance(m, bool) for m in functional_amounts]):
+                raise ValueError("Input variable 'functional_amounts' needs to be a list of at least one number but is currently '" + str(functional_amounts) + "'.")
+            
+            # Calculate with a functional amount of 1. The functional amount of the class is restored afterwards
+            functional_amount: (int | float) = self.functional_amount
+            self.functional_amount: (int | float) = 1
+            
+            # Calculate
+            try:
+                self.calculate(calculate_LCIA_scores = calculate_LCIA_scores,
+                               extract_LCI_exchanges = extract_LCI_exchanges,
+                               extract_LCI_emission_contribution = extract_LCI_emission_contribution,
+                               extract_LCI_process_contribution = extract_LCI_process_contribution,
+                               calculate_LCIA_scores_of_exchanges = calculate_LCIA_scores_of_exchanges,
+                               calculate_LCIA_emission_contribution = calculate_LCIA_emission_contribution,
+                               calculate_LCIA_process_contribution = calculate_LCIA_process_contribution,
+                               calculate_LCIA_supply_chain_graph = calculate_LCIA_supply_chain_graph)
+            
+            finally:
+                self.functional_amount: (int | float) = functional_amount
+            
+            # Add to object, so that the results are scaled
+            self.functional_amounts: tuple = tuple(functional_amounts)
+            return
+        
+        # Results are retrieved as calculated
+        self.functional_amounts: (tuple | None) = None
+        
+        # Run the calculation on multiple processes, if specified
+        if self.number_of_workers > 1:
+            self._calculate_in_parallel(calculate_LCIA_scores = calculate_LCIA_scores,
+                                        extract_LCI_exchanges = extract_LCI_exchanges,
+                                        extract_LCI_emission_contribution = extract_LCI_emission_contribution,
+                                        extract_LCI_process_contribution = extract_LCI_process_contribution,
+                                        calculate_LCIA_scores_of_exchanges = calculate_LCIA_scores_of_exchanges,
+                                        calculate_LCIA_emission_contribution = calculate_LCIA_emission_contribution,
+                                        calculate_LCIA_process_contribution = calculate_LCIA_process_contribution,
+                                        calculate_LCIA_supply_chain_graph = calculate_LCIA_supply_chain_graph)
+            return
+        
+        # Add an instance where results will be saved to
+        self.results_raw: dict[str, LCA_Result_Store] = self._initialize_results_raw()
+        
+        # Save time when calculation starts
+        if self.progress_bar:
+            start_round_1: datetime.datetime = datetime.datetime.now()
+        
+        # If only the LCIA scores are calculated, we do not need the inventory matrix at all
+        # In that case, the scores of all methods are directly calculated from the supply array (fast path)
+        calculate_LCIA_scores_only: bool = calculate_LCIA_scores and not any((extract_LCI_exchanges,
+                                                                              extract_LCI_emission_contribution,
+                                                                              extract_LCI_process_contribution,
+                                                                              calculate_LCIA_scores_of_exchanges,
+                                                                              calculate_LCIA_emission_contribution,
+                                                                              calculate_LCIA_process_contribution))
+        
+        # If only the supply chain graph is calculated, we do not need to solve the linear system for each activity
+        # The graph is traversed with the unit scores of all activities
+        calculate_LCIA_supply_chain_graph_only: bool = calculate_LCIA_supply_chain_graph and not any((calculate_LCIA_scores,
+                                                                                                       extract_LCI_exchanges,
+                                                                                                       extract_LCI_emission_contribution,
+                                                                                                       extract_LCI_process_contribution,
+                                                                                                       calculate_LCIA_scores_of_exchanges,
+                                                                                                       calculate_LCIA_emission_contribution,
+                                                                                                       calculate_LCIA_process_contribution))
+        
+        # Retrieve the names of the results that are calculated. Those are loaded from and saved to the result cache, if specified
+        result_types: list[str] = self._get_result_types_of_calculation(calculate_LCIA_scores = calculate_LCIA_scores,
+                                                                        extract_LCI_exchanges = extract_LCI_exchanges,
+                                                                        extract_LCI_emission_contribution = extract_LCI_emission_contribution,
+                                                                        extract_LCI_process_contribution = extract_LCI_process_contribution,
+                                                                        calculate_LCIA_scores_of_exchanges = calculate_LCIA_scores_of_exchanges,
+                                                                        calculate_LCIA_emission_contribution = calculate_LCIA_emission_contribution,
+                                                                        calculate_LCIA_process_contribution = calculate_LCIA_process_contribution,
+                                                                        calculate_LCIA_supply_chain_graph = calculate_LCIA_supply_chain_graph)
+        
+        # Initialize a list to store the activities (as indices into the key lookup table) whose results were loaded from the result cache
+        cached_activity_key_indices: list[int] = []
+        
+        # Retrieve the combinations that should be calculated
+        activities: list = self.activities
+        
+        # Check if progress bar should be printed to console
+        if self.progress_bar:
+            
+            # Wrap progress bar around iterator
+            activities: list = hp.progressbar(activities, prefix = "\nCalculate ...")
+        
+        # Loop through all activities
+        for act in activities:
+            
+            # Extract the activity key
+            activity_key: tuple[str, str] = act.key
+            
+            # First get the database (system) the activity belongs to
+            database: str = self._get_system_of_database(database = activity_key[0])
+            
+            # Load the results of the activity from the result cache, if specified. The activity is only calculated, if any of its results is missing
+            if self.result_cache_path is not None and self._load_results_from_cache(activity_key = activity_key, result_types = result_types):
+                cached_activity_key_indices += [self._get_key_index(key = activity_key)]
+                continue
+            
+            # Traverse the supply chain graph of the activity, if specified
+            if calculate_LCIA_supply_chain_graph:
+                self._traverse_supply_chain_graph(activity_key = activity_key)
+            
+            # Go to next activity, if nothing else needs to be calculated
+            if calculate_LCIA_supply_chain_graph_only:
+                continue
+            
+            # Fast path, if only LCIA scores need to be calculated
+            if calculate_LCIA_scores_only:
+                
+                # Solve the linear system to get the supply array
+                supply_array: np.array = self._solve_supply_array(database = database, activity_key = activity_key)
+                
+                # Sum up the biosphere flows of the inventory (g = B * s) without building the inventory matrix
+                biosphere_flows: np.array = self._get_LCA_object(database = database).biosphere_matrix * supply_array
+                
+                # Calculate the scores of all methods at once with the stacked characterization matrix
+                scores: np.array = (self._get_stacked_characterization_matrix(database = database) * biosphere_flows)[self._get_method_indices_of_stacked_characterization_matrix(database = database)]
+                
+                # Add to list in the result dictionary, using the same ID tuple as below
+                self.results_raw[self.name_LCIA_scores].add_tuples([(activity_key, self.functional_amount, None, None, float(score), met) for met, score in zip(self.methods, scores)])
+                
+                # Go to next activity
+                continue
+
+            # This block is needed for any calculation
+            # We at least need to get 1) the BW object and to redo 2) the inventory matrix (either directly or from a batch of solved activities)
+            lca_object: bw2calc.lca.LCA = self._redo_lci(database = database, activity_key = activity_key)
+            
+            # We then extract the inventory matrix
+            inventory: np.matrix = lca_object.inventory
+            
+            # Extract LCI exchanges, if specified
+            # We also need to extract the exchanges if we calculate the immediate scores
+            if any((extract_LCI_exchanges, calculate_LCIA_scores_of_exchanges)):
+                
+                # Extract the LCI exchanges
+                LCI_exchanges_at_level: list[tuple] = self._extract_LCI_exchanges_of_activity_at_certain_level(activity_key = activity_key, level = self.exchange_level)
+                
+                # Add
+                if extract_LCI_exchanges:
+                    self.results_raw[self.name_LCI_exchanges].add_tuples(LCI_exchanges_at_level)
+            
+            
+            # If we need to do any LCIA calculation, we need to do the following block
+            # This however will only be done for LCIA score calculation, LCIA emission contribution and LCIA process contribution
+            if any([calculate_LCIA_scores, calculate_LCIA_emission_contribution, calculate_LCIA_process_contribution]):
+                
+                # Retrieve the stacked characterization matrix (unique methods x biosphere flows) and the row of each method
+                # All methods are calculated at once with this matrix
+                stacked_characterization_matrix: sparse.csr_matrix = self._get_stacked_characterization_matrix(database = database)
+                method_indices: np.array = self._get_method_indices_of_stacked_characterization_matrix(database = database)
+                
+                # Sum up the biosphere flows of the inventory (g = B * s)
+                biosphere_flows: np.array = lca_object.biosphere_matrix * lca_object.supply_array
+            
+            # If LCIA scores are calculated, go on
+            if calculate_LCIA_scores:
+                
+                # Calculate the scores of all methods at once
+                scores: np.array = (stacked_characterization_matrix * biosphere_flows)[method_indices]
+                
+                # Loop through each method and score
+                for met, score in zip(self.methods, scores):
+                    
+                    # The ID tuple is always of length 5!
+                    ID: tuple = (
+                        act.key, # Key of the current activity
+                        self.functional_amount, # The amount that was calculated
+                        None, # Flow key, not used here
+                        None, # Flow amount, not used here
+                        float(score), # The calculated impact assessment result
+                        met # The method we calculated the result for
+                    ) 
+                    
+                    # Add to list in the result dictionary
+                    self.results_raw[self.name_LCIA_scores].add_tuples([ID])
+                    
+                    # We add the calculated score to a temporary dict, with demand 1
+                    # This because we might use it further below
+                    if calculate_LCIA_scores_of_exchanges:
+                        
+                        # Check if activity key is already temporarily stored
+                        if self._temporary_score_results.get(activity_key) is None:
+                            
+                            # If not, initialize new dictionary
+                            self._temporary_score_results[activity_key]: dict = {}
+                        
+                        # Add the calculated result to it
+                        self._temporary_score_results[activity_key][met]: float = (1 / self.functional_amount * float(score)) if self.functional_amount != 0 else 0
+                    
+            
+            # Extract the LCI emission contribution
+            if extract_LCI_emission_contribution:
+                
+                # Extract the LCI emission contribution as the sum of the inventory matrix
+                LCI_emission_contribution_array: np.array = np.array(inventory.sum(axis = 1))[:, 0]
+                
+                # We don't apply a cutoff, but remove all lines with 0 value, and add to the result dictionary
+                self._add_contributions_to_results(result_type = self.name_LCI_emission_contributions,
+                                                   activity_key = activity_key,
+                                                   values = LCI_emission_contribution_array[None, :],
+                                                   flow_key_indices = self._get_biosphere_dict_as_array(database = database),
+                                                   method_indices = None,
+                                                   cut_off = None,
+                                                   top_k = None)
+            
+            # Extract the LCI process contribution
+            if extract_LCI_process_contribution:
+                
+                # Extract the LCI process contribution as the sum of the transposed inventory matrix
+                LCI_process_contribution_array: np.array = np.array(inventory.transpose().sum(axis = 1))[:, 0]
+                
+                # We don't apply a cutoff, but remove all lines with 0 value, and add to the result dictionary
+                self._add_contributions_to_results(result_type = self.name_LCI_process_contributions,
+                                                   activity_key = activity_key,
+                                                   values = LCI_process_contribution_array[None, :],
+                                                   flow_key_indices = self._get_activity_dict_as_array(database = database),
+                                                   method_indices = None,
+                                                   cut_off = None,
+                                                   top_k = None)
+
+            # Calculate the LCIA emission contribution of all (unique) methods at once
+            if calculate_LCIA_emission_contribution:
+                
+                # Characterize the biosphere flows of all (unique) methods at once (unique methods x biosphere flows)
+                LCIA_emission_contribution_matrix: np.array = (stacked_characterization_matrix * sparse.diags(biosphere_flows)).toarray()
+                
+                # Apply the cut off to all methods at once and add to the result dictionary
+                self._add_contributions_to_results(result_type = self.name_LCIA_emission_contributions,
+                                                   activity_key = activity_key,
+                                                   values = LCIA_emission_contribution_matrix,
+                                                   flow_key_indices = self._get_biosphere_dict_as_array(database = database),
+                                                   method_indices = method_indices,
+                                                   cut_off = self.cut_off_percentage,
+                                                   top_k = self.top_k_contributions)
+            
+            # Calculate the LCIA process contribution of all (unique) methods at once
+            if calculate_LCIA_process_contribution:
+                
+                # Characterize the direct impacts of all activities, scaled with the supply array, for all (unique) methods at once (unique methods x activities)
+                LCIA_process_contribution_matrix: np.array = (self._get_characterized_biosphere_matrix(database = database) * sparse.diags(lca_object.supply_array)).toarray()
+                
+                # Apply the cut off to all methods at once and add to the result dictionary
+                self._add_contributions_to_results(result_type = self.name_LCIA_process_contributions,
+                                                   activity_key = activity_key,
+                                                   values = LCIA_process_contribution_matrix,
+                                                   flow_key_indices = self._get_activity_dict_as_array(database = database),
+                                                   method_indices = method_indices,
+                                                   cut_off = self.cut_off_percentage,
+                                                   top_k = self.top_k_contributions)
+                        
+                        
+        # Print summary statement(s)
+        if self.progress_bar:
+            
+            # Save current time
+            end_round_1: datetime.datetime = datetime.datetime.now()
+            
+            # Print statement
+            print("  - Calculation time: {}".format(self.convert_timedelta(end_round_1 - start_round_1)))
+            
+            if calculate_LCIA_scores:
+                print("      - {} LCIA score(s) from {} activity/ies & {} methods were calculated".format(len(self.activities)*len(self.methods), len(self.activities), len(self.methods)))
+        
+        # In case we want to calculate the scores of the exchanges from the unit scores of all activities, all exchanges are calculated at once
+        if calculate_LCIA_scores_of_exchanges and self.score_exchanges_with_unit_scores:
+            self._calculate_LCIA_scores_of_exchanges_from_unit_scores(skipped_activity_key_indices = np.array(cached_activity_key_indices, dtype = "int64"))
+        
+        # Otherwise, in case we want to calculate the scores of the exchanges, we need to go again through all exchanges and do the calculation
+        elif calculate_LCIA_scores_of_exchanges:
+            
+            # The scores of the exchanges of activities that were loaded from the result cache are already existing
+            rows: np.array = np.flatnonzero(~np.isin(self.results_raw[self.name_LCI_exchanges].get_columns()["activity"], cached_activity_key_indices))
+            
+            # Check if progress bar should be printed
+            if self.progress_bar:
+                
+                # Wrap progressbar around iterables
+                iterables: list[tuple] = hp.progressbar(self.results_raw[self.name_LCI_exchanges].to_tuples(rows = rows), prefix = "\nCalculate LCIA scores of exchanges ...")
+                
+            else:
+                # Otherwise, simply create iterable variable
+                iterables: list[tuple] = self.results_raw[self.name_LCI_exchanges].to_tuples(rows = rows)
+            
+            # To calculate the LCIA scores for exchanges, we need to preload the characterization factors
+            # This is a sacrification, BUT it will bring much more value if there are many exchanges to be calculated because we can omit the try, except statement (LCA calculation) if we already identify biosphere flows early
+            for met in self.methods:
+                self._load_characterization_factors(method = met)
+            
+            # Initialize a list to store the scores of the exchanges to. They are added to the results at once, at the end
+            immediate_scores: list[tuple] = []
+            
+            # Loop through all activities
+            for (act_key, act_amount, flow_key, flow_amount, _, _) in iterables:
+                                
+                # Initialize a list to potentially store all methods for which calculation was unsuccessful
+                methods_for_which_no_scores_were_calculated: list[tuple] = []
+                
+                # Go again through all methods
+                for met in self.methods:
+                                        
+                    # Check if the score has already been calculated
+                    if self._temporary_score_results.get(flow_key, {}).get(met) is not None:
+                        
+                        # Construct and add tuple to raw results
+                        immediate_scores += [(act_key,
+                                              act_amount,
+                                              flow_key,
+                                              flow_amount,
+                                              flow_amount * self._temporary_score_results[flow_key][met],
+                                              met
+                                              )]
+                        # Go to next
+                        continue
+                    
+                    # Retrieve characterization factor, if possible 
+                    cf: (float | None) = self.characterization_factors[met].get(flow_key)                    
+                    
+                    # If successful, the current flow is of type biosphere and we can simply multiply the cf with the flow amount and go on
+                    if cf is not None:
+                        
+                        # Construct and add tuple to raw results
+                        immediate_scores += [(act_key,
+                                              act_amount,
+                                              flow_key,
+                                              flow_amount,
+                                              flow_amount * cf,
+                                              met
+                                              )]
+                        # Go to next
+                        continue
+                    
+                    # Add to list
+                    methods_for_which_no_scores_were_calculated += [met]
+
+                
+                # If everything has already been successfully calculated, go to next activity
+                if methods_for_which_no_scores_were_calculated == []:
+                    continue
+                
+                # If we arrive here, we need to run through the matrix calculation
+                # First get the database (system) the activity belongs to
+                database: str = self._get_system_of_database(database = act_key[0])
+
+                # Get the BW object,
+                try:
+                    # We try to construct the LCA object
+                    lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+                    
+                    # and to solve the linear system (which takes quite some time). We only need the supply array, not the inventory matrix
+                    lca_object.build_demand_array({flow_key: flow_amount})
+                    lca_object.supply_array: np.array = self._solve_demand_array(database = database)
+                
+                except OutsideTechnosphere:
+                    # If we fail to redo the lca because the key is outside of the technosphere, that means that the current flow belongs to a biopshere database
+                    # Since we already tried to do a simple cf calculation (see above), it means that the current flow is not characterized in the specific methods
+                    # We can simply add a 0 now
+                    immediate_scores += [(act_key,
+                                          act_amount,
+                                          flow_key,
+                                          flow_amount,
+                                          float(0),
+                                          m
+                                          ) for m in methods_for_which_no_scores_were_calculated]
+                    # We go on
+                    continue
+                
+                
+                # Calculate the scores of all methods at once with the stacked characterization matrix
+                scores: np.array = (self._get_stacked_characterization_matrix(database = database) * (lca_object.biosphere_matrix * lca_object.supply_array))[self._get_method_indices_of_stacked_characterization_matrix(database = database)]
+                
+                # Loop through each method for which the score was not yet calculated
+                for met in methods_for_which_no_scores_were_calculated:
+                    
+                    # Retrieve the score of the method
+                    score: float = float(scores[self.methods.index(met)])
+                
+                    # Construct and add tuple to raw results
+                    immediate_scores += [(act_key,
+                                          act_amount,
+                                          flow_key,
+                                          flow_amount,
+                                          score,
+                                          met
+                                          )]
+            
+            # Add the scores of the exchanges to the result dictionary
+            self.results_raw[self.name_LCIA_immediate_scores].add_tuples(immediate_scores)
+        
+        # Save the results of all activities that were calculated to the result cache, if specified
+        if self.result_cache_path is not None:
+            
+            # Activities whose results were loaded from the result cache do not need to be saved again
+            skipped_activity_key_indices: set[int] = set(cached_activity_key_indices)
+            
+            # Save
+            self._save_results_to_cache(activity_keys = [m.key for m in self.activities if self._get_key_index(key = m.key) not in skipped_activity_key_indices],
+                                        result_types = result_types)
+
+            
+    
+    def calculate_LCIA_scores_of_all_activities(self, database: str) -> np.array:
+
+        """ Calculates the LCIA scores of all activities of a database for all methods in one pass.
+        Instead of solving the linear system once per activity, the transposed (adjoint) system is solved once per method.
+        The scores refer to the functional amount that was specified when initializing the class.
+        
+        
+        Parameters
+        ----------
+        database : str
+            Name of the database for which all activities should be calculated. If 'use_unified_system' is True, all activities of the combined system are calculated.
+        
+        Returns
+        -------
+        np.array
+            A dense array of shape (activities x methods). Rows are ordered as the activity dictionary of the respective Brightway LCA object ('lca_objects[database].activity_dict'), columns as the methods of the class.
+        
+        """
+        
+        # Check function input type
+        hp.check_function_input_type(self.calculate_LCIA_scores_of_all_activities, locals())
+        
+        # The unit scores are calculated for a demand of 1 and therefore need to be scaled with the functional amount
+        return self._get_unit_scores(database = self._get_system_of_database(database = database)) * self.functional_amount
     
     
-    def _get_structured_array_for_LCIA_process_contribution(self, database: str, method: tuple) -> np.array:
+    def calculate_direct_LCIA_scores_of_all_activities(self, database: str) -> sparse.csr_matrix:
+        
+        """ Calculates the direct (gate-to-gate) LCIA scores of all activities of a database for all methods, i.e. only the impact of the own biosphere flows of each activity, without its supply chain.
+        The scores are calculated with one sparse product of the stacked characterization matrix and the biosphere matrix. No linear system is solved.
+        The scores refer to the functional amount that was specified when initializing the class.
+        
+        
+        Parameters
+        ----------
+        database : str
+            Name of the database for which all activities should be calculated. If 'use_unified_system' is True, all activities of the combined system are calculated.
+        
+        Returns
+        -------
+        sparse.csr_matrix
+            A sparse matrix of shape (methods x activities). Rows are ordered as the methods of the class, columns as the activity dictionary of the respective Brightway LCA object ('lca_objects[database].activity_dict').
+        
+        """
         
-        # If already existing, simply return
-        if self.structured_arrays_for_process_contribution.get(database, {}).get(method) is not None:
-            return self.structured_arrays_for_process_contribution[database][method]
+        # Check function input type
+        hp.check_function_input_type(self.calculate_direct_LCIA_scores_of_all_activities, locals())
+        
+        # Retrieve the system the database is calculated in
+        system: str = self._get_system_of_database(database = database)
         
-        # Retrieve or build the initial structured process array
-        structured_LCI_process_array: np.array = self._get_structured_array_for_LCI_process_contribution(database = database).copy() # !!! We need this copy right now, but it slows calculation down. Alternative?
+        # The characterized biosphere matrix contains the direct scores of one unit of each activity, for each unique method
+        # Unique methods are expanded again to all methods and the scores are scaled with the functional amount
+        return (self._get_characterized_biosphere_matrix(database = system)[self._get_method_indices_of_stacked_characterization_matrix(database = system)] * self.functional_amount).tocsr()
     
-        # Overwrite the method array (None's) with the method
-        structured_LCI_process_array["method"]: np.array = self._get_element_array(element = str(method), length = len(structured_LCI_process_array["value"]), dtype = "U")
     
-        # Add temporarily
-        self.structured_arrays_for_process_contribution[database][method]: np.array = structured_LCI_process_array
+    def _get_changes_of_edits(self, database: str, edits: list[tuple]) -> tuple[sparse.csc_matrix, sparse.csr_matrix]:
         
-        # Return
-        return self.structured_arrays_for_process_contribution[database][method]
+        # Retrieve the lca object
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        
+        # Initialize dictionaries for the changes of the technosphere and biosphere matrix. If the same exchange is edited more than once, the last edit is used
+        technosphere_changes: dict[tuple[int, int], float] = {}
+        biosphere_changes: dict[tuple[int, int], float] = {}
+        
+        # Loop through each edit
+        for row_key, column_key, new_amount in edits:
+            
+            # Retrieve the column of the activity. Edits of activities that are not part of the system do not change its matrices
+            column: (int | None) = lca_object.activity_dict.get(column_key)
+            
+            # Go to next edit, if not part of the system
+            if column is None:
+                continue
+            
+            # Edit of a technosphere exchange
+            if lca_object.product_dict.get(row_key) is not None:
+                
+                # Retrieve the row of the product
+                row: int = lca_object.product_dict[row_key]
+                
+                # Inputs are negative in the technosphere matrix, the production of the own product is positive
+                value: float = new_amount if row_key == column_key else -new_amount
+                
+                # The change is the difference to the current value of the matrix
+                technosphere_changes[(row, column)]: float = value - lca_object.technosphere_matrix[row, column]
+            
+            # Edit of a biosphere exchange
+            elif lca_object.biosphere_dict.get(row_key) is not None:
+                
+                # Retrieve the row of the flow
+                row: int = lca_object.biosphere_dict[row_key]
+                
+                # The change is the difference to the current value of the matrix
+                biosphere_changes[(row, column)]: float = new_amount - lca_object.biosphere_matrix[row, column]
+            
+            else:
+                # Raise error if the flow is neither a product nor a biosphere flow of the system
+                raise ValueError("Input variable 'edits' contains the flow '" + str(row_key) + "', which is not part of the system of activity '" + str(column_key) + "'.")
+        
+        # Build sparse matrices from the changes. Changes of 0 (same amount as before) are removed
+        changes: list[sparse.spmatrix] = []
+        
+        # Loop through the changes and the shape of the respective matrix
+        for matrix_changes, shape in ((technosphere_changes, lca_object.technosphere_matrix.shape), (biosphere_changes, lca_object.biosphere_matrix.shape)):
+            
+            # Build the matrix
+            matrix: sparse.csc_matrix = sparse.csc_matrix((list(matrix_changes.values()), ([m for m, _ in matrix_changes], [m for _, m in matrix_changes])), shape = shape)
+            matrix.eliminate_zeros()
+            
+            # Add
+            changes += [matrix]
+        
+        # Return the change of the technosphere matrix (as csc) and of the biosphere matrix (as csr)
+        return changes[0], changes[1].tocsr()
     
     
+    def _get_unit_scores_with_edits(self, database: str, edits: list[tuple], max_rank_of_update: int) -> np.array:
+        
+        # Retrieve the lca object and the changes of its matrices
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        technosphere_change, biosphere_change = self._get_changes_of_edits(database = database, edits = edits)
+        
+        # The right hand side of the transposed system with the edited biosphere, one column per (unique) method: (C * B)^T
+        right_hand_side: np.array = (self._get_stacked_characterization_matrix(database = database) * (lca_object.biosphere_matrix + biosphere_change)).transpose().toarray()
+        
+        # Activities (columns) of the technosphere that are edited. The change of the technosphere matrix can be written as U * V^T,
+        # where U contains the changed columns and V the respective unit vectors. The number of edited columns is therefore the rank of the update
+        columns: np.array = np.flatnonzero(np.diff(technosphere_change.indptr))
+        
+        # Without changes of the technosphere, only the right hand side changes and the cached factorization is used as it is
+        if len(columns) == 0:
+            product_scores: np.array = self._solve_technosphere(database = database, right_hand_side = right_hand_side, transposed = True)
+        
+        # If the rank of the update is too high, the low rank update is more expensive than a new factorization of the edited technosphere
+        elif len(columns) > max_rank_of_update:
+            product_scores: np.array = sparse_linalg.splu((lca_object.technosphere_matrix + technosphere_change).tocsc()).solve(right_hand_side, trans = "T")
+        
+        else:
+            # Changed columns of the technosphere (products x rank)
+            update: np.array = technosphere_change[:, columns].toarray()
+            
+            # Unit vectors of the changed columns (activities x rank)
+            unit_vectors: np.array = np.zeros((technosphere_change.shape[1], len(columns)), dtype = "float64")
+            unit_vectors[columns, np.arange(len(columns))] = 1
+            
+            # Solve the unchanged transposed system for the right hand side and the unit vectors at once, with the cached factorization
+            solutions: np.array = self._solve_technosphere(database = database, right_hand_side = np.hstack([right_hand_side, unit_vectors]), transposed = True)
+            unchanged_scores: np.array = solutions[:, :right_hand_side.shape[1]]
+            solved_unit_vectors: np.array = solutions[:, right_hand_side.shape[1]:]
+            
+            # Sherman-Morrison-Woodbury: (A^T + V * U^T)^-1 = A^-T - A^-T * V * (I + U^T * A^-T * V)^-1 * U^T * A^-T
+            # The small capacitance matrix (rank x rank) is solved densely
+            capacitance: np.array = np.eye(len(columns)) + update.transpose() @ solved_unit_vectors
+            product_scores: np.array = unchanged_scores - solved_unit_vectors @ np.linalg.solve(capacitance, update.transpose() @ unchanged_scores)
+        
+        # Return the scores of one unit of each product for all methods (products x methods)
+        return product_scores[:, self._get_method_indices_of_stacked_characterization_matrix(database = database)]
+    
     
-    # Function to retrieve the exchanges of an activity
-    def _get_exchanges(self,
-                      activity_key: tuple[str, str],
-                      activity_amount: float,
-                      level: (int | float)) -> tuple[tuple[tuple[str, str], float, (float | int)]]:
+    def calculate_LCIA_scores_with_edits(self, edits: list, max_rank_of_update: int = 25) -> np.array:
+        
+        """ Calculates the LCIA scores of all activities for all methods, as if some exchanges of the databases were edited ('what-if' analysis).
+        The databases themselves are not modified. Instead, the edits are applied to the cached matrices and the scores are updated with a low rank (Sherman-Morrison-Woodbury) update of the cached factorization.
+        The scores refer to the functional amount that was specified when initializing the class. The results are added as 'LCIA_scores_what_if' to the results of the class (see 'get_results' and 'write_results').
+        
+        
+        Parameters
+        ----------
+        edits : list
+            A list of edits, each as tuple of (flow key, activity key, new amount). The flow is either a product (technosphere exchange) or a biosphere flow.
+            The amount is given as in Brightway, i.e. positive for inputs. If the flow key is the same as the activity key, the amount of the production exchange is edited.
+            Exchanges that are not yet existing are added. Edits of activities that are not part of a system do not change that system.
+        
+        max_rank_of_update : int, optional
+            Maximum number of edited activities (columns of the technosphere) for which the factorization is updated. With more edited activities, the edited technosphere is factorized again.
+            The default is 25.
+        
+        Returns
+        -------
+        np.array
+            A dense array of shape (activities x methods). Rows are ordered as the activities of the class, columns as the methods of the class.
+        
+        """
+        
+        # Check function input type
+        hp.check_function_input_type(self.calculate_LCIA_scores_with_edits, locals())
         
-        # Try to retrieve first from temporary dictionary and if successful directly return
-        if self._temporary_key_to_exchanges_mapping.get(activity_key) is not None:
+        # Raise error if the edits are not all of length 3
+        if not all([isinstance(m, (tuple, list)) and len(m) == 3 for m in edits]):
+            raise ValueError("Input variable 'edits' needs to be a list of tuples of (flow key, activity key, new amount).")
+        
+        # Raise error if the maximum rank is smaller than 0
+        if max_rank_of_update < 0:
+            raise ValueError("Input variable 'max_rank_of_update' needs to be greater than or equal to 0 but is currently '" + str(max_rank_of_update) + "'.")
+        
+        # Activity objects can be given instead of keys
+        edits: list[tuple] = [(getattr(flow, "key", flow), getattr(activity, "key", activity), amount) for flow, activity, amount in edits]
+        
+        # Group the positions of the activities by the system they are calculated in
+        positions_by_database: dict[str, list[int]] = {}
+        
+        # Loop through each activity and add its position to the respective system
+        for idx, act in enumerate(self.activities):
+            positions_by_database.setdefault(self._get_system_of_database(database = act.key[0]), []).append(idx)
+        
+        # Raise error if an edited activity is not part of any system that is calculated
+        check_edits: list[str] = [str(m[1]) for m in edits if not any([m[1] in self._get_LCA_object(database = database).activity_dict for database in positions_by_database])]
+        
+        # Check and raise error
+        if check_edits != []:
+            raise ValueError("The following edited activities are not part of the calculated systems:\n - " + "\n - ".join(check_edits))
+        
+        # Initialize the array of the scores (activities x methods)
+        scores: np.array = np.zeros((len(self.activities), len(self.methods)), dtype = "float64")
+        
+        # Loop through each system
+        for database, positions in positions_by_database.items():
+            
+            # Retrieve the lca object
+            lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+            
+            # Retrieve the product rows of the activities. Raise an error if an activity is not part of the system
+            try:
+                product_indices: np.array = np.array([lca_object.product_dict[self.activities[m].key] for m in positions], dtype = "int64")
+            except KeyError as error:
+                raise OutsideTechnosphere(error.args[0])
             
-            # Directly return
-            return tuple([(m[0], m[1] * activity_amount, level) for m in self._temporary_key_to_exchanges_mapping[activity_key]])
+            # The scores of one unit are scaled with the functional amount
+            scores[positions, :] = self._get_unit_scores_with_edits(database = database, edits = edits, max_rank_of_update = max_rank_of_update)[product_indices, :] * self.functional_amount
+        
+        # Initialize the results, if nothing has been calculated yet
+        if not hasattr(self, "results_raw"):
+            self.results_raw: dict[str, LCA_Result_Store] = self._initialize_results_raw()
+        
+        # Results of previous edits are replaced
+        self.results_raw[self.name_LCIA_scores_what_if]: LCA_Result_Store = LCA_Result_Store(lookup_tables = self.lookup_tables)
+        
+        # Add one row per activity and method, in the same form as the LCIA scores
+        self.results_raw[self.name_LCIA_scores_what_if].add_arrays(activity = np.repeat(np.array([self._get_key_index(key = m.key) for m in self.activities], dtype = "int64"), len(self.methods)),
+                                                                   activity_amount = self.functional_amount,
+                                                                   flow = -1,
+                                                                   flow_amount = np.nan,
+                                                                   value = scores.reshape(-1),
+                                                                   method = np.tile(np.array([self._get_method_index(method = m) for m in self.methods], dtype = "int64"), len(self.activities)))
         
-        # Retrieve activity
-        act: bw2data.backends.peewee.proxies.Activity = self._get_database_object(database = activity_key[0]).get(activity_key[1])
+        # Return the scores
+        return scores
+    
+    
+    def _get_uncertainty_parameters(self, database: str) -> dict[str, np.array]:
+        
+        # Simply return, if already existing
+        if self.uncertainty_parameters.get(database) is not None:
+            return self.uncertainty_parameters[database]
+        
+        # Retrieve the lca object, which defines the rows and columns of the matrices
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        
+        # The parameter arrays only exist if the lca object was built with Brightway in this process
+        # If it was attached from shared memory or loaded from disk, we load the data of the system once more with Brightway
+        if hasattr(lca_object, "tech_params") and hasattr(lca_object, "bio_params"):
+            brightway_object: bw2calc.lca.LCA = lca_object
+        
+        else:
+            # Build a Brightway LCA object the same way as the lca object of the system
+            _acts: list[bw2data.backends.peewee.proxies.Activity] = [self._get_database_object(database = m).random() for m in self._get_databases_of_system(system = database)]
+            brightway_object: bw2calc.lca.LCA = bw2calc.LCA({m.key: self.functional_amount for m in _acts}, method = self.methods[0])
+            brightway_object.load_lci_data()
         
-        # Retrieve list of exchanges
-        exchanges: bw2data.backends.pewee.proxies.Exchanges = act.exchanges()
+        # Initialize the dictionary of the parameters
+        uncertainty_parameters: dict[str, np.array] = {}
         
-        # Check the length of the exchanges list
-        if len(exchanges) == 0:
+        # Loop through the technosphere and biosphere parameters and the dictionaries of their rows
+        for name, params, row_dict, own_row_dict in (("technosphere", brightway_object.tech_params, brightway_object.product_dict, lca_object.product_dict),
+                                                     ("biosphere", brightway_object.bio_params, brightway_object.biosphere_dict, lca_object.biosphere_dict)):
+            
+            # Copy the parameters, so that the arrays of Brightway are not modified
+            params: np.array = params.copy()
+            
+            # Map the rows and columns to the ones of the lca object. If the lca object was built with Brightway, the mapping does not change anything
+            row_mapping: np.array = np.zeros(len(row_dict), dtype = "int64")
+            column_mapping: np.array = np.zeros(len(brightway_object.activity_dict), dtype = "int64")
+            
+            # Loop through each key and write the respective index of the lca object
+            for key, index in row_dict.items():
+                row_mapping[index]: int = own_row_dict[key]
             
-            # If it is 0, the current activity is of type biosphere. We return an empty list
-            return ()
+            for key, index in brightway_object.activity_dict.items():
+                column_mapping[index]: int = lca_object.activity_dict[key]
+            
+            # Apply the mapping
+            params["row"] = row_mapping[params["row"]]
+            params["col"] = column_mapping[params["col"]]
+            
+            # Add
+            uncertainty_parameters[name]: np.array = params
+        
+        # Temporarily store
+        self.uncertainty_parameters[database]: dict[str, np.array] = uncertainty_parameters
         
-        # Get the production amount from the list of exchanges
-        production_amount: list[float] = [m["amount"] for m in exchanges if m["type"] == "production"]
+        # Return the dictionary
+        return uncertainty_parameters
+    
+    
+    def _sample_uncertainty_parameters(self, params: np.ndarray, iterations: int, seed: int) -> np.array:
         
-        # Raise error if no or more than one production exchange was found.
-        if len(production_amount) != 1:
-            raise ValueError("The list of exchanges for activity '{}' contains {} production exchange(s).".format(activity_key, len(production_amount)))
+        # Without parameters, there is nothing to sample
+        if len(params) == 0:
+            return np.zeros((0, iterations), dtype = "float64")
         
-        # Calibrate exchange values to 1 activity amount
-        exchanges_for_1_activity_amount: list[tuple] = [(m["input"], (1 / production_amount[0] * m["amount"]) if production_amount != 0 else 0) for m in exchanges if m["type"] != "production"]
+        # Draw all iterations of all parameters at once (parameters x iterations)
+        # The random number generator returns a one dimensional array in case of one iteration, therefore we reshape
+        samples: np.array = stats_arrays.MCRandomNumberGenerator(params, seed = seed).generate(samples = iterations).reshape(len(params), -1)
         
-        # Add temporarily
-        self._temporary_key_to_exchanges_mapping[activity_key]: list[tuple] = exchanges_for_1_activity_amount
+        # Parameters without uncertainty (undefined or none) keep their deterministic amount
+        deterministic: np.array = np.isin(params["uncertainty_type"], (stats_arrays.UndefinedUncertainty.id, stats_arrays.NoUncertainty.id))
+        samples[deterministic, :] = params["amount"][deterministic, None]
         
         # Return
-        return tuple([(m[0], m[1] * activity_amount, level) for m in self._temporary_key_to_exchanges_mapping[activity_key]])
-        
+        return samples
+    
     
+    def _get_unit_scores_of_sample(self, database: str, technosphere_amounts: np.ndarray, biosphere_amounts: np.ndarray) -> np.array:
+        
+        # Retrieve the lca object and the parameters, which give the positions of the sampled amounts in the matrices
+        lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+        uncertainty_parameters: dict[str, np.array] = self._get_uncertainty_parameters(database = database)
+        technosphere_params: np.array = uncertainty_parameters["technosphere"]
+        biosphere_params: np.array = uncertainty_parameters["biosphere"]
+        
+        # Technosphere inputs are negative in the technosphere matrix, the same way as Brightway builds the matrix
+        technosphere_amounts: np.array = np.where(technosphere_params["type"] == 1, -technosphere_amounts, technosphere_amounts)
+        
+        # Build the technosphere and biosphere matrix of the sample. Duplicate entries are summed up
+        technosphere_matrix: sparse.csc_matrix = sparse.csc_matrix((technosphere_amounts, (technosphere_params["row"], technosphere_params["col"])), shape = lca_object.technosphere_matrix.shape)
+        biosphere_matrix: sparse.csr_matrix = sparse.csr_matrix((biosphere_amounts, (biosphere_params["row"], biosphere_params["col"])), shape = lca_object.biosphere_matrix.shape)
+        
+        # The right hand side of the transposed system, one column per (unique) method: (C * B)^T
+        right_hand_side: np.array = (self._get_stacked_characterization_matrix(database = database) * biosphere_matrix).transpose().toarray()
+        
+        # Solve the transposed system once for all methods, with the specified solver. The technosphere changes with every sample, therefore the factorization (or decomposition) can not be reused
+        # The iterative solvers reuse the preconditioner of the database, so that no complete factorization is needed
+        product_scores: np.array = self._solve_technosphere(database = database, right_hand_side = right_hand_side, transposed = True, technosphere_matrix = technosphere_matrix)
+        
+        # Return the scores of one unit of each product for all methods (products x methods)
+        return product_scores[:, self._get_method_indices_of_stacked_characterization_matrix(database = database)]
     
     
-    # Support function to extract exchanges of an activity based on a specific level
-    def _extract_LCI_exchanges_of_activity_at_certain_level(self,
-                                                            activity_key: bw2data.backends.peewee.proxies.Activity,
-                                                            level: int) -> list[dict]:
+    def _calculate_monte_carlo_batch(self, iterations: int, seed_sequence: np.random.SeedSequence, sample_size: int) -> LCA_Monte_Carlo_Statistics:
         
-        # Define the starting level
-        current_level: int = 0
-
-        # Initialize a new key to write exchange keys to that should be calculated in the next round
-        exchanges_at_level: dict = {current_level: ((activity_key, self.functional_amount, 0),)}
+        # Initialize the array of the samples (iterations x activities x methods)
+        samples: np.array = np.zeros((iterations, len(self.activities), len(self.methods)), dtype = "float64")
         
-        # Extract exchanges as long/as many times as there are levels
-        while current_level < level:
-
-            # Extract all the relevant keys at the current level
-            current_exchanges: tuple[tuple, float] = exchanges_at_level[current_level]
-            
-            # Initialize a new list for the current level
-            exchanges_at_level[current_level + 1]: tuple = ()
-            
-            # Loop through each current exchange key and amount
-            for current_key, current_amount, respective_level in current_exchanges:
-                
-                # Check if the level of the current exchange matches the current level where we are, otherwise we don't need to go on and can simply move the exchange to the next round
-                if respective_level < current_level:
-                    
-                    # Simply move the exchange to the next round without searching
-                    exchanges_at_level[current_level + 1] += ((current_key, current_amount, respective_level),)
-                
-                else:
-                    # Extract all exchanges that come next for the current exchange
-                    next_exchanges: tuple[tuple] = self._get_exchanges(activity_key = current_key,
-                                                                       activity_amount = current_amount,
-                                                                       level = current_level + 1)
-                    
-                    # If no next exchanges have been found, add the current exchange
-                    if len(next_exchanges) == 0:
-                        
-                        # Add current exchange
-                        exchanges_at_level[current_level + 1] += ((current_key, current_amount, respective_level),)
-                    else:
-                        # Otherwise, add the new exchanges
-                        exchanges_at_level[current_level + 1] += next_exchanges
-                
-            # Check if we arrived at the end
-            if current_level >= level:
-                break
-                
-            else:
-                # Raise iterator
-                current_level += 1
+        # Group the positions of the activities by the system they are calculated in
+        positions_by_database: dict[str, list[int]] = {}
         
-        # Initialize a new list to store final exchanges to
-        exchanges_at_level_cleaned: dict = {}
+        # Loop through each activity and add its position to the respective system
+        for idx, act in enumerate(self.activities):
+            positions_by_database.setdefault(self._get_system_of_database(database = act.key[0]), []).append(idx)
         
-        # Loop through each exchange
-        for flow_key, flow_amount, level in exchanges_at_level[max(list(exchanges_at_level.keys()))]:
+        # Each system draws its technosphere and biosphere amounts from its own random number stream
+        # The streams only depend on the seed sequence of the batch, but not on the process that calculates the batch
+        seeds: np.array = seed_sequence.generate_state(2 * len(positions_by_database))
+        
+        # Loop through each system
+        for idx, (database, positions) in enumerate(positions_by_database.items()):
             
-            # Compile the ID tuple
-            ID: tuple = (
-                activity_key,
-                self.functional_amount,
-                flow_key
-                )
+            # Retrieve the lca object and the parameters of the system
+            lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
+            uncertainty_parameters: dict[str, np.array] = self._get_uncertainty_parameters(database = database)
             
-            # Initialize new key
-            if exchanges_at_level_cleaned.get(ID) is None:
-                exchanges_at_level_cleaned[ID]: float = float(0)
+            # Retrieve the product rows of the activities. Raise an error if an activity is not part of the system
+            try:
+                product_indices: np.array = np.array([lca_object.product_dict[self.activities[m].key] for m in positions], dtype = "int64")
+            except KeyError as error:
+                raise OutsideTechnosphere(error.args[0])
             
-            # Add the amount
-            exchanges_at_level_cleaned[ID] += flow_amount
+            # Sample the amounts of all iterations of the batch at once (parameters x iterations)
+            technosphere_amounts: np.array = self._sample_uncertainty_parameters(params = uncertainty_parameters["technosphere"], iterations = iterations, seed = int(seeds[2 * idx]))
+            biosphere_amounts: np.array = self._sample_uncertainty_parameters(params = uncertainty_parameters["biosphere"], iterations = iterations, seed = int(seeds[2 * idx + 1]))
             
+            # Loop through each iteration and calculate the scores of the activities for all methods
+            for iteration in range(iterations):
+                
+                # The scores of one unit are scaled with the functional amount
+                unit_scores: np.array = self._get_unit_scores_of_sample(database = database,
+                                                                        technosphere_amounts = technosphere_amounts[:, iteration],
+                                                                        biosphere_amounts = biosphere_amounts[:, iteration])
+                samples[iteration, positions, :] = unit_scores[product_indices, :] * self.functional_amount
+        
+        # Accumulate the statistics of the batch. Samples that are kept for the percentiles are selected with a stream of the batch as well
+        statistics: LCA_Monte_Carlo_Statistics = LCA_Monte_Carlo_Statistics(shape = samples.shape[1:], sample_size = sample_size, seed = seed_sequence.spawn(1)[0])
+        statistics.add(samples = samples)
+        
         # Return
-        return [k + (v, None, None) for k, v in exchanges_at_level_cleaned.items()]
+        return statistics
     
     
+    def calculate_monte_carlo(self,
+                              iterations: int = 1000,
+                              seed: (int | None) = None,
+                              iterations_per_batch: int = 100,
+                              percentiles: tuple = (2.5, 97.5),
+                              sample_size: int = 250) -> None:
+        
+        """ Calculates the uncertainty of the LCIA scores of all activities and methods with a Monte Carlo simulation.
+        In each iteration, the amounts of the technosphere and biosphere exchanges are drawn from their uncertainty distributions (as specified in Brightway).
+        The technosphere of each iteration is solved with the solver of the class ('solver'). The iterative solvers reuse the preconditioner of the database for all iterations.
+        Iterations are calculated in batches, where all amounts of a batch are drawn at once. With more than one worker, batches are calculated in a process pool.
+        The statistics are accumulated online, so that memory does not grow with the number of iterations. It is bounded by the iterations of a batch and the iterations that are kept for the percentiles,
+        i.e. ('iterations_per_batch' + 'sample_size') x activities x methods x 8 bytes per process (e.g., (100 + 250) x 20000 x 12 x 8 bytes = 670 MB).
+        The results are added to the results of the class (see 'get_results' and 'write_results'), one result type per statistic: 'LCIA_scores_MC_mean', 'LCIA_scores_MC_sd' and e.g. 'LCIA_scores_MC_p2.5'.
         
-    def calculate(self,
-                  calculate_LCIA_scores: bool = True,
-                  extract_LCI_exchanges: bool = False,
-                  extract_LCI_emission_contribution: bool = False,
-                  extract_LCI_process_contribution: bool = False,
-                  calculate_LCIA_scores_of_exchanges: bool = False,
-                  calculate_LCIA_emission_contribution: bool = False,
-                  calculate_LCIA_process_contribution: bool = False):
         
-        # Add an instance where results will be saved to
-        self.results_raw: dict = {self.name_LCIA_scores: [],
-                                  self.name_LCI_exchanges: [],
-                                  self.name_LCI_emission_contributions: [],
-                                  self.name_LCI_process_contributions: [],
-                                  self.name_LCIA_immediate_scores: [],
-                                  self.name_LCIA_emission_contributions: [],
-                                  self.name_LCIA_process_contributions: []
-                                  }
+        Parameters
+        ----------
+        iterations : int, optional
+            Number of Monte Carlo iterations. The default is 1000.
         
-        # Save time when calculation starts
-        if self.progress_bar:
-            start_round_1: datetime.datetime = datetime.datetime.now()
+        seed : (int | None), optional
+            Seed of the random number generators. Each batch draws from its own stream, which is derived from the seed.
+            With the same seed, results are therefore the same, independent of the number of workers. The default is None (random seed).
         
-        # Retrieve the combinations that should be calculated
-        activities: list = self.activities
+        iterations_per_batch : int, optional
+            Number of iterations whose amounts are drawn and calculated at once. The higher the value, the more memory is needed. The default is 100.
         
-        # Check if progress bar should be printed to console
+        percentiles : tuple, optional
+            Percentiles (between 0 and 100) of the LCIA scores which should be calculated. The default is (2.5, 97.5).
+        
+        sample_size : int, optional
+            Maximum number of iterations that are kept to calculate the percentiles. With more iterations, the percentiles are calculated from a uniform random selection of them.
+            The higher the value, the more accurate the percentiles (especially in the tails), but the more memory is needed. The default is 250.
+        
+        Returns
+        -------
+        None
+        
+        """
+        
+        # Check function input type
+        hp.check_function_input_type(self.calculate_monte_carlo, locals())
+        
+        # Raise error if the number of iterations is smaller than 1
+        if iterations < 1:
+            raise ValueError("Input variable 'iterations' needs to be greater than 0 but is currently '" + str(iterations) + "'.")
+        
+        # Raise error if the number of iterations per batch is smaller than 1
+        if iterations_per_batch < 1:
+            raise ValueError("Input variable 'iterations_per_batch' needs to be greater than 0 but is currently '" + str(iterations_per_batch) + "'.")
+        
+        # Raise error if a percentile is not between 0 and 100
+        if any([m < 0 or m > 100 for m in percentiles]):
+            raise ValueError("Input variable 'percentiles' needs to contain values between 0 and 100 but is currently '" + str(percentiles) + "'.")
+        
+        # Raise error if the sample size is smaller than 1
+        if sample_size < 1:
+            raise ValueError("Input variable 'sample_size' needs to be greater than 0 but is currently '" + str(sample_size) + "'.")
+        
+        # Save time when calculation starts
         if self.progress_bar:
-            
-            # Wrap progress bar around iterator
-            activities: list = hp.progressbar(activities, prefix = "\nCalculate ...")
+            start_round_1: datetime.datetime = datetime.datetime.now()
         
-        # Loop through all activities
-        for act in activities:
-            
-            # Extract the activity key
-            activity_key: tuple[str, str] = act.key
-            
-            # First get the database the activity belongs to
-            database: str = activity_key[0]
-
-            # This block is needed for any calculation
-            # We at least need
-            # ... to get 1) the BW object,
-            lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
-
-            # ... to redo 2) the inventory matrix (which takes quite some time)
-            lca_object.redo_lci({act: self.functional_amount})
+        # Derive one seed sequence per batch from the seed, plus one to merge the statistics of the batches
+        seed_sequence: np.random.SeedSequence = np.random.SeedSequence(seed)
+        batch_iterations: list[int] = [min(iterations_per_batch, iterations - m) for m in range(0, iterations, iterations_per_batch)]
+        batch_seed_sequences: list[np.random.SeedSequence] = seed_sequence.spawn(len(batch_iterations) + 1)
+        
+        # Initialize the statistics of all iterations
+        statistics: LCA_Monte_Carlo_Statistics = LCA_Monte_Carlo_Statistics(shape = (len(self.activities), len(self.methods)), sample_size = sample_size, seed = batch_seed_sequences[-1])
+        
+        # Calculate the batches in the current process
+        if self.number_of_workers == 1:
             
-            # We then extract the inventory matrix
-            inventory: np.matrix = lca_object.inventory
+            # Initialize iterator
+            batches = zip(batch_iterations, batch_seed_sequences[:-1])
             
-            # Extract LCI exchanges, if specified
-            # We also need to extract the exchanges if we calculate the immediate scores
-            if any((extract_LCI_exchanges, calculate_LCIA_scores_of_exchanges)):
-                
-                # Extract the LCI exchanges
-                LCI_exchanges_at_level: list[tuple] = self._extract_LCI_exchanges_of_activity_at_certain_level(activity_key = activity_key, level = self.exchange_level)
+            # Check if progress bar should be printed to console
+            if self.progress_bar:
                 
-                # Add
-                if extract_LCI_exchanges:
-                    self.results_raw[self.name_LCI_exchanges] += LCI_exchanges_at_level
+                # Wrap progress bar around iterator
+                batches = hp.progressbar(list(batches), prefix = "\nCalculate Monte Carlo ...")
             
-            
-            # If we need to do any LCIA calculation, we need to do the following block
-            # This however will only be done for LCIA score calculation, LCIA emission contribution and LCIA process contribution
-            if any([calculate_LCIA_scores, calculate_LCIA_emission_contribution, calculate_LCIA_process_contribution]):
-                
-                # Initialize a temporary dictionary to store the characterized matrices to
-                characterized_matrices: dict = {}
+            # Loop through each batch and merge its statistics
+            for batch_iteration, batch_seed_sequence in batches:
+                statistics.merge(other = self._calculate_monte_carlo_batch(iterations = batch_iteration, seed_sequence = batch_seed_sequence, sample_size = sample_size))
+        
+        else:
+            # Each worker builds its own lca objects, since the parameter arrays are needed as well, which are not shared
+            with concurrent.futures.ProcessPoolExecutor(max_workers = self.number_of_workers,
+                                                        initializer = _initialize_worker,
+                                                        initargs = (self._get_project_settings(), self._get_calculation_settings(), {}, self.unified_system_databases)) as executor:
                 
-                # Loop through each method and create the characterized matrices by multiplying the inventory matrix with the 
-                for met in self.methods:
-                    
-                    # Build or simply get the matrix
-                    matrix = self._get_characterization_matrix(database = database, method = met)
-                    
-                    # Multiply the matrices
-                    characterized_matrices[met] = (matrix * inventory)
-            
-            # If LCIA scores are calculated, go on
-            if calculate_LCIA_scores:
+                # Submit all batches to the pool
+                futures: list[concurrent.futures.Future] = [executor.submit(_calculate_monte_carlo_batch_in_worker, tuple([m.key for m in self.activities]), batch_iteration, batch_seed_sequence, sample_size)
+                                                            for batch_iteration, batch_seed_sequence in zip(batch_iterations, batch_seed_sequences[:-1])]
                 
-                # Loop through each characterized matrix and method to get the sum/LCIA score
-                for met, characterized_matrix in characterized_matrices.items():
-                    
-                    # The score is simply the sum of the matrix
-                    score: float = characterized_matrix.sum()
-                    
-                    # The ID tuple is always of length 5!
-                    ID: tuple = (
-                        act.key, # Key of the current activity
-                        self.functional_amount, # The amount that was calculated
-                        None, # Flow key, not used here
-                        None, # Flow amount, not used here
-                        score, # The calculated impact assessment result
-                        met # The method we calculated the result for
-                    ) 
-                    
-                    # Add to list in the result dictionary
-                    self.results_raw[self.name_LCIA_scores] += [ID]
-                    
-                    # We add the calculated score to a temporary dict, with demand 1
-                    # This because we might use it further below
-                    if calculate_LCIA_scores_of_exchanges:
-                        
-                        # Check if activity key is already temporarily stored
-                        if self._temporary_score_results.get(activity_key) is None:
-                            
-                            # If not, initialize new dictionary
-                            self._temporary_score_results[activity_key]: dict = {}
-                        
-                        # Add the calculated result to it
-                        self._temporary_score_results[activity_key][met]: float = (1 / self.functional_amount * score) if self.functional_amount != 0 else 0
+                # Check if progress bar should be printed to console
+                if self.progress_bar:
                     
-            
-            # Prepare everything for the LCI and/or LCIA emission contribution
-            if any((extract_LCI_emission_contribution, calculate_LCIA_emission_contribution)):                
-                
-                # Retrieve the emission contribution array as a dummy
-                _dummy_structured_emission_array: np.array = self._get_structured_array_for_LCI_emission_contribution(database = database)
-                
-                # Prepare an array with the activity key of the length of the dummy emission contribution array
-                emission_contribution_activity_key_array: np.array = self._get_element_array(str(activity_key), len(_dummy_structured_emission_array["activity_key"]), dtype = "U")
+                    # Wrap progress bar around iterator
+                    futures: list = hp.progressbar(futures, prefix = "\nCalculate Monte Carlo ({} workers) ...".format(self.number_of_workers))
                 
-                
-            # Extract the LCI emission contribution
-            if extract_LCI_emission_contribution:
-                
-                # Extract the LCI emission contribution as the sum of the inventory matrix
-                LCI_emission_contribution_array: np.array = np.array(inventory.sum(axis = 1))[:, 0]
-                
-                # Build or retrieve the structured emission array
-                structured_array: np.array = self._get_structured_array_for_LCI_emission_contribution(database = database)
-                
-                # Overwrite the activity key with the current activity key
-                structured_array["activity_key"]: np.array = emission_contribution_activity_key_array
-                
-                # Overwrite the dummy values with the contribution values
-                structured_array["value"]: np.array = LCI_emission_contribution_array
-                
-                # We don't apply a cutoff, but remove all lines with 0 value
-                structured_array_cutoff: np.array = self._apply_cut_off_to_structured_array(structured_array = structured_array, cut_off = None)
-                
-                # Convert structured array back to list of tuples
-                structured_array_cutoff_as_list: list[tuple] = structured_array_cutoff.tolist()                       
-                
-                # Add to the result dictionary
-                self.results_raw[self.name_LCI_emission_contributions] += structured_array_cutoff_as_list
-
-
-
-            # Prepare everything for the LCI and/or LCIA process contribution
-            if any((extract_LCI_process_contribution, calculate_LCIA_process_contribution)):                
-                
-                # Retrieve the process contribution array as a dummy
-                _dummy_structured_process_array: np.array = self._get_structured_array_for_LCI_process_contribution(database = database)
-                
-                # Prepare an array with the activity key of the length of the dummy process contribution array
-                process_contribution_activity_key_array: np.array = self._get_element_array(str(activity_key), len(_dummy_structured_process_array["activity_key"]), dtype = "U")
-            
+                # Loop through the futures in the order of submission, so that the statistics are always merged in the same order
+                for future in futures:
+                    statistics.merge(other = future.result())
+        
+        # Add to object
+        self.monte_carlo_statistics: LCA_Monte_Carlo_Statistics = statistics
+        
+        # Initialize the results, if nothing has been calculated yet
+        if not hasattr(self, "results_raw"):
+            self.results_raw: dict[str, LCA_Result_Store] = self._initialize_results_raw()
+        
+        # Collect the values of each statistic (activities x methods)
+        values_by_result_type: dict[str, np.array] = {self.name_LCIA_scores_Monte_Carlo + "_mean": statistics.mean,
+                                                      self.name_LCIA_scores_Monte_Carlo + "_sd": statistics.get_standard_deviation()}
+        
+        # Add the percentiles
+        for percentile, values in zip(percentiles, statistics.get_percentiles(percentiles = percentiles)):
+            values_by_result_type[self.name_LCIA_scores_Monte_Carlo + "_p" + "{:g}".format(percentile)]: np.array = values
+        
+        # Indices of the activities and methods in the lookup tables
+        activity_indices: np.array = np.array([self._get_key_index(key = m.key) for m in self.activities], dtype = "int64")
+        method_indices: np.array = np.array([self._get_method_index(method = m) for m in self.methods], dtype = "int64")
+        
+        # Loop through each statistic and add it as a separate result, in the same form as the LCIA scores
+        for result_type, values in values_by_result_type.items():
             
+            # Results of a previous simulation are replaced
+            self.results_raw[result_type]: LCA_Result_Store = LCA_Result_Store(lookup_tables = self.lookup_tables)
             
-            # Extract the LCI process contribution
-            if extract_LCI_process_contribution:
-                
-                # Extract the LCI process contribution as the sum of the transposed inventory matrix
-                LCI_process_contribution_array: np.array = np.array(inventory.transpose().sum(axis = 1))[:, 0]
-                
-                # Build or retrieve the structured process array
-                structured_array: np.array = self._get_structured_array_for_LCI_process_contribution(database = database)
-                
-                # Overwrite the activity key with the current activity key
-                structured_array["activity_key"]: np.array = process_contribution_activity_key_array
-                
-                # Overwrite the dummy values with the contribution values
-                structured_array["value"]: np.array = LCI_process_contribution_array
-                
-                # We don't apply a cutoff, but remove all lines with 0 value
-                structured_array_cutoff: np.array = self._apply_cut_off_to_structured_array(structured_array = structured_array, cut_off = None)
-                
-                # Convert structured array back to list of tuples
-                structured_array_cutoff_as_list: list[tuple] = structured_array_cutoff.tolist()                       
-                
-                # Add to the result dictionary
-                self.results_raw[self.name_LCI_process_contributions] += structured_array_cutoff_as_list
-
-
-
-
-
-            # Calculate the emission and/or process contribution
-            if any((calculate_LCIA_emission_contribution, calculate_LCIA_process_contribution)):
-                
-                # Loop through each characterized matrix and method to get the sum/LCIA score
-                for met, characterized_matrix in characterized_matrices.items():
-                    
-                    # Extract the LCIA emission contribution, if indicated
-                    if calculate_LCIA_emission_contribution:
-
-                        # Extract the LCIA emission contribution as the sum of the characterized matrix
-                        LCIA_emission_contribution_array: np.array = np.array(characterized_matrix.sum(axis = 1))[:, 0]
-                        
-                        # Build or retrieve the structured emission array
-                        # structured_array: np.array = self._get_structured_array_for_LCIA_emission_contribution(database = database, method = met)
-                        structured_array: np.array = self._get_structured_array_for_LCIA_emission_contribution(database = database, method = met)
-                        
-                        # Overwrite the activity key with the current activity key
-                        structured_array["activity_key"]: np.array = emission_contribution_activity_key_array
-                        
-                        # Overwrite the dummy values with the contribution values
-                        structured_array["value"]: np.array = LCIA_emission_contribution_array
-                        
-                        # Apply a cutoff
-                        structured_array_cutoff: np.array = self._apply_cut_off_to_structured_array(structured_array = structured_array, cut_off = self.cut_off_percentage)
-                        
-                        # Convert structured array back to list of tuples
-                        structured_array_cutoff_as_list: list[tuple] = structured_array_cutoff.tolist()                       
-                        
-                        # Add to the result dictionary
-                        self.results_raw[self.name_LCIA_emission_contributions] += structured_array_cutoff_as_list
-                        
-                        
-
-
-                    # Extract the LCIA process contribution, if indicated
-                    if calculate_LCIA_process_contribution:
-                        
-                        # Extract the LCIA process contribution as the sum of the transposed characterized matrix
-                        LCIA_process_contribution_array: np.array = np.array(characterized_matrix.transpose().sum(axis = 1))[:, 0]
-                        
-                        # Build or retrieve the structured process array
-                        structured_array: np.array = self._get_structured_array_for_LCIA_process_contribution(database = database, method = met)
-                        
-                        # Overwrite the activity key with the current activity key
-                        structured_array["activity_key"]: np.array = process_contribution_activity_key_array
-                        
-                        # Overwrite the dummy values with the contribution values
-                        structured_array["value"]: np.array = LCIA_process_contribution_array
-                        
-                        # Apply a cutoff
-                        structured_array_cutoff: np.array = self._apply_cut_off_to_structured_array(structured_array = structured_array, cut_off = self.cut_off_percentage)
-                        
-                        # Convert structured array back to list of tuples
-                        structured_array_cutoff_as_list: list[tuple] = structured_array_cutoff.tolist()                       
-                        
-                        # Add to the result dictionary
-                        self.results_raw[self.name_LCIA_process_contributions] += structured_array_cutoff_as_list
- 
-                        
+            # Add one row per activity and method
+            self.results_raw[result_type].add_arrays(activity = np.repeat(activity_indices, len(self.methods)),
+                                                     activity_amount = self.functional_amount,
+                                                     flow = -1,
+                                                     flow_amount = np.nan,
+                                                     value = values.reshape(-1),
+                                                     method = np.tile(method_indices, len(self.activities)))
+        
         # Print summary statement(s)
         if self.progress_bar:
             
@@ -962,128 +3430,9 @@ class LCA_Calculation():
             
             # Print statement
             print("  - Calculation time: {}".format(self.convert_timedelta(end_round_1 - start_round_1)))
-            
-            if calculate_LCIA_scores:
-                print("      - {} LCIA score(s) from {} activity/ies & {} methods were calculated".format(len(self.activities)*len(self.methods), len(self.activities), len(self.methods)))
-        
-        # In case we want to calculate the scores of the exchanges, we need to go again through all exchanges and do the calculation
-        if calculate_LCIA_scores_of_exchanges:
-            
-            # Check if progress bar should be printed
-            if self.progress_bar:
-                
-                # Wrap progressbar around iterables
-                iterables: list[tuple] = hp.progressbar(self.results_raw[self.name_LCI_exchanges], prefix = "\nCalculate LCIA scores of exchanges ...")
-                
-            else:
-                # Otherwise, simply create iterable variable
-                iterables: list[tuple] = self.results_raw[self.name_LCI_exchanges]
-            
-            # To calculate the LCIA scores for exchanges, we need to preload the characterization factors
-            # This is a sacrification, BUT it will bring much more value if there are many exchanges to be calculated because we can omit the try, except statement (LCA calculation) if we already identify biosphere flows early
-            for met in self.methods:
-                self._load_characterization_factors(method = met)
-            
-            # Loop through all activities
-            for (act_key, act_amount, flow_key, flow_amount, _, _) in iterables:
-                                
-                # Initialize a list to potentially store all methods for which calculation was unsuccessful
-                methods_for_which_no_scores_were_calculated: list[tuple] = []
-                
-                # Go again through all methods
-                for met in self.methods:
-                                        
-                    # Check if the score has already been calculated
-                    if self._temporary_score_results.get(flow_key, {}).get(met) is not None:
-                        
-                        # Construct and add tuple to raw results
-                        self.results_raw[self.name_LCIA_immediate_scores] += [(act_key,
-                                                                               act_amount,
-                                                                               flow_key,
-                                                                               flow_amount,
-                                                                               flow_amount * self._temporary_score_results[flow_key][met],
-                                                                               met
-                                                                               )]
-                        # Go to next
-                        continue
-                    
-                    # Retrieve characterization factor, if possible 
-                    cf: (float | None) = self.characterization_factors[met].get(flow_key)                    
-                    
-                    # If successful, the current flow is of type biosphere and we can simply multiply the cf with the flow amount and go on
-                    if cf is not None:
-                        
-                        # Construct and add tuple to raw results
-                        self.results_raw[self.name_LCIA_immediate_scores] += [(act_key,
-                                                                               act_amount,
-                                                                               flow_key,
-                                                                               flow_amount,
-                                                                               flow_amount * cf,
-                                                                               met
-                                                                               )]
-                        # Go to next
-                        continue
-                    
-                    # Add to list
-                    methods_for_which_no_scores_were_calculated += [met]
-
-                
-                # If everything has already been successfully calculated, go to next activity
-                if methods_for_which_no_scores_were_calculated == []:
-                    continue
-                
-                # If we arrive here, we need to run through the matrix calculation
-                # First get the database the activity belongs to
-                database: str = act_key[0]
-
-                # Get the BW object,
-                try:
-                    # We try to construct the LCA object
-                    lca_object: bw2calc.lca.LCA = self._get_LCA_object(database = database)
-                    
-                    # and to redo the inventory matrix (which takes quite some time)
-                    lca_object.redo_lci({flow_key: flow_amount})
-                
-                except OutsideTechnosphere:
-                    # If we fail to redo the lca because the key is outside of the technosphere, that means that the current flow belongs to a biopshere database
-                    # Since we already tried to do a simple cf calculation (see above), it means that the current flow is not characterized in the specific methods
-                    # We can simply add a 0 now
-                    self.results_raw[self.name_LCIA_immediate_scores] += [(act_key,
-                                                                           act_amount,
-                                                                           flow_key,
-                                                                           flow_amount,
-                                                                           float(0),
-                                                                           m
-                                                                           ) for m in methods_for_which_no_scores_were_calculated]
-                    # We go on
-                    continue
-                
-                
-                # We then extract the inventory matrix
-                inventory: np.matrix = lca_object.inventory
-                
-                # Loop through each method and create the characterized matrices by multiplying the inventory matrix with the 
-                for met in methods_for_which_no_scores_were_calculated:
-                    
-                    # Build or simply get the matrix
-                    matrix = self._get_characterization_matrix(database = database, method = met)
-                    
-                    # Multiply the matrices
-                    characterized_matrix = (matrix * inventory)
-                    
-                    # The score is simply the sum of the matrix
-                    score: float = characterized_matrix.sum()
-                
-                    # Construct and add tuple to raw results
-                    self.results_raw[self.name_LCIA_immediate_scores] += [(act_key,
-                                                                           act_amount,
-                                                                           flow_key,
-                                                                           flow_amount,
-                                                                           score,
-                                                                           met
-                                                                           )]
-
-            
+            print("      - {} iteration(s) of {} LCIA score(s) from {} activity/ies & {} methods were calculated".format(iterations, len(self.activities)*len(self.methods), len(self.activities), len(self.methods)))
+    
+    
     
     def get_characterization_factors(self, methods: (list[tuple] | None) = None, extended: bool = True) -> list[dict]:
         
@@ -1103,6 +3452,16 @@ class LCA_Calculation():
         # Initialize a new list to store the characterization factors to
         characterization_factors: list[dict] = []
         
+        # Load the meta data of all characterized flows at once, if specified
+        if extended:
+            
+            # Load characterization factors, if not yet loaded
+            for method in methods:
+                self._load_characterization_factors(method = method)
+            
+            # Retrieve the meta data with a few queries per database
+            self._prefetch_acts_as_dicts(act_keys = list({k for method in methods for k in self.characterization_factors[method]}), keys_to_extract = self.keys_to_extract_from_BW_acts)
+        
         # Loop through each method individually
         for method in methods:
             
@@ -1140,132 +3499,270 @@ class LCA_Calculation():
                 
     
     
-    def get_results(self, extended: bool = True) -> list[dict]:
+    def _get_metadata_columns(self, key_indices: np.array, prefix: str) -> dict[str, np.array]:
         
-        # Check if results dictionary is available        
-        if not hasattr(self, "results_raw"):
-            raise ValueError("Nothing has been calculated yet. Use .calculate() to run calculation first.")
+        # Lookup table of the keys
+        keys: list = self.lookup_tables["keys"]
         
-        # Initialize a new results dictionary to where results will be stored
-        if extended:
-            self.results_extended: dict = {k: [] for k in list(self.results_raw.keys()).copy()}
-        else:
-            self.results_simple: dict = {k: [] for k in list(self.results_raw.keys()).copy()}
+        # Only retrieve the meta data once for each distinct key
+        unique_key_indices: np.array = np.unique(key_indices)
         
-        # Print statement
-        print("\n-----")
-        print("Processing results...") if not extended else print("Processing results, incl. retrieving of activity meta data")
+        # Retrieve the specified dictionary values from the Brightway background activities. None and the rest key do not have meta data
+        metadata: pd.DataFrame = pd.DataFrame([self._get_act_as_dict(keys[m], self.keys_to_extract_from_BW_acts) if m >= 0 and keys[m] != self.rest_key else {} for m in unique_key_indices],
+                                              index = unique_key_indices)
         
-        # Loop through the results individually
-        for result_type, results in self.results_raw.items():
-            
-            # # Check if progress bar should be printed to console
-            # if self.progress_bar:
-                
-            #     # Wrap progress bar around iterator
-            #     results: list[tuple] = hp.progressbar(results, prefix = "\nPreparing '{}' results ...".format(result_type))
-            
-            # Loop through each result item
-            for (act_key, act_amount, flow_key, flow_amount, score, method) in results:  
-                
-                # If everything is 0, we can go to the next one and do not need to add it to the results
-                if act_amount == 0 and flow_amount == 0 and score == 0:
-                    continue
-                
-                # In certain cases, tuples have been written as strings
-                # We need to revert this by using ast
-                # ... revert activity key tuple
-                if isinstance(act_key, str):
-                    act_key: tuple[str, str] = ast.literal_eval(act_key)
-                
-                # ... revert flow key tuple
-                if isinstance(flow_key, str):
-                    flow_key: tuple[str, str] = ast.literal_eval(flow_key)
-                
-                # ... revert method tuple
-                if isinstance(method, str):
-                    method: tuple[str, str] = ast.literal_eval(method)
-                
-                # Retrieve individual variables, for simplified handling
-                v_act_database: (str | None) = act_key[0] if act_key is not None else None
-                v_act_code: (str | None) = act_key[1] if act_key is not None else None
-                v_flow_database: (str | None) = flow_key[0] if flow_key is not None else None
-                v_flow_code: (str | None) = flow_key[1] if flow_key is not None else None
-                
-                # Check if flows should be described extensively
-                if not extended:
-                    result_as_dict: dict = {self.k_act_database: v_act_database,
-                                            self.k_act_code: v_act_code,
-                                            self.k_act_amount: act_amount,
-                                            self.k_flow_database: v_flow_database,
-                                            self.k_flow_code: self.rest_name if flow_key == self.rest_key else v_flow_code,
-                                            self.k_flow_amount: flow_amount,
-                                            self._score_k_name: score,
-                                            self._method_k_name: method}
-                    
-                    # Add the constructed dictionary to the list
-                    self.results_simple[result_type] += [{k: v for k, v in result_as_dict.items() if v is not None}]
+        # Map the meta data of each distinct key to all rows
+        return {self._name_sep.join((prefix, k)): v.reindex(key_indices).to_numpy() for k, v in metadata.items()}
+    
+    
+    def _get_result_as_dataframe(self,
+                                 results: LCA_Result_Store,
+                                 extended: bool,
+                                 rows: (np.ndarray | slice | None) = None,
+                                 column_names: (list[str] | None) = None,
+                                 functional_amount: (float | int | None) = None) -> pd.DataFrame:
+        
+        # Retrieve the columns of the result store
+        columns: dict[str, np.array] = results.get_columns()
+        
+        # Only use the rows specified, e.g. a chunk of the results
+        if rows is not None:
+            columns: dict[str, np.array] = {k: v[rows] for k, v in columns.items()}
+        
+        # Scale the rows to the functional amount, if specified. Results were then calculated for a demand of 1
+        # All amounts and scores are linear in demand, including the amounts of the consumers in the supply chain graph
+        if functional_amount is not None:
+            columns: dict[str, np.array] = {**columns,
+                                            "activity_amount": columns["activity_amount"] * functional_amount,
+                                            "flow_amount": columns["flow_amount"] * functional_amount,
+                                            "value": columns["value"] * functional_amount}
+        
+        # If everything is 0, we do not need to add the row to the results
+        keep: np.array = ~((columns["activity_amount"] == 0) & (columns["flow_amount"] == 0) & (columns["value"] == 0))
+        columns: dict[str, np.array] = {k: v[keep] for k, v in columns.items()}
+        
+        # Lookup tables, where the last element is used for the index -1 (None)
+        keys: list = results.lookup_tables["keys"] + [None]
+        methods: list = results.lookup_tables["methods"] + [None]
+        
+        # Resolve the database and code of each key. The rest key is renamed
+        databases: np.array = np.array([m[0] if m is not None else None for m in keys], dtype = "object")
+        codes: np.array = np.array([(self.rest_name if m == self.rest_key else m[1]) if m is not None else None for m in keys], dtype = "object")
+        
+        # Resolve the methods
+        methods_array: np.array = np.empty(len(methods), dtype = "object")
+        methods_array[:] = methods
+        
+        # Retrieve the meta data, if specified
+        act_metadata: dict[str, np.array] = self._get_metadata_columns(key_indices = columns["activity"], prefix = self._act_k_name) if extended else {}
+        flow_metadata: dict[str, np.array] = self._get_metadata_columns(key_indices = columns["flow"], prefix = self._flow_k_name) if extended else {}
+        method_unit: dict[str, np.array] = {self._name_sep.join((self._method_k_name, "unit")): np.array([self._get_method_unit(method = m) if m is not None else None for m in methods], dtype = "object")[columns["method"]]} if extended else {}
+        
+        # Resolve the additional key columns (e.g., the root activity of the supply chain graph)
+        key_columns: dict[str, np.array] = {self._name_sep.join((m.capitalize(), n)): v[columns[m]] for m in results.key_columns for n, v in (("database", databases), ("code", codes))}
+        
+        # Construct the dataframe directly from the arrays
+        df: pd.DataFrame = pd.DataFrame({**key_columns,
+                                         self.k_act_database: databases[columns["activity"]],
+                                         self.k_act_code: codes[columns["activity"]],
+                                         **act_metadata,
+                                         self.k_act_amount: columns["activity_amount"],
+                                         self.k_flow_database: databases[columns["flow"]],
+                                         self.k_flow_code: codes[columns["flow"]],
+                                         **flow_metadata,
+                                         self.k_flow_amount: columns["flow_amount"],
+                                         self._score_k_name: columns["value"],
+                                         self._method_k_name: methods_array[columns["method"]],
+                                         **method_unit})
+        
+        # Use the columns specified, so that all chunks of a result have the same columns
+        if column_names is not None:
+            return df.reindex(columns = column_names)
+        
+        # Otherwise, remove columns which do not contain any value
+        return df.dropna(axis = "columns", how = "all")
+    
+    
+    def _get_column_names_of_result(self, results: LCA_Result_Store, extended: bool) -> list[str]:
+        
+        # Retrieve the columns of the result store
+        columns: dict[str, np.array] = results.get_columns()
+        
+        # Rows which are kept in the results (see '_get_result_as_dataframe')
+        kept_rows: np.array = np.flatnonzero(~((columns["activity_amount"] == 0) & (columns["flow_amount"] == 0) & (columns["value"] == 0)))
+        
+        # A column contains a value if it contains a value for at least one distinct activity, flow or method
+        # It is therefore enough to look at the first row of each distinct activity, flow and method and the first row of each amount that is not NaN
+        positions: np.array = np.unique(np.concatenate([np.unique(columns[m][kept_rows], return_index = True)[1] for m in ("activity", "flow", "method") + results.key_columns] +
+                                                       [np.flatnonzero(~np.isnan(columns[m][kept_rows]))[:1] for m in ("activity_amount", "flow_amount", "value")]))
+        
+        # Build the dataframe of these rows only and return the columns which contain values
+        return list(self._get_result_as_dataframe(results = results, extended = extended, rows = kept_rows[positions]).columns)
+    
+    
+    def _get_result_as_dataframes_in_chunks(self, results: LCA_Result_Store, extended: bool, chunk_size: int, functional_amounts: tuple = (None,)):
+        
+        # All chunks need to have the same columns
+        column_names: list[str] = self._get_column_names_of_result(results = results, extended = extended)
+        
+        # If there are no results, yield an empty dataframe, so that the columns are still written
+        if len(results) == 0:
+            yield self._get_result_as_dataframe(results = results, extended = extended, column_names = column_names)
+        
+        # Build and yield the dataframes chunk by chunk, for each functional amount. Only one chunk is kept in memory at once
+        # The index of the chunks continues from one chunk to the next, so that it numbers all rows of the result
+        offset: int = 0
+        for functional_amount in functional_amounts:
+            for start in range(0, len(results), chunk_size):
+                df: pd.DataFrame = self._get_result_as_dataframe(results = results, extended = extended, rows = slice(start, start + chunk_size), column_names = column_names, functional_amount = functional_amount)
+                df.index = pd.RangeIndex(offset, offset + len(df))
+                offset += len(df)
+                yield df
+    
+    
+    def _get_functional_amounts_of_result(self, result_type: str) -> tuple:
+        
+        # Without functional amounts, the results are retrieved as calculated (None)
+        # Results of the Monte Carlo simulation and the what-if analysis are not calculated in 'calculate' and therefore not scaled
+        if self.functional_amounts is None or result_type not in (self.name_LCIA_scores,
+                                                                  self.name_LCI_exchanges,
+                                                                  self.name_LCI_emission_contributions,
+                                                                  self.name_LCI_process_contributions,
+                                                                  self.name_LCIA_immediate_scores,
+                                                                  self.name_LCIA_emission_contributions,
+                                                                  self.name_LCIA_process_contributions,
+                                                                  self.name_LCIA_supply_chain_graph):
+            return (None,)
+        
+        # Return the functional amounts to which the result is scaled
+        return self.functional_amounts
+    
+    
+    def _prefetch_metadata_of_results(self) -> None:
+        
+        # Retrieve the indices of all distinct keys in the results
+        key_indices: np.array = np.unique(np.concatenate([m.get_columns()[n] for m in self.results_raw.values() for n in ("activity", "flow")]))
+        
+        # Retrieve the meta data with a few queries per database
+        self._prefetch_acts_as_dicts(act_keys = [self.lookup_tables["keys"][m] for m in key_indices if m >= 0], keys_to_extract = self.keys_to_extract_from_BW_acts)
+    
+    
+    def get_results(self, extended: bool = True, as_dataframe: bool = False) -> (dict[str, list[dict]] | dict[str, pd.DataFrame]):
+        
+        """ Prepares the results of the calculation.
+
+        Parameters
+        ----------
+        extended : bool, optional
+            If True, the meta data of the activities and flows as well as the method units are added to the results. The default is True.
+        
+        as_dataframe : bool, optional
+            If True, the results are returned as dataframes, which are directly built from the result arrays.
+            Otherwise, each result is returned as a list of dictionaries, where empty values are omitted. The default is False.
+            The results are also stored in the same form in the attribute 'results_extended' or 'results_simple'.
+
+        Returns
+        -------
+        dict[str, list[dict]] | dict[str, pd.DataFrame]
+            Dictionary with the result type as key and the results as value.
+
+        """
         
-                    
-                else:
-                    # Retrieve the specified dictionary values from the Brightway background activities
-                    act_as_dict: dict = self._get_act_as_dict(act_key, self.keys_to_extract_from_BW_acts) if act_key is not None else {}
-                    flow_as_dict: dict = self._get_act_as_dict(flow_key, self.keys_to_extract_from_BW_acts) if flow_key and flow_key != self.rest_key is not None else {}
-                    method_unit: dict = {self._name_sep.join((self._method_k_name, "unit")): self._get_method_unit(method = method)} if method is not None else {}
-                    
-                    # Construct dictionary
-                    result_as_dict: dict = {self.k_act_database: v_act_database,
-                                            self.k_act_code: v_act_code,
-                                            **{(self._name_sep.join((self._act_k_name, k))): v for k, v in act_as_dict.items()},
-                                            self.k_act_amount: act_amount,
-                                            self.k_flow_database: v_flow_database,
-                                            self.k_flow_code: self.rest_name if flow_key == self.rest_key else v_flow_code,
-                                            **{(self._name_sep.join((self._flow_k_name, k))): v for k, v in flow_as_dict.items()},
-                                            self.k_flow_amount: flow_amount,
-                                            self._score_k_name: score,
-                                            self._method_k_name: method,
-                                            **method_unit}
-                
-                    # Add the constructed dictionary to the list
-                    self.results_extended[result_type] += [{k: v for k, v in result_as_dict.items() if v is not None}]
+        # Check if results dictionary is available        
+        if not hasattr(self, "results_raw"):
+            raise ValueError("Nothing has been calculated yet. Use .calculate() to run calculation first.")
         
         # Print statement
-        print("Completed")
+        print("\n-----")
+        print("Processing results...") if not extended else print("Processing results, incl. retrieving of activity meta data")
         
-        # Return
+        # Load the meta data of all activities and flows of all result types at once, if specified
         if extended:
-            
-            # Return extended results
-            return self.results_extended
+            self._prefetch_metadata_of_results()
         
+        # Build a dataframe for each result type
+        # Results are scaled to each functional amount, if specified
+        results: dict[str, pd.DataFrame] = {k: pd.concat([self._get_result_as_dataframe(results = v, extended = extended, functional_amount = m) for m in self._get_functional_amounts_of_result(result_type = k)], ignore_index = True)
+                                            for k, v in self.results_raw.items()}
+        
+        # Convert the dataframes to lists of dictionaries and omit empty values, if not specified otherwise
+        if not as_dataframe:
+            results: dict[str, list[dict]] = {k: [{kk: vv for kk, vv in m.items() if vv is not None and not (isinstance(vv, float) and np.isnan(vv))} for m in v.to_dict("records")] for k, v in results.items()}
+        
+        # Add to object, in the same form as returned
+        if extended:
+            self.results_extended: (dict[str, list[dict]] | dict[str, pd.DataFrame]) = results
         else:
-            # Return simple results
-            return self.results_simple
+            self.results_simple: (dict[str, list[dict]] | dict[str, pd.DataFrame]) = results
+        
+        # Print statement
+        print("Completed")
+        
+        # Return
+        return results
 
     
 
 
-    # Function to export the results to XLSX/CSV
+    # Function to export the results to XLSX/CSV/Parquet
     def write_results(self,
                       path: (pathlib.Path | str | None),
                       filename: (str | None) = None,
                       use_timestamp_in_filename: bool = True,
-                      extended: bool = True) -> None:
+                      extended: bool = True,
+                      file_format: str = "xlsx",
+                      chunk_size: int = 100000) -> None:
         
-        # Check if extended results have already been prepared and are available
-        if (extended and not hasattr(self, "results_extended")) or (not extended and not hasattr(self, "results_simple")):
+        """ Writes the results of the calculation to files. The results are written in chunks directly from the result arrays,
+        so that only one chunk of a result is converted to a dataframe at once.
 
-            # If not, prepare them first
-            _results_: dict[str, list[dict]] = self.get_results(extended = extended)
+        Parameters
+        ----------
+        path : pathlib.Path | str | None
+            Folder where the files are written to. If None, the output directory of the current Brightway project is used.
+            
+        filename : str | None, optional
+            Name of the file. The default is None, which names the file 'LCA'.
+            
+        use_timestamp_in_filename : bool, optional
+            If True, the current time is added to the beginning of the filename. The default is True.
             
-            # Delete the results variable to keep memory minimal
-            del _results_
+        extended : bool, optional
+            If True, the meta data of the activities and flows as well as the method units are added to the results. The default is True.
+            
+        file_format : str, optional
+            Either 'xlsx', 'csv' or 'parquet'. The default is 'xlsx'.
+            With 'xlsx', all results are written to one workbook (results with more rows than an excel sheet allows are written to a separate CSV).
+            The workbook is written with constant memory, if the package 'xlsxwriter' is installed.
+            With 'csv' and 'parquet', each result is written to a separate file. Parquet requires the package 'pyarrow'.
+            
+        chunk_size : int, optional
+            Number of rows that are converted and written at once. The default is 100000.
+
+        Returns
+        -------
+        None
+
+        """
         
-        # Select results
-        results_to_write: dict = self.results_extended if extended else self.results_simple
-                
-        # Convert results to dataframe
-        results_df: dict[str, pd.DataFrame] = {k: pd.DataFrame(v) for k, v in results_to_write.items()}
+        # Check function input type
+        hp.check_function_input_type(self.write_results, locals())
+        
+        # Check if results dictionary is available        
+        if not hasattr(self, "results_raw"):
+            raise ValueError("Nothing has been calculated yet. Use .calculate() to run calculation first.")
+        
+        # Check if the file format is valid
+        if file_format not in ("xlsx", "csv", "parquet"):
+            raise ValueError("Input variable 'file_format' needs to be one of 'xlsx', 'csv' or 'parquet' but is currently '" + str(file_format) + "'.")
+        
+        # Parquet files can only be written if pyarrow is installed
+        if file_format == "parquet" and pyarrow is None:
+            raise ValueError("Writing results as Parquet files requires the package 'pyarrow', which is not installed.")
+        
+        # Check if the chunk size is valid
+        if chunk_size < 1:
+            raise ValueError("Input variable 'chunk_size' needs to be greater than 0 but is currently '" + str(chunk_size) + "'.")
 
         # Create a path if not provided by the function
         # If not provided, the local Brightway2 folder will be used to save results
@@ -1325,43 +3822,158 @@ class LCA_Calculation():
                          
                          # !!! DO THE DOCUMENTATIONS HERE
                          self.name_LCIA_process_contributions: """ TODO """,
+                         
+                         self.name_LCIA_supply_chain_graph: """This dataframe contains the edges of the supply chain graph of each root activity and method.
+                         Each edge links a consumer (activity) to one of its suppliers (flow), with the amount of the supplier and its cumulative score.""",
+                         
+                         self.name_LCIA_scores_what_if: """This dataframe contains the LCIA scores of all activities (LCI) and methods (LCIA) combinations, as if the exchanges that were given to 'calculate_LCIA_scores_with_edits' were edited.""",
+                         
+                         self.name_LCIA_scores_Monte_Carlo + "_mean": """This dataframe contains the mean of the LCIA scores of all activities (LCI) and methods (LCIA) combinations over all Monte Carlo iterations.""",
+                         
+                         self.name_LCIA_scores_Monte_Carlo + "_sd": """This dataframe contains the standard deviation of the LCIA scores of all activities (LCI) and methods (LCIA) combinations over all Monte Carlo iterations.""",
 
                          }
         
+        # Add the documentation of each percentile of the Monte Carlo simulation, if calculated
+        for result_type in [m for m in self.results_raw if m.startswith(self.name_LCIA_scores_Monte_Carlo + "_p")]:
+            documentation[result_type]: str = "This dataframe contains the " + result_type[len(self.name_LCIA_scores_Monte_Carlo + "_p"):] + " percentile of the LCIA scores of all activities (LCI) and methods (LCIA) combinations over all Monte Carlo iterations."
+        
+        # Load the meta data of all activities and flows at once, if specified
+        if extended:
+            self._prefetch_metadata_of_results()
+        
         # Write data to XLSX
-        # Initialise the writer variable
-        writer = pd.ExcelWriter(path / (str(filename) + ".xlsx"))
+        if file_format == "xlsx":
+            self._write_results_to_XLSX(filepath = path / (str(filename) + ".xlsx"),
+                                        documentation = documentation,
+                                        extended = extended,
+                                        chunk_size = chunk_size)
+        
+        else:
+            # Write each result to a separate CSV or Parquet file
+            for result_type, results in self.results_raw.items():
+                self._write_result_to_file(filepath = path / (str(filename) + "_" + result_type + "." + file_format),
+                                           results = results,
+                                           extended = extended,
+                                           chunk_size = chunk_size,
+                                           functional_amounts = self._get_functional_amounts_of_result(result_type = result_type))
+        
+        # Print filepath if specified
+        if self.progress_bar:
+            
+            # Print statement saying where the results were stored
+            print("\n-----\nLCA results saved to the following path:\n" + str(path))
+    
+    
+    def _write_result_to_file(self, filepath: pathlib.Path, results: LCA_Result_Store, extended: bool, chunk_size: int, functional_amounts: tuple = (None,), index: bool = False) -> None:
+        
+        # Initialize the Parquet writer variable, which is created with the first chunk
+        parquet_writer = None
+        
+        # Loop through each chunk of the results
+        for number, df in enumerate(self._get_result_as_dataframes_in_chunks(results = results, extended = extended, chunk_size = chunk_size, functional_amounts = functional_amounts)):
+            
+            # Append the chunk to the CSV. The header is only written with the first chunk. The index is only written if specified (e.g., for results that do not fit into an XLSX sheet)
+            if filepath.suffix == ".csv":
+                df.to_csv(filepath, mode = "w" if number == 0 else "a", header = number == 0, index = index)
+                continue
+            
+            # Parquet needs the same types in all chunks. Amounts and scores are floats, everything else is written as string
+            table = pyarrow.Table.from_pandas(self._convert_dataframe_to_strings(df = df), preserve_index = False,
+                                              schema = pyarrow.schema([(m, pyarrow.string() if self._is_string_column(m) else pyarrow.float64()) for m in df.columns]))
+            
+            # Create the writer with the first chunk
+            if parquet_writer is None:
+                parquet_writer = pyarrow.parquet.ParquetWriter(filepath, table.schema)
+            
+            # Write the chunk
+            parquet_writer.write_table(table)
+        
+        # Close the Parquet file
+        if parquet_writer is not None:
+            parquet_writer.close()
+    
+    
+    def _is_string_column(self, column_name: str) -> bool:
+        
+        # All columns except the amounts and the scores contain strings (or tuples, which are written as strings)
+        return column_name not in (self.k_act_amount, self.k_flow_amount, self._score_k_name)
+    
+    
+    def _convert_dataframe_to_strings(self, df: pd.DataFrame) -> pd.DataFrame:
+        
+        # Convert tuples (e.g., methods or categories) and other values to strings. Missing values stay empty
+        return df.assign(**{m: [None if v is None or (isinstance(v, float) and np.isnan(v)) else str(v) for v in df[m]] for m in df.columns if self._is_string_column(m)})
+    
+    
+    def _write_results_to_XLSX(self, filepath: pathlib.Path, documentation: dict[str, str], extended: bool, chunk_size: int) -> None:
+        
+        # Maximum number of rows that can be written to an excel sheet
+        max_rows: int = 1048000
         
         # Convert the documentation dictionary into a dataframe
-        documentation_df: pd.DataFrame = pd.DataFrame([{"Sheet": k, "Description": v} for k, v in documentation.items() if k in results_df])
+        documentation_df: pd.DataFrame = pd.DataFrame([{"Sheet": k, "Description": v} for k, v in documentation.items() if k in self.results_raw])
         
-        # Add the documentation dataframe to the writer
-        documentation_df.to_excel(writer, sheet_name = "Documentation")
+        # Functional amounts to which each result is scaled. The number of rows grows with the number of functional amounts
+        functional_amounts: dict[str, tuple] = {k: self._get_functional_amounts_of_result(result_type = k) for k in self.results_raw}
+        
+        # Results with more than a million rows can not be added as a sheet
+        # In that case, we write a standalone csv, with the index as the sheets
+        for result_type, results in self.results_raw.items():
+            if len(results) * len(functional_amounts[result_type]) >= max_rows:
+                self._write_result_to_file(filepath = filepath.parent / (result_type + ".csv"), results = results, extended = extended, chunk_size = chunk_size, functional_amounts = functional_amounts[result_type], index = True)
         
-        # Add each result dataframe to the writer
-        for df_name, df in results_df.items():
+        # Without xlsxwriter, the sheets are written with pandas, which keeps each sheet in memory
+        if xlsxwriter is None:
             
-            # Check if the length of the dataframe exceeds a million and more rows
-            # If not, we are good to go with writing an excel file
-            if len(df) < 1048000:
-                
-                # We simply append the result dataframe to the excel workbook
-                df.to_excel(writer, sheet_name = df_name[:30])
-                
-            else:
-                # If there are more than one million rows, we can not add the results in a new sheet.
-                # In that case, we write a standalone csv
-                df.to_csv((path / str(df_name + ".csv")))
-
+            # Initialise the writer variable
+            writer = pd.ExcelWriter(filepath)
+            
+            # Add the documentation dataframe to the writer
+            documentation_df.to_excel(writer, sheet_name = "Documentation")
+            
+            # Add each result dataframe to the writer. The first column of each sheet is the index
+            for result_type, results in self.results_raw.items():
+                if len(results) * len(functional_amounts[result_type]) < max_rows:
+                    pd.concat(list(self._get_result_as_dataframes_in_chunks(results = results, extended = extended, chunk_size = chunk_size, functional_amounts = functional_amounts[result_type]))).to_excel(writer, sheet_name = result_type[:30])
+            
+            # Save the XLSX
+            writer.close()
+            return
+        
+        # Initialise the workbook. In constant memory mode, each row is flushed to disk as soon as the next row is written
+        workbook = xlsxwriter.Workbook(str(filepath), {"constant_memory": True, "nan_inf_to_errors": True})
+        
+        # Add the documentation sheet
+        self._write_dataframes_to_XLSX_sheet(worksheet = workbook.add_worksheet("Documentation"), dfs = [documentation_df])
+        
+        # Add each result as a sheet, chunk by chunk
+        for result_type, results in self.results_raw.items():
+            if len(results) * len(functional_amounts[result_type]) < max_rows:
+                self._write_dataframes_to_XLSX_sheet(worksheet = workbook.add_worksheet(result_type[:30]),
+                                                     dfs = self._get_result_as_dataframes_in_chunks(results = results, extended = extended, chunk_size = chunk_size, functional_amounts = functional_amounts[result_type]))
+        
         # Save the XLSX
-        writer.close()
+        workbook.close()
+    
+    
+    def _write_dataframes_to_XLSX_sheet(self, worksheet, dfs) -> None:
         
-        # Print filepath if specified
-        if self.progress_bar:
+        # Current row of the sheet
+        row: int = 0
+        
+        # Loop through each dataframe
+        for df in dfs:
             
-            # Print statement saying where XLSX file was stored
-            print("\n-----\nLCA results saved to the following path:\n" + str(path))
-
+            # Write the header with the first dataframe. The first column is the index, which has no header (as written by pandas)
+            if row == 0:
+                worksheet.write_row(row, 0, [None] + list(df.columns))
+                row += 1
+            
+            # Write the rows in ascending order, which is required in constant memory mode. Each row starts with its index
+            for values in self._convert_dataframe_to_strings(df = df).itertuples(index = True):
+                worksheet.write_row(row, 0, [None if v is None or (isinstance(v, float) and np.isnan(v)) else v for v in values])
+                row += 1
 
 
 
@@ -1398,6 +4010,490 @@ class LCA_Calculation():
     
 
 
+#%%
+class LCA_Comparison():
+    
+    def __init__(self,
+                 calculation_1: LCA_Calculation,
+                 calculation_2: LCA_Calculation,
+                 activity_mapping: (dict | None) = None,
+                 method_mapping: (dict | None) = None,
+                 result_type: str = "LCIA_scores") -> None:
+        
+        """ A class that compares the results of two LCA calculations, e.g. the same database imported from different sources or calculated with a different background.
+        Activities and methods of both calculations are aligned by integer indices, and all differences are calculated as arrays at once.
+        
+        
+        Parameters
+        ----------
+        calculation_1 : LCA_Calculation
+            The first (reference) calculation. Results need to be calculated already.
+        
+        calculation_2 : LCA_Calculation
+            The second calculation, which is compared to the first one. Results need to be calculated already.
+        
+        activity_mapping : (dict | None)
+            A dictionary which maps the activity keys of the second calculation to the activity keys of the first calculation.
+            Activities which can not be mapped are not compared. The default is None, which maps activities with the same key (database and code).
+            Activities of different databases (e.g., the same database imported twice under different names) therefore need to be mapped explicitly.
+        
+        method_mapping : (dict | None)
+            A dictionary which maps the methods of both calculations to a common (standardized) name, e.g. the same method imported from SimaPro and XML.
+            Methods which can not be mapped are not compared. The default is None, which maps methods with the same name.
+        
+        result_type : str
+            The result type that is compared. Each activity needs to have one value per method, as it is the case for the LCIA scores or the statistics of the Monte Carlo simulation.
+            The default is 'LCIA_scores'.
+        
+        """
+        
+        # Check function input type
+        hp.check_function_input_type(self.__init__, locals())
+        
+        # Loop through both calculations and check if results are available
+        for calculation in (calculation_1, calculation_2):
+            
+            # Check if results dictionary is available
+            if not hasattr(calculation, "results_raw"):
+                raise ValueError("Nothing has been calculated yet. Use .calculate() to run calculation first.")
+            
+            # Check if the result type is available
+            if result_type not in calculation.results_raw:
+                raise ValueError("Input variable 'result_type' needs to be one of the calculated results but is currently '" + str(result_type) + "'.")
+        
+        # Add to object
+        self.calculation_1: LCA_Calculation = calculation_1
+        self.calculation_2: LCA_Calculation = calculation_2
+        self.activity_mapping: (dict | None) = activity_mapping
+        self.method_mapping: (dict | None) = method_mapping
+        self.result_type: str = result_type
+        
+        # Names of the columns of the results
+        self.k_act_database_1: str = "Activity_database_1"
+        self.k_act_code_1: str = "Activity_code_1"
+        self.k_act_database_2: str = "Activity_database_2"
+        self.k_act_code_2: str = "Activity_code_2"
+        self.k_method: str = "Method"
+        self.k_method_1: str = "Method_1"
+        self.k_method_2: str = "Method_2"
+        self.k_score_1: str = "Score_1"
+        self.k_score_2: str = "Score_2"
+        self.k_absolute_delta: str = "Absolute_delta"
+        self.k_relative_delta: str = "Relative_delta"
+        self.k_rank_1: str = "Rank_1"
+        self.k_rank_2: str = "Rank_2"
+        self.k_rank_change: str = "Rank_change"
+    
+    
+    def _get_activity_indices(self, calculation: LCA_Calculation, activity_indices: dict, is_second_calculation: bool) -> np.array:
+        
+        # Lookup table of the keys of the calculation
+        keys: list[tuple] = calculation.lookup_tables["keys"]
+        
+        # Initialize an array that maps each index of the lookup table to the index of the activity in the comparison. Keys that can not be mapped are -1
+        # The last element maps -1 (None) to -1
+        mapping: np.array = np.full(len(keys) + 1, -1, dtype = "int64")
+        
+        # Loop through each key of the lookup table. This only loops through the distinct keys, not through all rows of the results
+        for idx, key in enumerate(keys):
+            
+            # The rest key is not an activity
+            if key is None or key == calculation.rest_key:
+                continue
+            
+            # Activities are identified by the key of the first calculation. Without mapping, the keys of the second calculation are used as they are
+            if self.activity_mapping is not None and is_second_calculation:
+                identifier: (tuple | None) = self.activity_mapping.get(key)
+            
+            else:
+                identifier: tuple = key
+            
+            # Go to next key, if it can not be mapped
+            if identifier is None:
+                continue
+            
+            # Add the activity to the comparison, if not yet existing
+            if activity_indices.get(identifier) is None:
+                activity_indices[identifier]: int = len(activity_indices)
+            
+            # Map
+            mapping[idx]: int = activity_indices[identifier]
+        
+        # Return the mapping
+        return mapping
+    
+    
+    def _get_method_indices(self, calculation: LCA_Calculation, method_indices: dict) -> np.array:
+        
+        # Lookup table of the methods of the calculation
+        methods: list[tuple] = calculation.lookup_tables["methods"]
+        
+        # Initialize an array that maps each index of the lookup table to the index of the method in the comparison. Methods that can not be mapped are -1
+        # The last element maps -1 (None) to -1
+        mapping: np.array = np.full(len(methods) + 1, -1, dtype = "int64")
+        
+        # Loop through each method of the lookup table
+        for idx, method in enumerate(methods):
+            
+            # Methods are identified by their standardized name, or by their name if no mapping is specified
+            identifier = method if self.method_mapping is None else self.method_mapping.get(method)
+            
+            # Go to next method, if it can not be mapped
+            if identifier is None:
+                continue
+            
+            # Add the method to the comparison, if not yet existing
+            if method_indices.get(identifier) is None:
+                method_indices[identifier]: int = len(method_indices)
+            
+            # Map
+            mapping[idx]: int = method_indices[identifier]
+        
+        # Return the mapping
+        return mapping
+    
+    
+    def _get_ranks(self, scores: np.ndarray, valid: np.ndarray) -> np.array:
+        
+        # Activities that are not compared are sorted to the end
+        sortable_scores: np.array = np.where(valid, -scores, np.inf)
+        
+        # Rank the activities of each method by their score, the highest score has rank 1
+        ranks: np.array = np.empty(scores.shape, dtype = "float64")
+        np.put_along_axis(ranks, np.argsort(sortable_scores, axis = 0, kind = "stable"), np.arange(1, scores.shape[0] + 1, dtype = "float64")[:, None], axis = 0)
+        
+        # Activities that are not compared do not have a rank
+        ranks[~valid] = np.nan
+        
+        # Return
+        return ranks
+    
+    
+    def compare(self) -> None:
+        
+        """ Aligns the activities and methods of both calculations and calculates the absolute and relative differences of the scores, as well as the change of the rank of each activity within each method.
+        Only activity and method combinations which are available in both calculations are compared. Within each method, the activity with the highest score has rank 1.
+        Results are available with 'get_results' and 'write_results'.
+        
+        Returns
+        -------
+        None
+        
+        """
+        
+        # Initialize the dictionaries which give the index of each activity and method in the comparison
+        activity_indices: dict = {}
+        method_indices: dict = {}
+        
+        # Initialize lists to store the aligned arrays of both calculations
+        scores: list[np.array] = []
+        activity_key_indices: list[np.array] = []
+        method_key_indices: list[np.array] = []
+        
+        # Map the activities and methods of both calculations to the indices of the comparison
+        # Both calculations are mapped first, so that the arrays of both calculations have the same size
+        mappings: list[tuple[np.array, np.array]] = [(self._get_activity_indices(calculation = calculation, activity_indices = activity_indices, is_second_calculation = idx == 1),
+                                                      self._get_method_indices(calculation = calculation, method_indices = method_indices))
+                                                     for idx, calculation in enumerate((self.calculation_1, self.calculation_2))]
+        
+        # Loop through both calculations
+        for calculation, (activity_mapping, method_mapping) in zip((self.calculation_1, self.calculation_2), mappings):
+            
+            # Retrieve the columns of the results
+            columns: dict[str, np.array] = calculation.results_raw[self.result_type].get_columns()
+            
+            # Map the activity and method of each row. Rows that can not be mapped are excluded
+            rows: np.array = activity_mapping[columns["activity"]]
+            cols: np.array = method_mapping[columns["method"]]
+            keep: np.array = (rows >= 0) & (cols >= 0)
+            
+            # Write the values into a dense array (activities x methods). Activities that are not part of the results are NaN
+            values: np.array = np.full((len(activity_indices), len(method_indices)), np.nan, dtype = "float64")
+            values[rows[keep], cols[keep]] = columns["value"][keep]
+            
+            # Write the index of the activity key and of the method in the lookup tables of the calculation, to be able to retrieve them for the results
+            activity_keys: np.array = np.full(len(activity_indices), -1, dtype = "int64")
+            activity_keys[rows[keep]] = columns["activity"][keep]
+            method_keys: np.array = np.full(len(method_indices), -1, dtype = "int64")
+            method_keys[cols[keep]] = columns["method"][keep]
+            
+            # Add
+            scores += [values]
+            activity_key_indices += [activity_keys]
+            method_key_indices += [method_keys]
+        
+        # Only combinations that are available in both calculations are compared
+        valid: np.array = ~np.isnan(scores[0]) & ~np.isnan(scores[1])
+        
+        # Add to object
+        self.scores_1, self.scores_2 = scores
+        self.activity_key_indices_1, self.activity_key_indices_2 = activity_key_indices
+        self.method_key_indices_1, self.method_key_indices_2 = method_key_indices
+        self.methods: list = list(method_indices)
+        self.valid: np.array = valid
+        
+        # Calculate the absolute and relative differences. The relative difference refers to the score of the first calculation and is not defined if that score is 0
+        self.absolute_deltas: np.array = np.where(valid, self.scores_2 - self.scores_1, np.nan)
+        self.relative_deltas: np.array = np.divide(self.absolute_deltas, np.abs(self.scores_1), out = np.full(valid.shape, np.nan), where = valid & (self.scores_1 != 0))
+        
+        # Rank the activities within each method, only considering the activities that are compared
+        self.ranks_1: np.array = self._get_ranks(scores = self.scores_1, valid = valid)
+        self.ranks_2: np.array = self._get_ranks(scores = self.scores_2, valid = valid)
+        self.rank_changes: np.array = self.ranks_2 - self.ranks_1
+    
+    
+    def _get_lookup_arrays(self, methods_as_strings: bool) -> dict[str, np.array]:
+        
+        # Initialize the dictionary of the arrays
+        lookup_arrays: dict[str, np.array] = {}
+        
+        # Loop through both calculations
+        for number, calculation in ((1, self.calculation_1), (2, self.calculation_2)):
+            
+            # Lookup tables, where the last element is used for the index -1 (None)
+            keys: list = calculation.lookup_tables["keys"] + [None]
+            methods: list = calculation.lookup_tables["methods"] + [None]
+            
+            # Resolve the database and code of each key
+            lookup_arrays["databases_" + str(number)]: np.array = np.array([m[0] if m is not None else None for m in keys], dtype = "object")
+            lookup_arrays["codes_" + str(number)]: np.array = np.array([m[1] if m is not None else None for m in keys], dtype = "object")
+            
+            # Resolve the methods, as strings if specified
+            lookup_arrays["methods_" + str(number)]: np.array = np.empty(len(methods), dtype = "object")
+            lookup_arrays["methods_" + str(number)][:] = [str(m) if methods_as_strings and m is not None else m for m in methods]
+        
+        # Resolve the methods of the comparison
+        lookup_arrays["methods"]: np.array = np.empty(len(self.methods), dtype = "object")
+        lookup_arrays["methods"][:] = [str(m) if methods_as_strings else m for m in self.methods]
+        
+        # Return
+        return lookup_arrays
+    
+    
+    def _get_result_as_dataframe(self, rows: np.ndarray, cols: np.ndarray, lookup_arrays: dict[str, np.array]) -> pd.DataFrame:
+        
+        # Indices of the activities and methods in the lookup tables of both calculations
+        activity_keys_1: np.array = self.activity_key_indices_1[rows]
+        activity_keys_2: np.array = self.activity_key_indices_2[rows]
+        
+        # Construct the dataframe directly from the arrays
+        return pd.DataFrame({self.k_act_database_1: lookup_arrays["databases_1"][activity_keys_1],
+                             self.k_act_code_1: lookup_arrays["codes_1"][activity_keys_1],
+                             self.k_act_database_2: lookup_arrays["databases_2"][activity_keys_2],
+                             self.k_act_code_2: lookup_arrays["codes_2"][activity_keys_2],
+                             self.k_method: lookup_arrays["methods"][cols],
+                             self.k_method_1: lookup_arrays["methods_1"][self.method_key_indices_1[cols]],
+                             self.k_method_2: lookup_arrays["methods_2"][self.method_key_indices_2[cols]],
+                             self.k_score_1: self.scores_1[rows, cols],
+                             self.k_score_2: self.scores_2[rows, cols],
+                             self.k_absolute_delta: self.absolute_deltas[rows, cols],
+                             self.k_relative_delta: self.relative_deltas[rows, cols],
+                             self.k_rank_1: self.ranks_1[rows, cols],
+                             self.k_rank_2: self.ranks_2[rows, cols],
+                             self.k_rank_change: self.rank_changes[rows, cols]})
+    
+    
+    def _get_result_as_dataframes_in_chunks(self, chunk_size: int, methods_as_strings: bool):
+        
+        # Positions of all combinations that are compared, ordered by activity and method
+        rows, cols = np.nonzero(self.valid)
+        
+        # Resolve the lookup tables once for all chunks
+        lookup_arrays: dict[str, np.array] = self._get_lookup_arrays(methods_as_strings = methods_as_strings)
+        
+        # If there are no results, yield an empty dataframe, so that the columns are still written
+        if len(rows) == 0:
+            yield self._get_result_as_dataframe(rows = rows, cols = cols, lookup_arrays = lookup_arrays)
+        
+        # Build and yield the dataframes chunk by chunk. Only one chunk is kept in memory at once
+        for start in range(0, len(rows), chunk_size):
+            yield self._get_result_as_dataframe(rows = rows[start:start + chunk_size], cols = cols[start:start + chunk_size], lookup_arrays = lookup_arrays)
+    
+    
+    def get_results(self) -> pd.DataFrame:
+        
+        """ Returns the comparison as one dataframe, with one row per activity and method combination that is available in both calculations.
+        
+        Returns
+        -------
+        pd.DataFrame
+            Dataframe with the keys of the activities and the methods of both calculations, the scores, the absolute and relative differences and the ranks and their change.
+        
+        """
+        
+        # Check if the comparison is available
+        if not hasattr(self, "valid"):
+            raise ValueError("Nothing has been compared yet. Use .compare() to run comparison first.")
+        
+        # Build the dataframe from all combinations at once
+        rows, cols = np.nonzero(self.valid)
+        return self._get_result_as_dataframe(rows = rows, cols = cols, lookup_arrays = self._get_lookup_arrays(methods_as_strings = False))
+    
+    
+    def write_results(self,
+                      path: (pathlib.Path | str),
+                      filename: (str | None) = None,
+                      file_format: str = "parquet",
+                      chunk_size: int = 100000) -> None:
+        
+        """ Writes the comparison to a file. The results are written in chunks directly from the arrays, so that only one chunk is converted to a dataframe at once.
+        
+        Parameters
+        ----------
+        path : pathlib.Path | str
+            Folder where the file is written to.
+        
+        filename : str | None, optional
+            Name of the file. The default is None, which names the file 'LCA_comparison'.
+        
+        file_format : str, optional
+            Either 'csv' or 'parquet'. Parquet requires the package 'pyarrow'. The default is 'parquet'.
+        
+        chunk_size : int, optional
+            Number of rows that are converted and written at once. The default is 100000.
+        
+        Returns
+        -------
+        None
+        
+        """
+        
+        # Check function input type
+        hp.check_function_input_type(self.write_results, locals())
+        
+        # Check if the comparison is available
+        if not hasattr(self, "valid"):
+            raise ValueError("Nothing has been compared yet. Use .compare() to run comparison first.")
+        
+        # Check if the file format is valid
+        if file_format not in ("csv", "parquet"):
+            raise ValueError("Input variable 'file_format' needs to be one of 'csv' or 'parquet' but is currently '" + str(file_format) + "'.")
+        
+        # Parquet files can only be written if pyarrow is installed
+        if file_format == "parquet" and pyarrow is None:
+            raise ValueError("Writing results as Parquet files requires the package 'pyarrow', which is not installed.")
+        
+        # Check if the chunk size is valid
+        if chunk_size < 1:
+            raise ValueError("Input variable 'chunk_size' needs to be greater than 0 but is currently '" + str(chunk_size) + "'.")
+        
+        # If path is of type string, provide as pathlib path
+        path: pathlib.Path = pathlib.Path(path)
+        
+        # Check if the path exists
+        if not path.is_dir():
+            raise ValueError("Path '" + str(path) + "' does not exist")
+        
+        # Path of the file
+        filepath: pathlib.Path = path / ((filename if filename is not None else "LCA_comparison") + "." + file_format)
+        
+        # Initialize the Parquet writer variable, which is created with the first chunk
+        parquet_writer = None
+        
+        # Loop through each chunk of the results
+        # Parquet needs the same types in all chunks, therefore methods are written as strings
+        for number, df in enumerate(self._get_result_as_dataframes_in_chunks(chunk_size = chunk_size, methods_as_strings = file_format == "parquet")):
+            
+            # Append the chunk to the CSV. The header is only written with the first chunk
+            if file_format == "csv":
+                df.to_csv(filepath, mode = "w" if number == 0 else "a", header = number == 0, index = False)
+                continue
+            
+            # Amounts and scores are floats, everything else is written as string
+            table = pyarrow.Table.from_pandas(df, preserve_index = False,
+                                              schema = pyarrow.schema([(m, pyarrow.string() if m in (self.k_act_database_1, self.k_act_code_1, self.k_act_database_2, self.k_act_code_2,
+                                                                                                    self.k_method, self.k_method_1, self.k_method_2) else pyarrow.float64()) for m in df.columns]))
+            
+            # Create the writer with the first chunk
+            if parquet_writer is None:
+                parquet_writer = pyarrow.parquet.ParquetWriter(filepath, table.schema)
+            
+            # Write the chunk
+            parquet_writer.write_table(table)
+        
+        # Close the Parquet file
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+
+
+#%% Worker functions for the calculation on multiple processes
+
+# Shared memory blocks that a worker attached to. They need to be referenced as long as the matrices are used
+_attached_shared_memory_blocks: list[shared_memory.SharedMemory] = []
+
+def _attach_array_from_shared_memory(name: str, shape: tuple, dtype: str) -> np.array:
+    
+    # Attach to the shared memory block, which was created by another process
+    # The process that created the block is responsible to release it
+    block: shared_memory.SharedMemory = shared_memory.SharedMemory(name = name)
+    
+    # Keep a reference, otherwise the block is closed
+    _attached_shared_memory_blocks.append(block)
+    
+    # Return an array that directly reads from the shared memory (no copy)
+    return np.ndarray(shape, dtype = np.dtype(dtype), buffer = block.buf)
+
+
+# Each worker process keeps one calculation object, so that LCA objects (and factorizations) are built only once per worker
+_worker_calculation: (LCA_Calculation | None) = None
+
+def _initialize_worker(project_settings: dict, calculation_settings: dict, shared_LCA_objects: dict[str, dict], unified_system_databases: list[str]) -> None:
+    
+    # Make the calculation object of the worker accessible
+    global _worker_calculation
+    
+    # Set the Brightway project directory, if it is different (e.g., because the worker was spawned and not forked)
+    # Those lines are the same as in 'utils.change_brightway_project_directory'
+    if bw2data.projects._base_data_dir != project_settings["base_data_dir"]:
+        bw2data.projects._base_data_dir = str(project_settings["base_data_dir"])
+        bw2data.projects._base_logs_dir = str(project_settings["base_logs_dir"])
+        bw2data.projects.db = bw2data.sqlite.SubstitutableDatabase(os.path.join(str(project_settings["base_data_dir"]), "projects.db"), [bw2data.project.ProjectDataset])
+    
+    # Set the Brightway project
+    if bw2data.projects.current != project_settings["project"]:
+        bw2data.projects.set_current(project_settings["project"], update = False)
+    
+    # Initialize the calculation object of the worker, without activities. Those are added for each chunk
+    _worker_calculation = LCA_Calculation(activities = [],
+                                          print_progress_bar = False,
+                                          **calculation_settings)
+    
+    # Add the descriptors of the matrices in shared memory. Workers attach to them when a database is calculated for the first time
+    _worker_calculation.shared_LCA_objects: dict[str, dict] = shared_LCA_objects
+    
+    # The combined system needs to consist of the databases of all activities, not only of those of a chunk
+    _worker_calculation.unified_system_databases: list[str] = unified_system_databases
+
+
+def _calculate_chunk_in_worker(activity_keys: tuple[tuple[str, str]], calculation_flags: dict) -> dict[str, LCA_Result_Store]:
+    
+    # Retrieve the activity objects of the chunk
+    _worker_calculation.activities: list[bw2data.backends.peewee.proxies.Activity] = [_worker_calculation._get_database_object(database = database).get(code) for database, code in activity_keys]
+    
+    # Reset the activity keys, supply arrays and scores of the previous chunk. LCA objects and factorizations are kept
+    # Results of a chunk therefore never depend on which chunks the same worker calculated before
+    _worker_calculation.activity_keys_by_database: dict = {}
+    _worker_calculation._temporary_supply_arrays: dict = {}
+    _worker_calculation._temporary_score_results: dict = {}
+    
+    # Calculate the chunk
+    _worker_calculation.calculate(**calculation_flags)
+    
+    # Return the raw results. The lookup tables of the worker grow with every chunk it calculates
+    # Each result is therefore returned with its own lookup tables, which only contain the keys and methods of this chunk
+    return {k: v.select(rows = np.arange(len(v))) for k, v in _worker_calculation.results_raw.items()}
+
+
+def _calculate_monte_carlo_batch_in_worker(activity_keys: tuple[tuple[str, str]], iterations: int, seed_sequence: np.random.SeedSequence, sample_size: int) -> LCA_Monte_Carlo_Statistics:
+    
+    # Retrieve the activity objects. Those are the same for all batches, but are passed along, since the worker is initialized without activities
+    _worker_calculation.activities: list[bw2data.backends.peewee.proxies.Activity] = [_worker_calculation._get_database_object(database = database).get(code) for database, code in activity_keys]
+    
+    # Calculate the batch and return its statistics
+    return _worker_calculation._calculate_monte_carlo_batch(iterations = iterations, seed_sequence = seed_sequence, sample_size = sample_size)
+
+
 #%%
 
 # if __name__ == "__main__":
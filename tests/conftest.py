@@ -0,0 +1,85 @@
+import sys
+import types
+import pathlib
+import pytest
+import numpy as np
+from scipy import sparse
+
+# The modules of the repository are imported from its root directory
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+
+def create_technosphere(number_of_activities: int = 200, seed: int = 0, permuted: bool = True, cyclic: bool = True) -> dict:
+    
+    # Random number generator of the synthetic system
+    rng: np.random.Generator = np.random.default_rng(seed)
+    
+    # Keys of the activities. Each activity produces one product with the same key
+    keys: list[tuple[str, str]] = [("db", "a" + str(m)) for m in range(number_of_activities)]
+    
+    # Rows (products) and columns (activities) are permuted, as in Brightway, where products and activities are not ordered the same way
+    rows: np.array = rng.permutation(number_of_activities) if permuted else np.arange(number_of_activities)
+    columns: np.array = rng.permutation(number_of_activities) if permuted else np.arange(number_of_activities)
+    
+    # Production amounts on the 'diagonal' of the product and activity
+    entries: dict[tuple[int, int], float] = {(rows[m], columns[m]): float(rng.uniform(0.5, 2)) for m in range(number_of_activities)}
+    
+    # Each activity consumes a few other products. Without cycles, activities only consume products of activities with a higher index (acyclic supply chain)
+    for consumer in range(number_of_activities):
+        for supplier in rng.choice(number_of_activities, size = 3, replace = False):
+            if supplier == consumer or (not cyclic and supplier < consumer):
+                continue
+            entries[(rows[supplier], columns[consumer])] = -float(rng.uniform(0.01, 0.2))
+    
+    # Build the technosphere matrix
+    technosphere_matrix: sparse.csr_matrix = sparse.csr_matrix((list(entries.values()), ([m for m, _ in entries], [m for _, m in entries])), shape = (number_of_activities, number_of_activities))
+    
+    # Return the matrix and the dictionaries of its rows and columns
+    return {"technosphere_matrix": technosphere_matrix,
+            "product_dict": {key: int(rows[m]) for m, key in enumerate(keys)},
+            "activity_dict": {key: int(columns[m]) for m, key in enumerate(keys)}}
+
+
+def create_calculation(technosphere: dict, number_of_flows: int = 30, number_of_methods: int = 4, seed: int = 0, **settings) -> "calculation.LCA_Calculation":
+    
+    # The calculation module needs Brightway to be installed, but the tests do not need any Brightway project data
+    # Tests are skipped (and not collected with an error), if Brightway is not installed
+    for module in ("bw2calc", "bw2data", "stats_arrays"):
+        pytest.importorskip(module)
+    import calculation
+    
+    # Random number generator of the synthetic system
+    rng: np.random.Generator = np.random.default_rng(seed)
+    
+    # Initialize the calculation class without activities and methods, those are added below without Brightway
+    lca_calculation = calculation.LCA_Calculation(activities = [], methods = [], print_progress_bar = False, **settings)
+    
+    # Synthetic biosphere
+    number_of_activities: int = technosphere["technosphere_matrix"].shape[1]
+    biosphere_matrix: sparse.csr_matrix = sparse.random(number_of_flows, number_of_activities, density = 0.1, random_state = seed, format = "csr")
+    
+    # Exchanges as stored in the database (row, column, amount and type), in the same form as read by the calculation. Production exchanges are of type 0, inputs of type 1 with positive amounts
+    technosphere_coo: sparse.coo_matrix = technosphere["technosphere_matrix"].tocoo()
+    biosphere_coo: sparse.coo_matrix = biosphere_matrix.tocoo()
+    dtype: list[tuple[str, str]] = [("row", "int64"), ("col", "int64"), ("amount", "float64"), ("type", "uint8")]
+    tech_params: np.array = np.array(list(zip(technosphere_coo.row, technosphere_coo.col, np.abs(technosphere_coo.data), np.where(technosphere_coo.data > 0, 0, 1))), dtype = dtype)
+    bio_params: np.array = np.array(list(zip(biosphere_coo.row, biosphere_coo.col, biosphere_coo.data, np.full(biosphere_coo.nnz, 2))), dtype = dtype)
+    lca_calculation.exchange_parameters["db"] = (tech_params, bio_params)
+    
+    # Synthetic lca object of the database 'db', which is used instead of the Brightway LCA object
+    lca_calculation.lca_objects["db"] = types.SimpleNamespace(technosphere_matrix = technosphere["technosphere_matrix"],
+                                                              biosphere_matrix = biosphere_matrix,
+                                                              product_dict = technosphere["product_dict"],
+                                                              activity_dict = technosphere["activity_dict"],
+                                                              biosphere_dict = {("biosphere", "f" + str(m)): m for m in range(number_of_flows)})
+    
+    # Synthetic methods with characterization factors
+    lca_calculation.methods = [("method", str(m)) for m in range(number_of_methods)]
+    lca_calculation.stacked_characterization_matrices["db"] = sparse.csr_matrix(rng.uniform(-1, 3, size = (number_of_methods, number_of_flows)))
+    lca_calculation.method_indices_of_stacked_characterization_matrices["db"] = np.arange(number_of_methods)
+    
+    # All activities of the database are calculated
+    lca_calculation.activities = [types.SimpleNamespace(key = key) for key in technosphere["activity_dict"]]
+    
+    # Return
+    return lca_calculation
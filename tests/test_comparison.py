@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+# The calculation module needs Brightway to be installed, but the tests do not need any Brightway project data
+pytest.importorskip("bw2calc")
+pytest.importorskip("bw2data")
+pytest.importorskip("stats_arrays")
+
+import calculation
+from conftest import create_technosphere, create_calculation
+
+
+def test_comparison_maps_activities_by_key() -> None:
+    
+    # Two calculations of the same technosphere with different biospheres. The scores are calculated without edits, which does not need Brightway
+    technosphere: dict = create_technosphere(number_of_activities = 50)
+    lca_calculations: list = [create_calculation(technosphere = technosphere, seed = seed) for seed in (0, 1, 1)]
+    scores: list[np.array] = [m.calculate_LCIA_scores_with_edits(edits = []) for m in lca_calculations]
+    
+    # The last calculation has the same codes, but in another database
+    lca_calculations[2].lookup_tables["keys"][:] = [("db_copy", m[1]) if m is not None and m[0] == "db" else m for m in lca_calculations[2].lookup_tables["keys"]]
+    
+    # Activities with the same key are compared
+    comparison = calculation.LCA_Comparison(calculation_1 = lca_calculations[0], calculation_2 = lca_calculations[1], result_type = "LCIA_scores_what_if")
+    comparison.compare()
+    assert comparison.valid.all() and comparison.valid.shape == scores[0].shape
+    np.testing.assert_allclose(comparison.absolute_deltas, scores[1] - scores[0])
+    
+    # Activities with the same code in another database are not compared, unless they are mapped
+    comparison = calculation.LCA_Comparison(calculation_1 = lca_calculations[0], calculation_2 = lca_calculations[2], result_type = "LCIA_scores_what_if")
+    comparison.compare()
+    assert not comparison.valid.any()
+    comparison = calculation.LCA_Comparison(calculation_1 = lca_calculations[0], calculation_2 = lca_calculations[2], result_type = "LCIA_scores_what_if",
+                                            activity_mapping = {("db_copy", m[1]): m for m in technosphere["activity_dict"]})
+    comparison.compare()
+    np.testing.assert_allclose(comparison.absolute_deltas, scores[2] - scores[0])
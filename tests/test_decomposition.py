@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.sparse import linalg as sparse_linalg
+
+# The calculation module needs Brightway to be installed, but the tests do not need any Brightway project data
+pytest.importorskip("bw2calc")
+pytest.importorskip("bw2data")
+pytest.importorskip("stats_arrays")
+
+from conftest import create_technosphere, create_calculation
+
+
+def add_cycles(technosphere: dict, cycles: list[tuple[int, ...]]) -> dict:
+    
+    # Each cycle is closed by letting every activity of the cycle consume the product of the next one
+    matrix: sparse.lil_matrix = technosphere["technosphere_matrix"].tolil()
+    for cycle in cycles:
+        for consumer, supplier in zip(cycle, cycle[1:] + cycle[:1]):
+            matrix[technosphere["product_dict"][("db", "a" + str(supplier))], technosphere["activity_dict"][("db", "a" + str(consumer))]] = -0.1
+    
+    # Return the technosphere with the additional inputs
+    return {**technosphere, "technosphere_matrix": matrix.tocsr()}
+
+
+@pytest.mark.parametrize("structure", ["acyclic", "mixed", "cyclic"])
+@pytest.mark.parametrize("permuted", [False, True])
+@pytest.mark.parametrize("transposed", [False, True])
+def test_decomposition_matches_direct_solver(structure: str, permuted: bool, transposed: bool) -> None:
+    
+    # Synthetic technosphere. The mixed one has a few cycles of different lengths in an otherwise acyclic supply chain
+    technosphere: dict = create_technosphere(permuted = permuted, cyclic = structure == "cyclic")
+    if structure == "mixed":
+        technosphere: dict = add_cycles(technosphere = technosphere, cycles = [(10, 11), (40, 45, 60), (100, 150, 120, 199)])
+    lca_calculation = create_calculation(technosphere = technosphere, solver = "decomposition")
+    matrix = technosphere["technosphere_matrix"]
+    
+    # The decomposition contains cyclic components, except for the acyclic supply chain
+    levels: list[dict] = lca_calculation._get_technosphere_decomposition(database = "db")["levels"]
+    assert (sum(len(m["blocks"]) for m in levels) > 0) == (structure != "acyclic")
+    
+    # Demand vectors of a few activities and a dense right hand side
+    right_hand_side: np.array = np.zeros((matrix.shape[0], 4))
+    right_hand_side[[3, 50, 120], [0, 1, 2]] = 1
+    right_hand_side[:, 3] = np.random.default_rng(1).uniform(-1, 1, matrix.shape[0])
+    
+    # Direct solution
+    factorized_matrix = sparse_linalg.splu(matrix.tocsc())
+    expected: np.array = factorized_matrix.solve(right_hand_side, trans = "T" if transposed else "N")
+    
+    # Solution with the decomposition, as one block (2-D) and column by column (1-D)
+    solution: np.array = lca_calculation._solve_technosphere(database = "db", right_hand_side = right_hand_side, transposed = transposed)
+    np.testing.assert_allclose(solution, expected, rtol = 1e-10, atol = 1e-12)
+    for column in range(right_hand_side.shape[1]):
+        single: np.array = lca_calculation._solve_technosphere(database = "db", right_hand_side = right_hand_side[:, column], transposed = transposed)
+        assert single.shape == (matrix.shape[0],)
+        np.testing.assert_allclose(single, expected[:, column], rtol = 1e-10, atol = 1e-12)
@@ -0,0 +1,84 @@
+import types
+import numpy as np
+import pytest
+from scipy import sparse
+
+# The calculation module needs Brightway to be installed, but the tests do not need any Brightway project data
+pytest.importorskip("bw2calc")
+pytest.importorskip("bw2data")
+pytest.importorskip("stats_arrays")
+
+import bw2data
+from conftest import create_technosphere, create_calculation
+
+
+def test_exchange_matrices_are_calibrated_to_one_unit_of_activity() -> None:
+    
+    # Synthetic technosphere with permuted products and activities
+    technosphere: dict = create_technosphere(number_of_activities = 50)
+    lca_calculation = create_calculation(technosphere = technosphere)
+    matrix = technosphere["technosphere_matrix"].tocsc()
+    
+    # Production amount of each activity
+    product_indices: np.array = np.array([technosphere["product_dict"][key] for key in sorted(technosphere["activity_dict"], key = technosphere["activity_dict"].get)])
+    production_amounts: np.array = np.asarray(matrix[product_indices, np.arange(matrix.shape[1])]).reshape(-1)
+    
+    # Inputs are stored with positive amounts per unit of activity
+    expected = matrix.toarray()
+    expected[product_indices, np.arange(matrix.shape[1])] = 0
+    expected = -expected / production_amounts
+    
+    # Compare
+    exchange_matrices: dict = lca_calculation._get_exchange_matrices(database = "db")
+    np.testing.assert_allclose(exchange_matrices["technosphere_exchange_matrix"].toarray(), expected)
+    np.testing.assert_allclose(exchange_matrices["biosphere_exchange_matrix"].toarray(), lca_calculation.lca_objects["db"].biosphere_matrix.toarray() / production_amounts)
+
+
+@pytest.mark.parametrize("number_of_production_exchanges", [0, 2])
+def test_exchange_matrices_raise_error_if_not_exactly_one_production_exchange(number_of_production_exchanges: int) -> None:
+    
+    # Synthetic technosphere
+    technosphere: dict = create_technosphere(number_of_activities = 50)
+    lca_calculation = create_calculation(technosphere = technosphere)
+    tech_params, bio_params = lca_calculation.exchange_parameters["db"]
+    
+    # Remove or duplicate the production exchange of one activity that also has inputs
+    column: int = technosphere["activity_dict"][("db", "a7")]
+    production: np.array = np.flatnonzero((tech_params["type"] == 0) & (tech_params["col"] == column))
+    if number_of_production_exchanges == 0:
+        tech_params = np.delete(tech_params, production)
+    else:
+        tech_params = np.concatenate([tech_params, tech_params[production]])
+    lca_calculation.exchange_parameters["db"] = (tech_params, bio_params)
+    
+    # The error names the activity and the number of production exchanges
+    with pytest.raises(ValueError, match = "'\\('db', 'a7'\\)' contains " + str(number_of_production_exchanges) + " production"):
+        lca_calculation._get_exchange_matrices(database = "db")
+
+
+def test_exchange_matrices_contain_the_amounts_as_stored_in_the_database(monkeypatch) -> None:
+    
+    # Exchanges as stored in the database: (data, type, input database, input code, output code). Brightway only keeps these amounts as float32
+    exchanges: list[tuple] = [({"amount": 1.0}, "production", "db", "a0", "a0"),
+                              ({"amount": 0.023725}, "technosphere", "db", "a1", "a0"),
+                              ({"amount": 0.1}, "biosphere", "biosphere", "f0", "a0"),
+                              ({"amount": 2.0}, "production", "db", "a1", "a1"),
+                              ({"amount": 0.3}, "biosphere", "biosphere", "f0", "a1"),
+                              ({"amount": 5.0}, "technosphere", "other_db", "x", "a1")]
+    
+    # Query of the exchanges of a database, with the interface of peewee
+    query = types.SimpleNamespace(where = lambda *args: query, tuples = lambda: query, iterator = lambda: iter(exchanges))
+    exchange_dataset = types.SimpleNamespace(select = lambda *args: query, data = None, type = None, input_database = None, input_code = None, output_code = None, output_database = None)
+    monkeypatch.setattr(bw2data.backends.peewee, "ExchangeDataset", exchange_dataset, raising = False)
+    
+    # Synthetic system of two activities, where the parameters of Brightway contain the amounts as float32
+    technosphere: dict = {"technosphere_matrix": sparse.csr_matrix(np.array([[1, 0], [-0.023725, 2]], dtype = "float32").astype("float64")),
+                          "product_dict": {("db", "a0"): 0, ("db", "a1"): 1},
+                          "activity_dict": {("db", "a0"): 0, ("db", "a1"): 1}}
+    lca_calculation = create_calculation(technosphere = technosphere, number_of_flows = 1)
+    lca_calculation.exchange_parameters.clear()
+    
+    # The exchanges are read from the database, with the exact amounts. Exchanges with flows that are not part of the system are skipped
+    exchange_matrices: dict = lca_calculation._get_exchange_matrices(database = "db")
+    np.testing.assert_array_equal(exchange_matrices["technosphere_exchange_matrix"].toarray(), [[0, 0], [0.023725, 0]])
+    np.testing.assert_array_equal(exchange_matrices["biosphere_exchange_matrix"].toarray()[0], [0.1, 0.15])
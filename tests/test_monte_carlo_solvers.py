@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.sparse import linalg as sparse_linalg
+
+# The calculation module needs Brightway to be installed, but the tests do not need any Brightway project data
+pytest.importorskip("bw2calc")
+pytest.importorskip("bw2data")
+pytest.importorskip("stats_arrays")
+
+import calculation
+from conftest import create_technosphere, create_calculation
+
+
+@pytest.mark.parametrize("solver", ["direct", "decomposition", "bicgstab", "gmres"])
+def test_samples_are_solved_with_the_specified_solver(monkeypatch, solver: str) -> None:
+    
+    # Synthetic system with permuted products and activities and cyclic supply chains
+    technosphere: dict = create_technosphere()
+    lca_calculation = create_calculation(technosphere = technosphere, solver = solver)
+    lca_object = lca_calculation.lca_objects["db"]
+    
+    # The uncertainty parameters give the positions of the sampled amounts in the matrices (the exchanges of the system)
+    tech_params, bio_params = lca_calculation.exchange_parameters["db"]
+    lca_calculation.uncertainty_parameters["db"] = {"technosphere": tech_params, "biosphere": bio_params}
+    
+    # Sampled amounts, which deviate from the static amounts
+    rng: np.random.Generator = np.random.default_rng(3)
+    technosphere_amounts: np.array = tech_params["amount"] * rng.lognormal(0, 0.1, len(tech_params))
+    biosphere_amounts: np.array = bio_params["amount"] * rng.lognormal(0, 0.1, len(bio_params))
+    
+    # Unit scores of the sample, solved directly
+    technosphere_matrix: sparse.csc_matrix = sparse.csc_matrix((np.where(tech_params["type"] == 1, -technosphere_amounts, technosphere_amounts), (tech_params["row"], tech_params["col"])), shape = lca_object.technosphere_matrix.shape)
+    biosphere_matrix: sparse.csr_matrix = sparse.csr_matrix((biosphere_amounts, (bio_params["row"], bio_params["col"])), shape = lca_object.biosphere_matrix.shape)
+    expected: np.array = sparse_linalg.splu(technosphere_matrix).solve((lca_calculation.stacked_characterization_matrices["db"] @ biosphere_matrix).transpose().toarray(), trans = "T")
+    
+    # The iterative solvers never build a complete factorization, neither of the database nor of the sample
+    if solver in ("bicgstab", "gmres"):
+        monkeypatch.setattr(calculation.sparse_linalg, "splu", None)
+    
+    # Unit scores of the sample, solved with the specified solver. The static matrix of the database is not used
+    unit_scores: np.array = lca_calculation._get_unit_scores_of_sample(database = "db", technosphere_amounts = technosphere_amounts, biosphere_amounts = biosphere_amounts)
+    np.testing.assert_allclose(unit_scores, expected, rtol = 1e-6 if solver in ("bicgstab", "gmres") else 1e-10, atol = 1e-12)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+# The calculation module needs Brightway to be installed, but the tests do not need any Brightway project data
+pytest.importorskip("bw2calc")
+pytest.importorskip("bw2data")
+pytest.importorskip("stats_arrays")
+
+import calculation
+
+
+def test_statistics_match_all_samples() -> None:
+    
+    # Samples which are added in batches of different sizes. All samples fit into the reservoir, therefore percentiles are exact
+    samples: np.array = np.random.default_rng(0).normal(size = (500, 3, 2))
+    statistics = calculation.LCA_Monte_Carlo_Statistics(shape = (3, 2), sample_size = 1000, seed = 0)
+    for start in range(0, 500, 33):
+        statistics.add(samples = samples[start:start + 33])
+    
+    # Mean, standard deviation and percentiles are the same as calculated from all samples at once
+    np.testing.assert_allclose(statistics.mean, samples.mean(axis = 0))
+    np.testing.assert_allclose(statistics.get_standard_deviation(), samples.std(axis = 0, ddof = 1))
+    np.testing.assert_allclose(statistics.get_percentiles(percentiles = (5, 50, 95)), np.percentile(samples, (5, 50, 95), axis = 0))
+
+
+def test_kept_samples_are_uniform() -> None:
+    
+    # Count how often each sample of a stream of 1000 samples is kept, when 100 samples are kept
+    counts: np.array = np.zeros((2, 1000))
+    
+    # Repeat with different seeds
+    for seed in range(300):
+        
+        # Samples added directly, and samples added to separate statistics per batch which are then merged
+        added = calculation.LCA_Monte_Carlo_Statistics(shape = (1,), sample_size = 100, seed = seed)
+        merged = calculation.LCA_Monte_Carlo_Statistics(shape = (1,), sample_size = 100, seed = seed)
+        
+        # Loop through the batches
+        for start in range(0, 1000, 37):
+            batch: np.array = np.arange(start, min(start + 37, 1000), dtype = "float64")[:, None]
+            added.add(samples = batch)
+            statistics = calculation.LCA_Monte_Carlo_Statistics(shape = (1,), sample_size = 100, seed = seed * 1000 + start)
+            statistics.add(samples = batch)
+            merged.merge(other = statistics)
+        
+        # Count the samples that are kept. Each sample is kept only once
+        for row, statistics in enumerate((added, merged)):
+            kept: np.array = statistics.reservoir[:statistics.number_of_kept_samples, 0].astype("int64")
+            assert len(np.unique(kept)) == 100
+            counts[row, kept] += 1
+    
+    # Each sample is kept with a probability of 10%, early samples as often as late ones
+    frequencies: np.array = counts / 300
+    assert np.all(np.abs(frequencies[:, :500].mean(axis = 1) - 0.1) < 0.005)
+    assert np.all(np.abs(frequencies[:, 500:].mean(axis = 1) - 0.1) < 0.005)
@@ -0,0 +1,75 @@
+import pytest
+
+# The calculation module needs Brightway to be installed, but the tests do not need any Brightway project data
+pytest.importorskip("bw2calc")
+pytest.importorskip("bw2data")
+pytest.importorskip("stats_arrays")
+
+from conftest import create_technosphere, create_calculation
+
+
+def calculate_with_cache(technosphere: dict, result_cache_path, characterization_factor: float = 1, **settings) -> tuple:
+    
+    # Synthetic calculation, where the activities are solved in batches (which does not need Brightway)
+    lca_calculation = create_calculation(technosphere = technosphere, solve_in_batches = True, result_cache_path = result_cache_path, **settings)
+    lca_calculation.stacked_characterization_matrices["db"][0, 0] = characterization_factor
+    
+    # Count how often the linear system is solved
+    solve_batch_of_activities = lca_calculation._solve_batch_of_activities
+    number_of_solves: list[int] = [0]
+    def count_solves(**kwargs):
+        number_of_solves[0] += 1
+        return solve_batch_of_activities(**kwargs)
+    lca_calculation._solve_batch_of_activities = count_solves
+    
+    # Calculate and return the score of each activity and method, as well as the number of solves
+    lca_calculation.calculate()
+    return {(m[0], m[5]): m[4] for m in lca_calculation.results_raw["LCIA_scores"].to_tuples()}, number_of_solves[0]
+
+
+@pytest.mark.parametrize("first_settings, second_settings, cached", [({}, {}, True),
+                                                                     ({}, {"solver_tolerance": 1e-6}, True),
+                                                                     ({}, {"solver": "decomposition"}, False),
+                                                                     ({"solver": "gmres", "solver_tolerance": 0.05}, {}, False),
+                                                                     ({"solver": "gmres", "solver_tolerance": 0.05}, {"solver": "gmres", "solver_tolerance": 1e-8}, False),
+                                                                     ({}, {"exchange_level": 2}, False)])
+def test_result_cache_depends_on_settings(tmp_path, first_settings: dict, second_settings: dict, cached: bool) -> None:
+    
+    # Synthetic technosphere with permuted products and activities and cyclic supply chains
+    technosphere: dict = create_technosphere(number_of_activities = 50)
+    
+    # The first run fills the cache
+    _, number_of_solves = calculate_with_cache(technosphere = technosphere, result_cache_path = tmp_path / "cache.sqlite", **first_settings)
+    assert number_of_solves > 0
+    
+    # The second run only reads from the cache if all settings that change the results are the same (the tolerance does not change the results of the direct solver)
+    scores, number_of_solves = calculate_with_cache(technosphere = technosphere, result_cache_path = tmp_path / "cache.sqlite", **second_settings)
+    assert (number_of_solves == 0) == cached
+    
+    # Results are the same as without cache
+    expected, _ = calculate_with_cache(technosphere = technosphere, result_cache_path = tmp_path / "other_cache.sqlite", **second_settings)
+    assert scores == expected
+
+
+@pytest.mark.parametrize("change", ["technosphere", "characterization_factors"])
+def test_result_cache_depends_on_matrices(tmp_path, change: str) -> None:
+    
+    # Synthetic technosphere, and the same technosphere with one changed exchange
+    technosphere: dict = create_technosphere(number_of_activities = 50)
+    changed_technosphere: dict = {**technosphere, "technosphere_matrix": technosphere["technosphere_matrix"].copy()}
+    changed_technosphere["technosphere_matrix"].data[0] *= 1.5
+    
+    # The first run fills the cache
+    calculate_with_cache(technosphere = technosphere, result_cache_path = tmp_path / "cache.sqlite")
+    
+    # The second run, with the changed technosphere or characterization factor, is calculated again
+    scores, number_of_solves = calculate_with_cache(technosphere = changed_technosphere if change == "technosphere" else technosphere,
+                                                    result_cache_path = tmp_path / "cache.sqlite",
+                                                    characterization_factor = 1 if change == "technosphere" else 2)
+    assert number_of_solves > 0
+    
+    # Results are the same as without cache
+    expected, _ = calculate_with_cache(technosphere = changed_technosphere if change == "technosphere" else technosphere,
+                                       result_cache_path = tmp_path / "other_cache.sqlite",
+                                       characterization_factor = 1 if change == "technosphere" else 2)
+    assert scores == expected
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from scipy.sparse import linalg as sparse_linalg
+
+# The calculation module needs Brightway to be installed, but the tests do not need any Brightway project data
+pytest.importorskip("bw2calc")
+pytest.importorskip("bw2data")
+pytest.importorskip("stats_arrays")
+
+from conftest import create_technosphere, create_calculation
+
+
+@pytest.mark.parametrize("solver", ["bicgstab", "gmres"])
+@pytest.mark.parametrize("solver_tolerance", [1e-6, 1e-10])
+@pytest.mark.parametrize("transposed", [False, True])
+def test_iterative_solvers_match_direct_solver(solver: str, solver_tolerance: float, transposed: bool) -> None:
+    
+    # Synthetic technosphere with permuted products and activities and cyclic supply chains
+    technosphere: dict = create_technosphere()
+    lca_calculation = create_calculation(technosphere = technosphere, solver = solver, solver_tolerance = solver_tolerance)
+    matrix = technosphere["technosphere_matrix"]
+    
+    # Demand vectors of a few activities and a dense right hand side
+    right_hand_side: np.array = np.zeros((matrix.shape[0], 4))
+    right_hand_side[[3, 50, 120], [0, 1, 2]] = 1
+    right_hand_side[:, 3] = np.random.default_rng(1).uniform(-1, 1, matrix.shape[0])
+    
+    # Direct solution
+    expected: np.array = sparse_linalg.splu(matrix.tocsc()).solve(right_hand_side, trans = "T" if transposed else "N")
+    
+    # Iterative solution, column by column and as one block
+    solution: np.array = lca_calculation._solve_technosphere(database = "db", right_hand_side = right_hand_side, transposed = transposed)
+    
+    # Each column is accurate up to the tolerance (the matrix is well conditioned)
+    for column in range(right_hand_side.shape[1]):
+        assert np.linalg.norm(solution[:, column] - expected[:, column]) <= 10 * solver_tolerance * np.linalg.norm(expected[:, column])
+    
+    # Solving one column gives the same result as solving it within a block, independent of the other columns
+    single: np.array = lca_calculation._solve_technosphere(database = "db", right_hand_side = right_hand_side[:, 1], transposed = transposed)
+    assert single.shape == (matrix.shape[0],)
+    np.testing.assert_array_equal(single, solution[:, 1])
+    
+    # Entries of the supply chain are not dropped, even if they are small
+    assert np.count_nonzero(solution[:, 0]) == np.count_nonzero(expected[:, 0])
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from scipy.sparse import linalg as sparse_linalg
+
+# The calculation module needs Brightway to be installed, but the tests do not need any Brightway project data
+pytest.importorskip("bw2calc")
+pytest.importorskip("bw2data")
+pytest.importorskip("stats_arrays")
+
+from conftest import create_technosphere, create_calculation
+
+
+def test_supply_chain_graph_contains_all_paths_of_shared_suppliers() -> None:
+    
+    # Small acyclic technosphere, so that the graph can be expanded completely. Many suppliers are shared by several consumers
+    technosphere: dict = create_technosphere(number_of_activities = 12, cyclic = False)
+    lca_calculation = create_calculation(technosphere = technosphere, functional_amount = 3, graph_traversal_cut_off = 0, graph_traversal_max_nodes = 100000)
+    matrix = technosphere["technosphere_matrix"]
+    
+    # Root activity and its product
+    activity_key: tuple[str, str] = ("db", "a0")
+    root: int = technosphere["activity_dict"][activity_key]
+    demand: np.array = np.zeros(matrix.shape[0])
+    demand[technosphere["product_dict"][activity_key]] = 3
+    
+    # Amount of each product that is needed by the root activity (supply of each activity multiplied with its production amount)
+    supply: np.array = sparse_linalg.splu(matrix.tocsc()).solve(demand)
+    product_indices: np.array = np.array([technosphere["product_dict"][key] for key in sorted(technosphere["activity_dict"], key = technosphere["activity_dict"].get)])
+    production_amounts: np.array = np.asarray(matrix.tocsc()[product_indices, np.arange(matrix.shape[1])]).reshape(-1)
+    expected: np.array = supply * production_amounts
+    expected[root] = 0
+    
+    # Traverse the graph with a score of one per unit
+    _, _, suppliers, supplier_amounts, scores = lca_calculation._traverse_supply_chain_graph_for_unit_scores(database = "db", activity_key = activity_key, unit_scores = np.ones(matrix.shape[1]))
+    
+    # The amounts of all edges of a supplier (one per path) add up to the total amount of that supplier
+    np.testing.assert_allclose(np.bincount(suppliers, weights = supplier_amounts, minlength = matrix.shape[1]), expected, rtol = 1e-10, atol = 1e-14)
+    np.testing.assert_allclose(scores, supplier_amounts)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.sparse import linalg as sparse_linalg
+
+# The calculation module needs Brightway to be installed, but the tests do not need any Brightway project data
+pytest.importorskip("bw2calc")
+pytest.importorskip("bw2data")
+pytest.importorskip("stats_arrays")
+
+from conftest import create_technosphere, create_calculation
+
+
+EDITS: dict[str, list[tuple]] = {"inputs": [(("db", "a5"), ("db", "a0"), 0.3), (("db", "a17"), ("db", "a3"), 0.05), (("db", "a2"), ("db", "a150"), 0.1)],
+                                 "production": [(("db", "a0"), ("db", "a0"), 2.5), (("db", "a42"), ("db", "a42"), 0.8)],
+                                 "biosphere": [(("biosphere", "f3"), ("db", "a0"), 1.5), (("biosphere", "f7"), ("db", "a99"), 0.2)]}
+
+
+@pytest.mark.parametrize("edit_types", [("inputs",), ("production",), ("biosphere",), ("inputs", "production", "biosphere")])
+@pytest.mark.parametrize("max_rank_of_update", [25, 0])
+@pytest.mark.parametrize("solver", ["direct", "decomposition"])
+def test_what_if_scores_match_scores_of_edited_matrices(edit_types: tuple[str, ...], max_rank_of_update: int, solver: str) -> None:
+    
+    # Synthetic system with permuted products and activities and cyclic supply chains
+    technosphere: dict = create_technosphere()
+    lca_calculation = create_calculation(technosphere = technosphere, functional_amount = 2, solver = solver)
+    lca_object = lca_calculation.lca_objects["db"]
+    edits: list[tuple] = [m for edit_type in edit_types for m in EDITS[edit_type]]
+    original_technosphere_matrix: sparse.csr_matrix = lca_object.technosphere_matrix.copy()
+    
+    # Apply the edits to copies of the matrices. Inputs are negative in the technosphere matrix, the production is positive
+    technosphere_matrix: sparse.lil_matrix = lca_object.technosphere_matrix.tolil()
+    biosphere_matrix: sparse.lil_matrix = lca_object.biosphere_matrix.tolil()
+    for row_key, column_key, new_amount in edits:
+        if row_key in lca_object.product_dict:
+            technosphere_matrix[lca_object.product_dict[row_key], lca_object.activity_dict[column_key]] = new_amount if row_key == column_key else -new_amount
+        else:
+            biosphere_matrix[lca_object.biosphere_dict[row_key], lca_object.activity_dict[column_key]] = new_amount
+    
+    # Scores of the edited system, solved from scratch: one unit of each product (transposed system), scaled with the functional amount
+    product_scores: np.array = sparse_linalg.splu(technosphere_matrix.tocsc()).solve((lca_calculation.stacked_characterization_matrices["db"] @ biosphere_matrix.tocsr()).transpose().toarray(), trans = "T")
+    expected: np.array = product_scores[[lca_object.product_dict[m.key] for m in lca_calculation.activities], :] * 2
+    
+    # Scores with the edits
+    scores: np.array = lca_calculation.calculate_LCIA_scores_with_edits(edits = edits, max_rank_of_update = max_rank_of_update)
+    np.testing.assert_allclose(scores, expected, rtol = 1e-9, atol = 1e-12)
+    
+    # The scores are added to the results, and the matrices of the system itself are not modified
+    assert len(lca_calculation.results_raw[lca_calculation.name_LCIA_scores_what_if]) == scores.size
+    assert (lca_object.technosphere_matrix != original_technosphere_matrix).nnz == 0